@@ -6,16 +6,44 @@
 #.  book chapters 👇
 #.  /api/book?path=  
 
+#.  whole book questions, streamed as ndjson 👇
+#.  /api/book/questions?path=  (&per=question)
+
+#.  whole book or class as a gzip/zstd jsonl archive 👇
+#.  /api/export?book=  or  /api/export?class=11  (&after=&codec=zstd)
+
 #.  chapter questions 👇
 #.  /api/questions?path=
 
 #.  answer fetch 👇
 #.  /api/answer?id= 
 
+#.  batch answer fetch 👇
+#.  /api/answers?ids=1,2,3  or  /api/answers?path=
+
+#.  prometheus metrics 👇
+#.  /metrics
+
+import startup
+
 import os
 import sys
 import logging
-from flask import Flask, jsonify, request
+import json
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+with startup.stage('import flask'):
+    from flask import Flask, Response, g, jsonify, request, stream_with_context
+
+from singleflight import get_single_flight
+from circuit import get_breaker
+from payloads import PayloadCache, content_etag
+from bookstream import BookQuestions, clean_questions_data
+import metrics
+import timing
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,17 +51,68 @@ logging.basicConfig(level=logging.INFO)
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "default_secret_key")
 
-# Global variables for scrapers
+# Global variables for scrapers, built on first use by ensure_scrapers()
 scraper = None
 video_scraper = None
+response_cache = None
+payload_cache = None
+prefetcher = None
+scrapers_initialized = False
+scrapers_lock = threading.Lock()
+
+# Routes that never touch the scrapers, so they don't trigger loading them
+SCRAPER_FREE_ENDPOINTS = {'index', 'health_check', 'metrics_endpoint', 'search_questions', 'static'}
+
+# Full-text index for /api/search, opened on first use by get_search_index()
+search_index = None
+search_index_initialized = False
+search_index_lock = threading.Lock()
+
+# Worker pool for /api/answers, created on first use
+BATCH_WORKERS = int(os.environ.get('DOUBTNUT_BATCH_WORKERS', 8))
+BATCH_MAX_IDS = int(os.environ.get('DOUBTNUT_BATCH_MAX_IDS', 100))
+batch_executor = None
+batch_executor_lock = threading.Lock()
+
+# Seconds API clients may reuse a response before revalidating it with If-None-Match
+HTTP_MAX_AGE = int(os.environ.get('DOUBTNUT_HTTP_MAX_AGE', 60))
+
+# Seconds the edge CDN may serve a route's response without asking the app
+HTTP_SMAXAGE = {
+    'get_books': int(os.environ.get('DOUBTNUT_HTTP_SMAXAGE_BOOKS', 86400)),
+    'get_book_chapters': int(os.environ.get('DOUBTNUT_HTTP_SMAXAGE_BOOK', 86400)),
+    'get_questions': int(os.environ.get('DOUBTNUT_HTTP_SMAXAGE_QUESTIONS', 3600)),
+    'get_answer': int(os.environ.get('DOUBTNUT_HTTP_SMAXAGE_ANSWER', 3600)),
+    'get_answers': int(os.environ.get('DOUBTNUT_HTTP_SMAXAGE_ANSWERS', 3600)),
+    'search_questions': int(os.environ.get('DOUBTNUT_HTTP_SMAXAGE_SEARCH', 300)),
+}
 
 def initialize_scrapers():
     """Initialize scrapers with proper error handling"""
-    global scraper, video_scraper
+    global scraper, video_scraper, response_cache, payload_cache, prefetcher
+    
+    try:
+        with startup.stage('import cache'):
+            from cache import ResponseCache
+        response_cache = ResponseCache.from_env()
+        if response_cache is not None:
+            logging.info("Response cache initialized successfully")
+    except Exception as e:
+        logging.error(f"Failed to initialize response cache: {e}")
+        response_cache = None
+    
+    # Serialized response bodies expire with the cache entries they come from
+    if response_cache is not None:
+        try:
+            payload_cache = PayloadCache.from_env()
+        except Exception as e:
+            logging.error(f"Failed to initialize payload cache: {e}")
+            payload_cache = None
     
     try:
-        from scraper import DoubnutScraper
-        scraper = DoubnutScraper()
+        with startup.stage('import scraper'):
+            from scraper import DoubnutScraper
+        scraper = DoubnutScraper(cache=response_cache)
         logging.info("DoubnutScraper initialized successfully")
     except ImportError as e:
         logging.error(f"Failed to import scraper module: {e}")
@@ -42,9 +121,26 @@ def initialize_scrapers():
         logging.error(f"Failed to initialize scraper: {e}")
         scraper = None
     
+    # Serve from a crawled catalog snapshot first when one is configured
+    store_path = os.environ.get('DOUBTNUT_STORE_PATH')
+    if scraper is not None and store_path:
+        try:
+            with startup.stage('import store'):
+                from store import CatalogStore, StoreBackedScraper
+            scraper = StoreBackedScraper(scraper, CatalogStore(store_path))
+            logging.info(f"Catalog store enabled at {store_path}")
+        except Exception as e:
+            logging.error(f"Failed to open catalog store: {e}")
+    
+    # Index everything that gets scraped for /api/search
+    if scraper is not None and get_search_index() is not None:
+        from search import IndexingScraper
+        scraper = IndexingScraper(scraper, search_index)
+    
     try:
-        from video import DoubtnutScraper as VideoScraper
-        video_scraper = VideoScraper()
+        with startup.stage('import video'):
+            from video import DoubtnutScraper as VideoScraper
+        video_scraper = VideoScraper(cache=response_cache)
         logging.info("VideoScraper initialized successfully")
     except ImportError as e:
         logging.error(f"Failed to import video module: {e}")
@@ -52,9 +148,162 @@ def initialize_scrapers():
     except Exception as e:
         logging.error(f"Failed to initialize video scraper: {e}")
         video_scraper = None
+    
+    # Warm answers for /api/questions results; only useful with a cache to fill
+    if scraper is not None and response_cache is not None:
+        try:
+            from prefetch import Prefetcher
+            prefetcher = Prefetcher.from_env(scraper, video_scraper)
+            if prefetcher is not None:
+                logging.info(f"Prefetching the first {prefetcher.count} answers of question lists")
+        except Exception as e:
+            logging.error(f"Failed to initialize prefetcher: {e}")
+            prefetcher = None
+
+def get_search_index():
+    """Open the search index once; None when it is disabled or failed to open"""
+    global search_index, search_index_initialized
+    if search_index_initialized:
+        return search_index
+    with search_index_lock:
+        if not search_index_initialized:
+            try:
+                with startup.stage('import search'):
+                    from search import SearchIndex
+                search_index = SearchIndex.from_env()
+                if search_index is not None:
+                    logging.info(f"Search index opened at {search_index.path}")
+            except Exception as e:
+                logging.error(f"Failed to open search index: {e}")
+                search_index = None
+            search_index_initialized = True
+    return search_index
+
+def ensure_scrapers():
+    """Initialize the scrapers once, from whichever request thread needs them first
+    
+    Importing requests/bs4 and building sessions is left out of the cold
+    start, so /, /health and /metrics answer without paying for it. Set
+    DOUBTNUT_EAGER_INIT=1 to initialize at import time instead.
+    """
+    global scrapers_initialized
+    if scrapers_initialized:
+        return
+    with scrapers_lock:
+        if not scrapers_initialized:
+            with startup.stage('initialize_scrapers'):
+                initialize_scrapers()
+            scrapers_initialized = True
+
+if os.environ.get('DOUBTNUT_EAGER_INIT') == '1':
+    ensure_scrapers()
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    metrics.HTTP_IN_FLIGHT.inc()
 
-# Initialize scrapers
-initialize_scrapers()
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    start = g.get('request_start')
+    if start is not None:
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, route=route, method=request.method)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    if g.pop('request_start', None) is not None:
+        metrics.HTTP_IN_FLIGHT.dec()
+
+@app.before_request
+def start_request_timing():
+    timing.start_request()
+
+@app.after_request
+def add_request_timing(response):
+    """Report phase timings as Server-Timing, and in the body with ?debug=timing"""
+    timings = timing.current()
+    if timings is None:
+        return response
+    
+    if request.args.get('debug') == 'timing' and response.is_json and not response.is_streamed:
+        payload = response.get_json()
+        if isinstance(payload, dict):
+            payload['timings'] = timings.as_dict()
+            response.set_data(jsonify(payload).get_data())
+    
+    response.headers['Server-Timing'] = timings.server_timing()
+    return response
+
+@app.teardown_request
+def finish_request_timing(error=None):
+    timing.end_request()
+
+@app.after_request
+def add_http_caching(response):
+    """ETag, Cache-Control and 304 Not Modified for successful /api/* GETs"""
+    if not request.path.startswith('/api/') or request.method not in ('GET', 'HEAD') or response.is_streamed:
+        return response
+    
+    # Errors, partial results and debug output must not be reused by clients or the CDN
+    if response.status_code != 200 or request.args.get('debug') or g.get('incomplete'):
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    
+    if response.get_etag()[0] is None:
+        response.set_etag(content_etag(response.get_data()))
+    
+    smaxage = HTTP_SMAXAGE.get(request.endpoint)
+    if smaxage is None:
+        response.headers['Cache-Control'] = 'no-cache'
+    else:
+        response.headers['Cache-Control'] = f'public, max-age={min(HTTP_MAX_AGE, smaxage)}, s-maxage={smaxage}'
+    return response.make_conditional(request)
+
+# Registered after the timing hook so a cold first request shows the load as 'init'
+@app.before_request
+def load_scrapers():
+    if request.endpoint is not None and request.endpoint not in SCRAPER_FREE_ENDPOINTS:
+        with timing.phase('init'):
+            ensure_scrapers()
+
+def cached_payload(key):
+    """Response for a stored serialized body, or None if there is none (or ?debug is set)"""
+    if payload_cache is None or request.args.get('debug'):
+        return None
+    
+    with timing.phase('cache'):
+        entry = payload_cache.get(key)
+    if entry is None:
+        return None
+    
+    body, encoding = entry.body(request.accept_encodings[entry.codec] > 0)
+    response = Response(body, mimetype='application/json')
+    # Each encoding is its own representation, with its own ETag
+    response.set_etag(f'{entry.etag}-{encoding}' if encoding else entry.etag)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def payload_json(key, payload, sources):
+    """jsonify() a route's result and keep the body for cached_payload()
+    
+    `sources` lists the (endpoint, key) scraper cache entries the payload was
+    built from; the body is kept until the first of them expires, and not at
+    all if any of them is missing or already stale.
+    """
+    response = jsonify(payload)
+    if payload_cache is None:
+        return response
+    
+    expiries = [response_cache.expires_at(endpoint, source_key) for endpoint, source_key in sources]
+    if expiries and None not in expiries and min(expiries) > time.time():
+        payload_cache.set(key, response.get_data(), min(expiries))
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
 @app.route('/')
 def index():
@@ -63,14 +312,20 @@ def index():
         'success': True,
         'message': 'Doubtnut Scraper API is running',
         'status': {
-            'scraper_available': scraper is not None,
-            'video_scraper_available': video_scraper is not None
+            # None until the first request that needs the scrapers loads them
+            'scraper_available': scraper is not None if scrapers_initialized else None,
+            'video_scraper_available': video_scraper is not None if scrapers_initialized else None
         },
         'endpoints': {
             'books': '/api/books?class=11',
             'book_chapters': '/api/book?path=BOOK_PATH',
+            'book_questions': '/api/book/questions?path=BOOK_PATH',
+            'export': '/api/export?book=BOOK_PATH',
             'questions': '/api/questions?path=CHAPTER_PATH',
-            'answer': '/api/answer?id=QNA_ID'
+            'answer': '/api/answer?id=QNA_ID',
+            'answers': '/api/answers?ids=QNA_ID,QNA_ID',
+            'search': '/api/search?q=QUERY&class=11',
+            'metrics': '/metrics'
         }
     })
 
@@ -94,6 +349,10 @@ def get_books():
             'message': 'Class number must be between 6 and 12'
         }), 400
     
+    cached_response = cached_payload(f'books:{class_number}')
+    if cached_response is not None:
+        return cached_response
+    
     try:
         books = scraper.get_all_books(class_number)
         
@@ -107,12 +366,12 @@ def get_books():
                 seen_endpoints.add(endpoint)
                 unique_books.append(book)
         
-        return jsonify({
+        return payload_json(f'books:{class_number}', {
             'success': True,
             'data': unique_books,
             'class': class_number,
             'count': len(unique_books)
-        })
+        }, [('books', class_number)])
     except Exception as e:
         logging.error(f"Error fetching books: {str(e)}")
         return jsonify({
@@ -140,14 +399,18 @@ def get_book_chapters():
             'message': 'Please provide a book path parameter'
         }), 400
     
+    cached_response = cached_payload(f'book:{book_path}')
+    if cached_response is not None:
+        return cached_response
+    
     try:
         chapters = scraper.get_book_chapters(book_path)
-        return jsonify({
+        return payload_json(f'book:{book_path}', {
             'success': True,
             'data': chapters,
             'book_path': book_path,
             'count': len(chapters)
-        })
+        }, [('chapters', book_path)])
     except Exception as e:
         logging.error(f"Error fetching book chapters: {str(e)}")
         return jsonify({
@@ -175,23 +438,24 @@ def get_questions():
             'message': 'Please provide a question path parameter'
         }), 400
     
+    cached_response = cached_payload(f'questions:{question_path}')
+    if cached_response is not None:
+        if prefetcher is not None:
+            prefetcher.submit_questions(question_path)
+        return cached_response
+    
     try:
-        questions_data = scraper.get_questions(question_path)
+        clean_questions = clean_questions_data(scraper.get_questions(question_path))
         
-        # Clean the questions data - only keep qna_id and cleaned question
-        clean_questions = []
-        for question in questions_data:
-            clean_question = question.get('question', '').replace('View Solution', '').strip()
-            clean_questions.append({
-                'qna_id': question.get('qna_id', ''),
-                'question': clean_question
-            })
+        # Clients usually open the first answers next
+        if prefetcher is not None:
+            prefetcher.submit([question['qna_id'] for question in clean_questions])
         
-        return jsonify({
+        return payload_json(f'questions:{question_path}', {
             'success': True,
             'data': clean_questions,
             'count': len(clean_questions)
-        })
+        }, [('questions', question_path)])
     except Exception as e:
         logging.error(f"Error fetching questions: {str(e)}")
         return jsonify({
@@ -200,6 +464,192 @@ def get_questions():
             'message': f'Failed to fetch questions for path: {question_path}'
         }), 500
 
+def iter_book_questions(book_path, chapters, per_question=False):
+    """Yield records for every sub-section of a book as its question page arrives
+    
+    At most BATCH_WORKERS sub-section pages are in flight at once on the
+    shared pool (the rate limiter paces them), so memory stays flat however
+    large the book is.
+    """
+    stream = BookQuestions(book_path, chapters, per_question, BATCH_WORKERS)
+    yield stream.header()
+    
+    executor = get_batch_executor()
+    pending = {}
+    remaining = iter(stream.sections)
+    
+    def submit_next():
+        for chapter_name, section in remaining:
+            future = executor.submit(scraper.get_questions, section['endpoint'])
+            pending[future] = (chapter_name, section)
+            return
+    
+    try:
+        for _ in range(stream.window):
+            submit_next()
+        
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                section_item = pending.pop(future)
+                submit_next()
+                yield from stream.records(section_item, future)
+    finally:
+        # Client went away: don't fetch pages nobody will read
+        for future in pending:
+            future.cancel()
+    
+    yield stream.trailer()
+
+@app.route('/api/book/questions')
+def get_book_questions():
+    """Stream all questions of a book as NDJSON, one record per sub-section"""
+    if scraper is None:
+        return jsonify({
+            'success': False,
+            'error': 'Scraper module not available',
+            'message': 'The scraper module could not be initialized'
+        }), 503
+    
+    book_path = request.args.get('path')
+    
+    if not book_path:
+        return jsonify({
+            'success': False,
+            'error': 'Missing required parameter: path',
+            'message': 'Please provide a book path parameter'
+        }), 400
+    
+    per_question = request.args.get('per') == 'question'
+    
+    try:
+        chapters = scraper.get_book_chapters(book_path)
+    except Exception as e:
+        logging.error(f"Error fetching book chapters: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': f'Failed to fetch chapters for book: {book_path}'
+        }), 500
+    
+    records = iter_book_questions(book_path, chapters, per_question)
+    body = (json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+    return Response(stream_with_context(body), mimetype='application/x-ndjson')
+
+@app.route('/api/export')
+def export_archive():
+    """Stream a book or a whole class, with answers and video URLs, as a compressed JSONL archive"""
+    if scraper is None:
+        return jsonify({
+            'success': False,
+            'error': 'Scraper module not available',
+            'message': 'The scraper module could not be initialized'
+        }), 503
+    
+    from export import EXPORT_CODECS, iter_archive, iter_export, parse_cursor, unique_book_paths
+    from payloads import default_codec
+    
+    book_path = request.args.get('book')
+    class_number = request.args.get('class', type=int)
+    after = request.args.get('after') or None
+    codec = request.args.get('codec', 'gzip')
+    
+    if not book_path and class_number is None:
+        return jsonify({
+            'success': False,
+            'error': 'Missing required parameter: book or class',
+            'message': 'Please provide a book path or a class number'
+        }), 400
+    
+    if class_number is not None and (class_number < 6 or class_number > 12):
+        return jsonify({
+            'success': False,
+            'error': 'Invalid class number',
+            'message': 'Class number must be between 6 and 12'
+        }), 400
+    
+    try:
+        parse_cursor(after)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'after must be the cursor of a question record, e.g. 0.12.7'
+        }), 400
+    
+    if codec not in EXPORT_CODECS or (codec == 'zstd' and default_codec() != 'zstd'):
+        return jsonify({
+            'success': False,
+            'error': f'Unsupported codec: {codec}',
+            'message': 'Supported codecs are gzip and zstd (zstd needs the zstandard package)'
+        }), 400
+    
+    # A book that can't be loaded is an error response, not an archive holding one error record
+    chapters = {}
+    if book_path:
+        book_paths = [book_path]
+        name = book_path.rstrip('/').rsplit('/', 1)[-1]
+        try:
+            chapters[book_path] = scraper.get_book_chapters(book_path)
+        except Exception as e:
+            logging.error(f"Error fetching book chapters: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': str(e),
+                'message': f'Failed to fetch chapters for book: {book_path}'
+            }), 500
+    else:
+        try:
+            book_paths = unique_book_paths(scraper.get_all_books(class_number))
+        except Exception as e:
+            logging.error(f"Error fetching books: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': str(e),
+                'message': f'Failed to fetch books from Doubtnut for class {class_number}'
+            }), 500
+        name = f'class-{class_number}'
+    
+    # Later failures can't change the status any more; the archive's end record lists them
+    records = iter_export(
+        scraper, book_paths, video_scraper, after, get_batch_executor(), BATCH_WORKERS, chapters=chapters
+    )
+    
+    extension = EXPORT_CODECS[codec]
+    response = Response(
+        stream_with_context(iter_archive(records, codec)),
+        mimetype='application/gzip' if codec == 'gzip' else 'application/zstd'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}.jsonl{extension}"'
+    return response
+
+def fetch_clean_answer(qna_id):
+    """Fetch question, answer and video URL for a QNA ID from one page download
+    
+    Returns (data, complete); complete is False when the video lookup failed
+    in a way the response cache won't keep (a timeout, a failed verification),
+    so a retry may well find the video.
+    """
+    # Get answer and video from a single download of the qna page
+    answer_data, video_result = scraper.get_answer_with_video(qna_id, video_scraper)
+    
+    # Initialize video URL as None
+    video_url = None
+    complete = video_result is None or video_scraper.is_cacheable_result(video_result)
+    
+    if video_result is not None:
+        if video_result.get('success'):
+            video_url = video_result.get('video_url')
+        else:
+            logging.warning(f"Failed to get video URL: {video_result.get('error')}")
+    
+    # Extract only required fields
+    return {
+        'question': answer_data.get('question', ''),
+        'answer': answer_data.get('answer', ''),
+        'video_url': video_url
+    }, complete
+
 @app.route('/api/answer')
 def get_answer():
     """Get answer for a specific question with video URL"""
@@ -219,34 +669,22 @@ def get_answer():
             'message': 'Please provide a QNA ID parameter'
         }), 400
     
+    cached_response = cached_payload(f'answer:{qna_id}')
+    if cached_response is not None:
+        return cached_response
+    
     try:
-        # Get answer from scraper.py
-        answer_data = scraper.get_answer(qna_id)
+        clean_response, complete = fetch_clean_answer(qna_id)
+        if not complete:
+            g.incomplete = True
         
-        # Initialize video URL as None
-        video_url = None
-        
-        # Try to get video URL if video scraper is available
+        sources = [('answer', qna_id)]
         if video_scraper is not None:
-            try:
-                doubtnut_url = f"https://www.doubtnut.com/qna/{qna_id}"
-                video_result = video_scraper.extract_video_url(doubtnut_url)
-                if video_result.get('success'):
-                    video_url = video_result.get('video_url')
-            except Exception as e:
-                logging.warning(f"Failed to get video URL: {e}")
-        
-        # Extract only required fields
-        clean_response = {
-            'question': answer_data.get('question', ''),
-            'answer': answer_data.get('answer', ''),
-            'video_url': video_url
-        }
-        
-        return jsonify({
+            sources.append(('video', scraper._answer_url(qna_id)))
+        return payload_json(f'answer:{qna_id}', {
             'success': True,
             'data': clean_response
-        })
+        }, sources)
     except Exception as e:
         logging.error(f"Error fetching answer: {str(e)}")
         return jsonify({
@@ -255,19 +693,198 @@ def get_answer():
             'message': f'Failed to fetch answer for QNA ID: {qna_id}'
         }), 500
 
+def get_batch_executor():
+    """Shared worker pool for batch answer fetching, bounded by DOUBTNUT_BATCH_WORKERS"""
+    global batch_executor
+    if batch_executor is None:
+        with batch_executor_lock:
+            if batch_executor is None:
+                batch_executor = ThreadPoolExecutor(
+                    max_workers=BATCH_WORKERS,
+                    thread_name_prefix='batch-answer'
+                )
+    return batch_executor
+
+def _batch_qna_ids():
+    """Collect QNA ids from ?ids=, ?path= or a JSON body (list of ids or /api/questions output)"""
+    ids = []
+    
+    if request.method == 'POST':
+        payload = request.get_json(silent=True)
+        if isinstance(payload, dict):
+            payload = payload.get('ids') or payload.get('data') or []
+        if isinstance(payload, list):
+            for item in payload:
+                ids.append(item.get('qna_id') if isinstance(item, dict) else item)
+    
+    if request.args.get('ids'):
+        ids.extend(request.args.get('ids').split(','))
+    
+    question_path = request.args.get('path')
+    if question_path:
+        ids.extend(question.get('qna_id') for question in scraper.get_questions(question_path))
+    
+    # Remove blanks and duplicates while keeping the requested order
+    unique_ids = []
+    for qna_id in ids:
+        qna_id = str(qna_id).strip() if qna_id is not None else ''
+        if qna_id and qna_id not in unique_ids:
+            unique_ids.append(qna_id)
+    return unique_ids
+
+@app.route('/api/answers', methods=['GET', 'POST'])
+def get_answers():
+    """Get answers with video URLs for many QNA IDs in one response"""
+    if scraper is None:
+        return jsonify({
+            'success': False,
+            'error': 'Scraper module not available',
+            'message': 'The scraper module could not be initialized'
+        }), 503
+    
+    try:
+        qna_ids = _batch_qna_ids()
+    except Exception as e:
+        logging.error(f"Error fetching questions for batch: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': f"Failed to fetch questions for path: {request.args.get('path')}"
+        }), 500
+    
+    if not qna_ids:
+        return jsonify({
+            'success': False,
+            'error': 'Missing required parameter: ids',
+            'message': 'Please provide comma separated QNA IDs, a question path, or a JSON list of IDs'
+        }), 400
+    
+    if len(qna_ids) > BATCH_MAX_IDS:
+        return jsonify({
+            'success': False,
+            'error': 'Too many QNA IDs',
+            'message': f'A batch can contain at most {BATCH_MAX_IDS} QNA IDs'
+        }), 400
+    
+    # Upstream fetches run on the shared pool; the rate limiter paces them
+    executor = get_batch_executor()
+    # Workers run in a copy of this request's context so their phases are timed too
+    futures = [
+        executor.submit(contextvars.copy_context().run, fetch_clean_answer, qna_id)
+        for qna_id in qna_ids
+    ]
+    
+    results = []
+    failed = 0
+    for qna_id, future in zip(qna_ids, futures):
+        try:
+            data, complete = future.result()
+            if not complete:
+                g.incomplete = True
+            results.append({
+                'qna_id': qna_id,
+                'success': True,
+                'data': data
+            })
+        except Exception as e:
+            logging.error(f"Error fetching answer for QNA ID {qna_id}: {str(e)}")
+            failed += 1
+            results.append({
+                'qna_id': qna_id,
+                'success': False,
+                'error': str(e)
+            })
+    
+    if failed:
+        g.incomplete = True
+    
+    return jsonify({
+        'success': True,
+        'data': results,
+        'count': len(results),
+        'failed': failed
+    })
+
+@app.route('/api/search')
+def search_questions():
+    """Ranked full-text search over scraped questions and answers"""
+    index = get_search_index()
+    if index is None:
+        return jsonify({
+            'success': False,
+            'error': 'Search index not available',
+            'message': 'The search index is disabled or could not be opened'
+        }), 503
+    
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({
+            'success': False,
+            'error': 'Missing required parameter: q',
+            'message': 'Please provide a search query'
+        }), 400
+    
+    class_number = request.args.get('class', type=int)
+    if class_number is not None and (class_number < 6 or class_number > 12):
+        return jsonify({
+            'success': False,
+            'error': 'Invalid class number',
+            'message': 'Class number must be between 6 and 12'
+        }), 400
+    
+    book_path = request.args.get('book') or None
+    limit = request.args.get('limit', 20, type=int)
+    offset = request.args.get('offset', 0, type=int)
+    
+    try:
+        results = index.search(query, class_number, book_path, limit, offset)
+        return jsonify({
+            'success': True,
+            'query': query,
+            'data': results,
+            'count': len(results)
+        })
+    except Exception as e:
+        logging.error(f"Error searching for {query!r}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'Search failed'
+        }), 500
+
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
+    transport_stats = None
+    if scrapers_initialized:
+        # Imported here: the transport pulls in requests, which cold starts skip
+        import transport
+        transport_stats = transport.stats()
+    
     return jsonify({
         'success': True,
         'status': 'healthy',
         'python_version': sys.version,
         'modules': {
-            'scraper': scraper is not None,
-            'video_scraper': video_scraper is not None
-        }
+            'initialized': scrapers_initialized,
+            'scraper': scraper is not None if scrapers_initialized else None,
+            'video_scraper': video_scraper is not None if scrapers_initialized else None
+        },
+        'startup': startup.report(),
+        'cache': response_cache.stats() if response_cache is not None else None,
+        'payload_cache': payload_cache.stats() if payload_cache is not None else None,
+        'single_flight': get_single_flight().stats(),
+        'circuit': get_breaker().stats(),
+        'transport': transport_stats,
+        'search': search_index.stats() if search_index is not None else None,
+        'prefetch': prefetcher.stats() if prefetcher is not None else None
     })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({
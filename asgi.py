@@ -0,0 +1,645 @@
+#.  async doubtnut scraper api (ASGI)
+#.  same /api/* routes as app.py, served from one event loop
+#.  run with:  uvicorn asgi:app
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from urllib.parse import parse_qs
+
+from cache import ResponseCache
+from async_scraper import AsyncDoubtnutScraper
+from singleflight import get_single_flight
+from circuit import get_breaker
+from search import AsyncIndexingScraper, SearchIndex
+from parsepool import ParsePool
+from payloads import StreamCompressor, default_codec
+from bookstream import BookQuestions, clean_questions_data
+import export
+import metrics
+import timing
+import transport
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+BATCH_WORKERS = int(os.environ.get('DOUBTNUT_BATCH_WORKERS', 8))
+BATCH_MAX_IDS = int(os.environ.get('DOUBTNUT_BATCH_MAX_IDS', 100))
+
+response_cache = ResponseCache.from_env()
+parse_pool = ParsePool.from_env()
+scraper = AsyncDoubtnutScraper(cache=response_cache, parse_pool=parse_pool)
+search_index = SearchIndex.from_env()
+if search_index is not None:
+    # Everything scraped feeds /api/search, as in the Flask app
+    scraper = AsyncIndexingScraper(scraper, search_index)
+
+
+def _error(status, error, message):
+    return status, {
+        'success': False,
+        'error': error,
+        'message': message
+    }
+
+
+async def index(params):
+    """API Status endpoint"""
+    return 200, {
+        'success': True,
+        'message': 'Doubtnut Scraper API is running',
+        'status': {
+            'scraper_available': True,
+            'video_scraper_available': True
+        },
+        'endpoints': {
+            'books': '/api/books?class=11',
+            'book_chapters': '/api/book?path=BOOK_PATH',
+            'book_questions': '/api/book/questions?path=BOOK_PATH',
+            'export': '/api/export?book=BOOK_PATH',
+            'questions': '/api/questions?path=CHAPTER_PATH',
+            'answer': '/api/answer?id=QNA_ID',
+            'answers': '/api/answers?ids=QNA_ID,QNA_ID',
+            'search': '/api/search?q=QUERY&class=11',
+            'metrics': '/metrics'
+        }
+    }
+
+
+async def get_books(params):
+    """Scrape and return all books from class page (6-12)"""
+    try:
+        class_number = int(params.get('class', 11))
+    except ValueError:
+        class_number = 11
+
+    # Validate class number
+    if class_number < 6 or class_number > 12:
+        return _error(400, 'Invalid class number', 'Class number must be between 6 and 12')
+
+    try:
+        books = await scraper.get_all_books(class_number)
+
+        # Remove duplicates based on endpoint
+        seen_endpoints = set()
+        unique_books = []
+
+        for book in books:
+            endpoint = book.get('endpoint')
+            if endpoint not in seen_endpoints:
+                seen_endpoints.add(endpoint)
+                unique_books.append(book)
+
+        return 200, {
+            'success': True,
+            'data': unique_books,
+            'class': class_number,
+            'count': len(unique_books)
+        }
+    except Exception as e:
+        logging.error(f"Error fetching books: {str(e)}")
+        return _error(500, str(e), f'Failed to fetch books from Doubtnut for class {class_number}')
+
+
+async def get_book_chapters(params):
+    """Get chapters and sub-sections for a specific book"""
+    book_path = params.get('path')
+
+    if not book_path:
+        return _error(400, 'Missing required parameter: path', 'Please provide a book path parameter')
+
+    try:
+        chapters = await scraper.get_book_chapters(book_path)
+        return 200, {
+            'success': True,
+            'data': chapters,
+            'book_path': book_path,
+            'count': len(chapters)
+        }
+    except Exception as e:
+        logging.error(f"Error fetching book chapters: {str(e)}")
+        return _error(500, str(e), f'Failed to fetch chapters for book: {book_path}')
+
+
+async def iter_book_questions(book_path, chapters, per_question=False):
+    """Yield records for every sub-section of a book as its question page arrives
+
+    At most BATCH_WORKERS sub-section pages are in flight at once.
+    """
+    stream = BookQuestions(book_path, chapters, per_question, BATCH_WORKERS)
+    yield stream.header()
+
+    pending = {}
+    remaining = iter(stream.sections)
+
+    def submit_next():
+        for chapter_name, section in remaining:
+            task = asyncio.ensure_future(scraper.get_questions(section['endpoint']))
+            pending[task] = (chapter_name, section)
+            return
+
+    try:
+        for _ in range(stream.window):
+            submit_next()
+
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                section_item = pending.pop(task)
+                submit_next()
+                for record in stream.records(section_item, task):
+                    yield record
+    finally:
+        # Client went away: don't fetch pages nobody will read
+        for task in pending:
+            task.cancel()
+
+    yield stream.trailer()
+
+
+async def get_book_questions(params):
+    """Stream all questions of a book as NDJSON, one record per sub-section"""
+    book_path = params.get('path')
+
+    if not book_path:
+        return _error(400, 'Missing required parameter: path', 'Please provide a book path parameter')
+
+    try:
+        chapters = await scraper.get_book_chapters(book_path)
+    except Exception as e:
+        logging.error(f"Error fetching book chapters: {str(e)}")
+        return _error(500, str(e), f'Failed to fetch chapters for book: {book_path}')
+
+    return 200, iter_book_questions(book_path, chapters, params.get('per') == 'question')
+
+
+class Archive:
+    """Route result streamed as a compressed JSONL file download"""
+
+    def __init__(self, records, codec, filename):
+        self.records = records
+        self.codec = codec
+        self.filename = filename
+
+
+async def export_answer(qna_id):
+    return export.answer_fields(*await scraper.get_answer_with_video(qna_id))
+
+
+async def iter_export(book_paths, after=None, chapters=None):
+    """Async driver for export.ExportRecords; up to BATCH_WORKERS answers are fetched ahead"""
+    stream = export.ExportRecords(book_paths, after)
+    known_chapters = chapters or {}
+    pending = deque()
+
+    async def ready(limit):
+        while len(pending) > limit:
+            record, task = pending.popleft()
+            if task is not None:
+                try:
+                    stream.answered(record, await task)
+                except Exception as e:
+                    stream.answered(record, error=e)
+            yield record
+
+    async def queue(records):
+        for record in records:
+            task = None
+            if record['type'] == 'question':
+                task = asyncio.ensure_future(export_answer(record['qna_id']))
+            pending.append((record, task))
+            async for ready_record in ready(BATCH_WORKERS):
+                yield ready_record
+
+    try:
+        for book_index, book_path in stream.books():
+            book_chapters, error = known_chapters.get(book_path), None
+            if book_chapters is None:
+                try:
+                    book_chapters = await scraper.get_book_chapters(book_path)
+                except Exception as e:
+                    error = e
+            records, sub_sections = stream.book(book_index, book_path, book_chapters, error)
+            async for record in queue(records):
+                yield record
+
+            for sub_section in sub_sections:
+                questions, error = None, None
+                try:
+                    questions = await scraper.get_questions(sub_section[3]['endpoint'])
+                except Exception as e:
+                    error = e
+                async for record in queue(stream.questions(sub_section, questions, error)):
+                    yield record
+        async for record in ready(0):
+            yield record
+    finally:
+        # Client went away: don't fetch answers nobody will read
+        for _, task in pending:
+            if task is not None:
+                task.cancel()
+
+    yield stream.end()
+
+
+async def export_archive(params):
+    """Stream a book or a whole class, with answers and video URLs, as a compressed JSONL archive"""
+    book_path = params.get('book')
+    codec = params.get('codec', 'gzip')
+
+    after = params.get('after') or None
+
+    try:
+        class_number = int(params['class']) if params.get('class') else None
+    except ValueError:
+        return _error(400, 'Invalid parameter', 'class must be an integer')
+
+    try:
+        export.parse_cursor(after)
+    except ValueError as e:
+        return _error(400, str(e), 'after must be the cursor of a question record, e.g. 0.12.7')
+
+    if not book_path and class_number is None:
+        return _error(400, 'Missing required parameter: book or class', 'Please provide a book path or a class number')
+
+    if class_number is not None and (class_number < 6 or class_number > 12):
+        return _error(400, 'Invalid class number', 'Class number must be between 6 and 12')
+
+    if codec not in export.EXPORT_CODECS or (codec == 'zstd' and default_codec() != 'zstd'):
+        return _error(
+            400, f'Unsupported codec: {codec}',
+            'Supported codecs are gzip and zstd (zstd needs the zstandard package)'
+        )
+
+    chapters = {}
+    if book_path:
+        book_paths = [book_path]
+        name = book_path.rstrip('/').rsplit('/', 1)[-1]
+        try:
+            chapters[book_path] = await scraper.get_book_chapters(book_path)
+        except Exception as e:
+            logging.error(f"Error fetching book chapters: {str(e)}")
+            return _error(500, str(e), f'Failed to fetch chapters for book: {book_path}')
+    else:
+        try:
+            book_paths = export.unique_book_paths(await scraper.get_all_books(class_number))
+        except Exception as e:
+            logging.error(f"Error fetching books: {str(e)}")
+            return _error(500, str(e), f'Failed to fetch books from Doubtnut for class {class_number}')
+        name = f'class-{class_number}'
+
+    records = iter_export(book_paths, after, chapters)
+    return 200, Archive(records, codec, f'{name}.jsonl{export.EXPORT_CODECS[codec]}')
+
+
+async def get_questions(params):
+    """Get questions for a specific chapter section"""
+    question_path = params.get('path')
+
+    if not question_path:
+        return _error(400, 'Missing required parameter: path', 'Please provide a question path parameter')
+
+    try:
+        clean_questions = clean_questions_data(await scraper.get_questions(question_path))
+
+        return 200, {
+            'success': True,
+            'data': clean_questions,
+            'count': len(clean_questions)
+        }
+    except Exception as e:
+        logging.error(f"Error fetching questions: {str(e)}")
+        return _error(500, str(e), f'Failed to fetch questions for path: {question_path}')
+
+
+async def fetch_clean_answer(qna_id):
+    """Fetch question, answer and video URL for a QNA ID from one page download"""
+    answer_data, video_result = await scraper.get_answer_with_video(qna_id)
+
+    video_url = None
+    if video_result is not None:
+        if video_result.get('success'):
+            video_url = video_result.get('video_url')
+        else:
+            logging.warning(f"Failed to get video URL: {video_result.get('error')}")
+
+    return {
+        'question': answer_data.get('question', ''),
+        'answer': answer_data.get('answer', ''),
+        'video_url': video_url
+    }
+
+
+async def get_answer(params):
+    """Get answer for a specific question with video URL"""
+    qna_id = params.get('id')
+
+    if not qna_id:
+        return _error(400, 'Missing required parameter: id', 'Please provide a QNA ID parameter')
+
+    try:
+        return 200, {
+            'success': True,
+            'data': await fetch_clean_answer(qna_id)
+        }
+    except Exception as e:
+        logging.error(f"Error fetching answer: {str(e)}")
+        return _error(500, str(e), f'Failed to fetch answer for QNA ID: {qna_id}')
+
+
+async def get_answers(params, body=None):
+    """Get answers with video URLs for many QNA IDs in one response
+
+    Ids come from a POSTed JSON body (a list of ids, or a dict with 'ids'
+    or 'data' such as /api/questions output), ?ids= and ?path=, as in
+    app.py's _batch_qna_ids.
+    """
+    ids = []
+    if isinstance(body, dict):
+        body = body.get('ids') or body.get('data') or []
+    if isinstance(body, list):
+        for item in body:
+            ids.append(item.get('qna_id') if isinstance(item, dict) else item)
+
+    ids.extend(params.get('ids', '').split(','))
+
+    question_path = params.get('path')
+    if question_path:
+        try:
+            ids.extend(question.get('qna_id') for question in await scraper.get_questions(question_path))
+        except Exception as e:
+            logging.error(f"Error fetching questions for batch: {str(e)}")
+            return _error(500, str(e), f'Failed to fetch questions for path: {question_path}')
+
+    # Remove blanks and duplicates while keeping the requested order
+    qna_ids = []
+    for qna_id in ids:
+        qna_id = str(qna_id).strip() if qna_id is not None else ''
+        if qna_id and qna_id not in qna_ids:
+            qna_ids.append(qna_id)
+
+    if not qna_ids:
+        return _error(400, 'Missing required parameter: ids',
+                      'Please provide comma separated QNA IDs or a question path')
+
+    if len(qna_ids) > BATCH_MAX_IDS:
+        return _error(400, 'Too many QNA IDs', f'A batch can contain at most {BATCH_MAX_IDS} QNA IDs')
+
+    semaphore = asyncio.Semaphore(BATCH_WORKERS)
+
+    async def fetch_one(qna_id):
+        async with semaphore:
+            try:
+                return {
+                    'qna_id': qna_id,
+                    'success': True,
+                    'data': await fetch_clean_answer(qna_id)
+                }
+            except Exception as e:
+                logging.error(f"Error fetching answer for QNA ID {qna_id}: {str(e)}")
+                return {
+                    'qna_id': qna_id,
+                    'success': False,
+                    'error': str(e)
+                }
+
+    results = await asyncio.gather(*(fetch_one(qna_id) for qna_id in qna_ids))
+    failed = sum(1 for result in results if not result['success'])
+
+    return 200, {
+        'success': True,
+        'data': results,
+        'count': len(results),
+        'failed': failed
+    }
+
+
+async def search_questions(params):
+    """Ranked full-text search over scraped questions and answers"""
+    if search_index is None:
+        return _error(503, 'Search index not available', 'The search index is disabled or could not be opened')
+
+    query = params.get('q', '').strip()
+    if not query:
+        return _error(400, 'Missing required parameter: q', 'Please provide a search query')
+
+    try:
+        class_number = int(params['class']) if params.get('class') else None
+        limit = int(params.get('limit', 20))
+        offset = int(params.get('offset', 0))
+    except ValueError:
+        return _error(400, 'Invalid parameter', 'class, limit and offset must be integers')
+    if class_number is not None and (class_number < 6 or class_number > 12):
+        return _error(400, 'Invalid class number', 'Class number must be between 6 and 12')
+
+    try:
+        results = await asyncio.to_thread(
+            search_index.search, query, class_number, params.get('book') or None, limit, offset
+        )
+        return 200, {
+            'success': True,
+            'query': query,
+            'data': results,
+            'count': len(results)
+        }
+    except Exception as e:
+        logging.error(f"Error searching for {query!r}: {str(e)}")
+        return _error(500, str(e), 'Search failed')
+
+
+async def health_check(params):
+    """Health check endpoint"""
+    return 200, {
+        'success': True,
+        'status': 'healthy',
+        'python_version': sys.version,
+        'modules': {
+            'scraper': True,
+            'video_scraper': True
+        },
+        'cache': response_cache.stats() if response_cache is not None else None,
+        'single_flight': get_single_flight().stats(),
+        'circuit': get_breaker().stats(),
+        'transport': transport.stats(),
+        'search': search_index.stats() if search_index is not None else None,
+        'parse_pool': parse_pool.stats() if parse_pool is not None else None
+    }
+
+
+ROUTES = {
+    '/': index,
+    '/api/books': get_books,
+    '/api/book': get_book_chapters,
+    '/api/book/questions': get_book_questions,
+    '/api/export': export_archive,
+    '/api/questions': get_questions,
+    '/api/answer': get_answer,
+    '/api/answers': get_answers,
+    '/api/search': search_questions,
+    '/health': health_check,
+}
+
+# Routes that also take a JSON request body when POSTed
+POST_ROUTES = {
+    '/api/answers': get_answers,
+}
+
+
+async def _send_json(send, status, payload, headers=()):
+    # Same encoding as Flask's jsonify
+    body = (json.dumps(payload, sort_keys=True, separators=(',', ':')) + '\n').encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii')),
+            *headers
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_ndjson(send, status, records, headers=()):
+    """Stream an async iterator of records, one JSON line per chunk"""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/x-ndjson'), *headers]
+    })
+    try:
+        async for record in records:
+            line = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+            await send({'type': 'http.response.body', 'body': line, 'more_body': True})
+    finally:
+        await records.aclose()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _send_archive(send, status, archive, headers=()):
+    """Stream an Archive's records as a compressed JSONL download"""
+    content_type = b'application/gzip' if archive.codec == 'gzip' else b'application/zstd'
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type),
+            (b'content-disposition', f'attachment; filename="{archive.filename}"'.encode('utf-8')),
+            *headers
+        ]
+    })
+    compressor = StreamCompressor(archive.codec)
+    index = 0
+    try:
+        async for record in archive.records:
+            index += 1
+            chunk = compressor.compress(export.encode_record(record))
+            if index % export.FLUSH_EVERY == 0:
+                chunk += compressor.sync()
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        await archive.records.aclose()
+    await send({'type': 'http.response.body', 'body': compressor.finish()})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await scraper.aclose()
+            if parse_pool is not None:
+                parse_pool.shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI application"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    route = scope['path'] if scope['path'] in ROUTES or scope['path'] == '/metrics' else 'unmatched'
+    method = scope.get('method', 'GET')
+    start = time.perf_counter()
+    metrics.HTTP_IN_FLIGHT.inc()
+    status = 500
+    timing.start_request()
+    try:
+        status = await _dispatch(scope, receive, send)
+    finally:
+        timing.end_request()
+        metrics.HTTP_IN_FLIGHT.dec()
+        metrics.HTTP_REQUESTS.inc(route=route, method=method, status=status)
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, route=route, method=method)
+
+
+async def _read_json(receive):
+    """Request body parsed as JSON, or None if it is empty or malformed (like Flask's get_json(silent=True))"""
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    try:
+        return json.loads(b''.join(chunks).decode('utf-8'))
+    except ValueError:
+        return None
+
+
+async def _dispatch(scope, receive, send):
+    """Run the route handler and send its response; returns the status code"""
+    if scope['path'] == '/metrics':
+        body = metrics.render().encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', metrics.CONTENT_TYPE.encode('ascii')),
+                (b'content-length', str(len(body)).encode('ascii')),
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+        return 200
+
+    query = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+    params = {key: values[0] for key, values in query.items()}
+
+    handler = ROUTES.get(scope['path'])
+    if handler is None:
+        status, payload = _error(404, 'Not Found', 'The requested endpoint was not found')
+    else:
+        try:
+            if scope.get('method') == 'POST' and scope['path'] in POST_ROUTES:
+                status, payload = await POST_ROUTES[scope['path']](params, await _read_json(receive))
+            else:
+                status, payload = await handler(params)
+        except Exception as e:
+            logging.error(f"Unhandled error: {str(e)}")
+            status, payload = _error(500, 'Internal Server Error', 'An unexpected error occurred')
+
+    # Phase timings so far, as Server-Timing and with ?debug=timing in the body
+    timings = timing.current()
+    headers = [(b'server-timing', timings.server_timing().encode('ascii'))]
+
+    if isinstance(payload, Archive):
+        await _send_archive(send, status, payload, headers)
+    elif hasattr(payload, '__aiter__'):
+        await _send_ndjson(send, status, payload, headers)
+    else:
+        if params.get('debug') == 'timing':
+            payload['timings'] = timings.as_dict()
+        await _send_json(send, status, payload, headers)
+    return status
@@ -0,0 +1,342 @@
+import os
+import asyncio
+import logging
+from urllib.parse import urljoin
+
+import httpx
+
+from cache import MISS, NotModified, conditional_headers, record_validators
+from ratelimit import get_limiter, backoff_delay
+from scraper import DoubnutScraper
+from singleflight import get_single_flight
+from metrics import UpstreamCall, record_retry
+from transport import HTTPXSession
+from circuit import CircuitOpenError, get_breaker, is_upstream_failure
+from video import DoubtnutScraper as VideoScraper
+
+
+class AsyncDoubtnutScraper:
+    """Asyncio front end for DoubnutScraper and the video scraper
+
+    Pages are downloaded through one shared httpx.AsyncClient connection
+    pool, so a single event loop can keep hundreds of upstream requests in
+    flight. Parsing and extraction reuse the sync scrapers' _process_*
+    methods in worker threads, so results are identical to the sync API.
+    With a ParsePool those threads hand the work on to parser processes.
+    """
+
+    def __init__(self, cache=None, max_connections=None, parse_pool=None):
+        self.cache = cache
+        if parse_pool is not None:
+            from parsepool import ProcessPoolScraper
+            self.scraper = ProcessPoolScraper(parse_pool, cache=cache)
+        else:
+            self.scraper = DoubnutScraper(cache=cache)
+        self.video_scraper = VideoScraper(cache=cache)
+        self.limiter = get_limiter()
+        self.max_connections = max_connections or int(os.environ.get('DOUBTNUT_ASYNC_MAX_CONNECTIONS', 100))
+        self._client = None
+        self._refresh_tasks = set()
+
+    @property
+    def base_url(self):
+        return self.scraper.base_url
+
+    def _get_client(self):
+        """Shared async client, created lazily inside the running event loop"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=dict(self.video_scraper.session.headers),
+                timeout=10,
+                follow_redirects=True,
+                # Same protocol choice as the shared sync transport
+                http2=isinstance(self.video_scraper.session, HTTPXSession),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _fetch(self, url):
+        """One rate-limited, circuit-guarded upstream GET"""
+        breaker = get_breaker()
+        breaker.before_request()
+        headers = conditional_headers()
+        try:
+            wait = self.limiter.reserve()  # Rate limiting
+            if wait:
+                await asyncio.sleep(wait)
+            with UpstreamCall(url) as call:
+                response = await self._get_client().get(url, headers=headers)
+                call.status = response.status_code
+        except httpx.TransportError:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled or failed without an answer; must not hold a half-open trial
+            breaker.record_abandoned()
+            raise
+        if is_upstream_failure(response.status_code):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        if response.status_code == 304 and headers:
+            raise NotModified(url)
+        response.raise_for_status()
+        record_validators(response.headers)
+        return response
+
+    async def _make_request(self, url, max_retries=3, delay=1):
+        """Async counterpart of DoubnutScraper._make_request"""
+        for attempt in range(max_retries):
+            try:
+                if attempt:
+                    record_retry(url)
+                return await self._fetch(url)
+            except httpx.HTTPError as e:
+                logging.warning(f"Request attempt {attempt + 1} failed for {url}: {str(e)}")
+                if attempt == max_retries - 1:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, delay))
+
+    async def _cached(self, endpoint, key, compute, should_cache=None):
+        """Async counterpart of ResponseCache.get_or_compute"""
+        flight_key = f"{endpoint}:{key}"
+        if self.cache is None:
+            return await get_single_flight().do_async(flight_key, compute)
+
+        value = self.cache.get(endpoint, key)
+        if value is not MISS:
+            return value
+
+        def compute_and_store():
+            return get_single_flight().do_async(
+                flight_key,
+                lambda: self._compute_and_store(endpoint, key, compute, should_cache)
+            )
+
+        stale = self.cache.get_stale(endpoint, key)
+        if stale is not None and self.cache.in_grace(stale):
+            self._refresh_in_background(flight_key, compute_and_store)
+            return self.cache.serve_stale(endpoint, stale[0], 'stale_served')
+
+        try:
+            return await compute_and_store()
+        except NotModified:
+            raise
+        except Exception as e:
+            if stale is None:
+                raise
+            logging.warning(f"Serving stale {flight_key} after upstream failure: {str(e)}")
+            return self.cache.serve_stale(endpoint, stale[0], 'stale_on_error')
+
+    def _refresh_in_background(self, refresh_key, refresh):
+        """Async counterpart of ResponseCache.refresh_in_background: run refresh() as a task"""
+        if not self.cache.begin_refresh(refresh_key):
+            return
+
+        async def run():
+            try:
+                await refresh()
+            except Exception as e:
+                logging.warning(f"Background refresh of {refresh_key} failed: {str(e)}")
+            finally:
+                self.cache.end_refresh(refresh_key)
+
+        # Keep a reference so the task isn't garbage collected mid-flight
+        task = asyncio.ensure_future(run())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _compute_and_store(self, endpoint, key, compute, should_cache):
+        stale, revalidation, token = self.cache.start_revalidation(endpoint, key)
+        try:
+            value = await compute()
+        except NotModified:
+            if stale is None:
+                raise
+            return self.cache.refresh_stale(endpoint, key, stale)
+        finally:
+            self.cache.finish_revalidation(token)
+
+        return self.cache.store_computed(endpoint, key, value, stale, revalidation, should_cache)
+
+    async def get_all_books(self, class_number=11):
+        """Scrape all books from class page (supports classes 6-12)"""
+        async def compute():
+            try:
+                response = await self._make_request(self.scraper._books_url(class_number))
+                books = await asyncio.to_thread(self.scraper._process_books, response.content, class_number)
+
+                logging.info(f"Found {len(books)} books")
+                return books
+
+            except NotModified:
+                raise
+            except Exception as e:
+                logging.error(f"Error scraping books: {str(e)}")
+                raise
+
+        return await self._cached('books', class_number, compute)
+
+    async def get_book_chapters(self, book_path):
+        """Get all chapters and sub-sections for a book"""
+        async def compute():
+            try:
+                response = await self._make_request(urljoin(self.base_url, book_path))
+                chapters = await asyncio.to_thread(self.scraper._process_chapters, response.content)
+
+                logging.info(f"Found {len(chapters)} chapters for book: {book_path}")
+                return chapters
+
+            except NotModified:
+                raise
+            except Exception as e:
+                logging.error(f"Error scraping book chapters: {str(e)}")
+                raise
+
+        return await self._cached('chapters', book_path, compute)
+
+    async def get_questions(self, question_path):
+        """Get all questions from a chapter section"""
+        async def compute():
+            try:
+                response = await self._make_request(urljoin(self.base_url, question_path))
+                questions = await asyncio.to_thread(self.scraper._process_questions, response.content)
+
+                logging.info(f"Found {len(questions)} questions for path: {question_path}")
+                return questions
+
+            except NotModified:
+                raise
+            except Exception as e:
+                logging.error(f"Error scraping questions: {str(e)}")
+                raise
+
+        return await self._cached('questions', question_path, compute)
+
+    async def get_answer(self, qna_id):
+        """Get question and answer text for a specific QNA ID"""
+        result, _ = await self.get_answer_with_video(qna_id, with_video=False)
+        return result
+
+    async def get_answer_with_video(self, qna_id, with_video=True):
+        """Get Q&A and video info for a QNA ID from a single page download
+
+        Returns:
+            tuple: (answer dict, video result dict or None if with_video is False)
+        """
+        video_scraper = self.video_scraper if with_video else None
+        url = self.scraper._answer_url(qna_id)
+
+        # Serve from cache when both halves are already cached
+        result, video_result = self.scraper._lookup_answer_with_video(qna_id, video_scraper)
+        if result is not MISS and video_result is not MISS:
+            return result, video_result
+
+        # Recently expired halves are served while the page is refetched
+        stale = self.scraper._stale_answer_with_video(qna_id, video_scraper, result, video_result, within_grace=True)
+        if stale is not None:
+            self._refresh_in_background(
+                f"answer_page:{qna_id}",
+                lambda: self._refresh_answer_with_video(qna_id, video_scraper)
+            )
+            return stale
+
+        async def fetch_page():
+            response = await self._make_request(url)
+            return await asyncio.to_thread(
+                self.scraper._process_answer,
+                response.content, qna_id, url,
+                video_scraper if video_result is MISS else None
+            )
+
+        try:
+            # Concurrent requests for the same page share one download
+            page_result, page_video_result = await get_single_flight().do_async(
+                f"answer_page:{qna_id}:{video_result is MISS}", fetch_page
+            )
+            logging.info(f"Successfully retrieved Q&A for QNA ID: {qna_id}")
+
+        except NotModified:
+            raise
+        except Exception as e:
+            stale = self.scraper._stale_answer_with_video(qna_id, video_scraper, result, video_result)
+            if stale is not None:
+                logging.warning(f"Serving stale Q&A for QNA ID {qna_id} after upstream failure: {str(e)}")
+                return stale
+            logging.error(f"Error scraping answer for QNA ID {qna_id}: {str(e)}")
+            raise
+
+        return self.scraper._store_answer_with_video(
+            qna_id, video_scraper, result, video_result, page_result, page_video_result
+        )
+
+    async def _refresh_answer_with_video(self, qna_id, video_scraper):
+        """Refetch a /qna/ page and overwrite both cached halves"""
+        url = self.scraper._answer_url(qna_id)
+
+        async def fetch_page():
+            response = await self._make_request(url)
+            return await asyncio.to_thread(self.scraper._process_answer, response.content, qna_id, url, video_scraper)
+
+        page_result, page_video_result = await get_single_flight().do_async(
+            f"answer_page:{qna_id}:{video_scraper is not None}", fetch_page
+        )
+        self.scraper._store_answer_with_video(
+            qna_id, video_scraper, MISS, MISS if video_scraper is not None else None,
+            page_result, page_video_result
+        )
+
+    async def extract_video_url(self, url):
+        """Async counterpart of video.DoubtnutScraper.extract_video_url"""
+        async def compute():
+            try:
+                # Validate URL
+                if not self.video_scraper._is_valid_doubtnut_url(url):
+                    return {
+                        'success': False,
+                        'error': 'Invalid Doubtnut URL format'
+                    }
+
+                # Fetch the page content
+                response = await self._fetch(url)
+
+                return await asyncio.to_thread(self.video_scraper._process_page, response.content)
+
+            except NotModified:
+                raise
+            except CircuitOpenError:
+                return {
+                    'success': False,
+                    'error': 'Doubtnut is currently unavailable. Please try again later.'
+                }
+            except httpx.TimeoutException:
+                return {
+                    'success': False,
+                    'error': 'Request timed out. Please try again.'
+                }
+            except httpx.TransportError:
+                return {
+                    'success': False,
+                    'error': 'Failed to connect to Doubtnut. Check your internet connection.'
+                }
+            except httpx.HTTPStatusError as e:
+                return {
+                    'success': False,
+                    'error': f'HTTP Error: {e.response.status_code}'
+                }
+            except Exception as e:
+                logging.error(f"Unexpected error: {str(e)}")
+                return {
+                    'success': False,
+                    'error': f'Unexpected error: {str(e)}'
+                }
+
+        return await self._cached('video', url, compute, should_cache=self.video_scraper.is_cacheable_result)
@@ -0,0 +1,114 @@
+"""Compare crawl throughput with parsing in the fetch threads against a ParsePool
+
+Fetch threads download /qna/ pages from the stub upstream and extract
+answer and video with get_answer_with_video, uncached and unthrottled.
+'threads' parses in the fetch threads, as DoubnutScraper does; 'processes'
+hands the bytes to parser processes through ProcessPoolScraper. The stub
+runs in its own process so it doesn't compete for this one's GIL.
+
+    python benchmarks/pipeline.py --pages 500 --threads 8 --parse-workers 4
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT_DIR))
+
+from parsepool import ParsePool, ProcessPoolScraper  # noqa: E402
+from run import QNA_ID, build_scrapers  # noqa: E402
+from stub_server import start_stub_server  # noqa: E402
+
+
+def _serve(urls):
+    server, base_url = start_stub_server()
+    urls.put(base_url)
+    server.serve_forever()
+
+
+def start_stub_process():
+    """Run the stub upstream in a child process; returns (process, base_url)"""
+    context = multiprocessing.get_context('spawn')
+    urls = context.Queue()
+    process = context.Process(target=_serve, args=(urls,), daemon=True)
+    process.start()
+    return process, urls.get(timeout=30)
+
+
+def crawl(scraper, video_scraper, qna_ids, threads):
+    """Fetch and process every page; returns pages per second"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for _ in executor.map(lambda qna_id: scraper.get_answer_with_video(qna_id, video_scraper), qna_ids):
+            pass
+    elapsed = time.perf_counter() - start
+    return {
+        'pages': len(qna_ids),
+        'seconds': round(elapsed, 3),
+        'pages_per_second': round(len(qna_ids) / elapsed, 1),
+    }
+
+
+def run(pages, threads, parse_workers, parse_queue, warmup):
+    process, base_url = start_stub_process()
+    try:
+        scraper, video_scraper = build_scrapers(base_url)
+        qna_ids = [str(int(QNA_ID) + index) for index in range(pages)]
+        warmup_ids = [str(int(QNA_ID) - index - 1) for index in range(warmup)]
+
+        crawl(scraper, video_scraper, warmup_ids, threads)
+        results = {'threads': crawl(scraper, video_scraper, qna_ids, threads)}
+
+        pool = ParsePool(parse_workers, parse_queue)
+        try:
+            pooled = ProcessPoolScraper(pool)
+            pooled.base_url = scraper.base_url
+            pooled.limiter = scraper.limiter
+            # Warm-up also starts the parser processes
+            crawl(pooled, video_scraper, warmup_ids, threads)
+            results['processes'] = crawl(pooled, video_scraper, qna_ids, threads)
+            results['processes'].update(pool.stats())
+        finally:
+            pool.shutdown()
+    finally:
+        process.terminate()
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'threads': threads,
+        },
+        'results': results,
+        'speedup': round(results['processes']['pages_per_second'] / results['threads']['pages_per_second'], 2),
+    }
+
+
+# Command line interface
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare in-thread parsing with a parser process pool')
+    parser.add_argument('--pages', type=int, default=300, help='Pages fetched per mode (default: 300)')
+    parser.add_argument('--threads', type=int, default=8, help='Fetch threads (default: 8)')
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count() or 1,
+                        help='Parser processes (default: CPU count)')
+    parser.add_argument('--parse-queue', type=int, help='Pages queued for parsing (default: 2 per worker)')
+    parser.add_argument('--warmup', type=int, default=20, help='Untimed pages per mode (default: 20)')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    output = json.dumps(run(args.pages, args.threads, args.parse_workers, args.parse_queue, args.warmup), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
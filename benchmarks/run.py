@@ -0,0 +1,220 @@
+"""Benchmark the scrapers against synthetic pages served by a local stub upstream
+
+Times get_all_books, get_book_chapters, get_questions, get_answer,
+get_answer_with_video and extract_video_url end to end, plus their fetch /
+parse / extract phases, for one or more parser engines. The pages are
+hand-built to mimic doubtnut.com's markup, not captured from it, so the
+numbers only say how the scrapers handle that structure. Results are
+written as JSON; pass --baseline to fail on regressions against an
+earlier run.
+
+    python benchmarks/run.py --repeat 30 --output bench.json
+    python benchmarks/run.py --engines lxml,html.parser --baseline bench.json
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import statistics
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import parsing  # noqa: E402
+import video  # noqa: E402
+from ratelimit import TokenBucket  # noqa: E402
+from scraper import DoubnutScraper  # noqa: E402
+from stub_server import start_stub_server  # noqa: E402
+
+BOOK_PATH = '/books/class-11-ncert-english-english-medium-download-questions-answers-solutions'
+QUESTION_PATH = '/books/class-11-ncert-english-solution-chapter-c01-english-medium/thinking-about-the-text'
+QNA_ID = '75909006'
+
+
+def build_scrapers(base_url):
+    """Uncached, unthrottled scrapers pointed at the stub upstream"""
+    unlimited = TokenBucket(rate=0)
+
+    scraper = DoubnutScraper()
+    scraper.base_url = base_url
+    scraper.limiter = unlimited
+
+    video_scraper = video.DoubtnutScraper()
+    video_scraper.limiter = unlimited
+    # The stub is not on doubtnut.com, and video URLs point at the real CDN
+    video_scraper._is_valid_doubtnut_url = lambda url: True
+    video.VERIFY_MODE = 'off'
+
+    return scraper, video_scraper
+
+
+def build_cases(scraper, video_scraper):
+    """Benchmark cases: an end-to-end call plus its fetch / parse / extract phases"""
+    answer_url = scraper._answer_url(QNA_ID)
+
+    def fetch(url):
+        return lambda: scraper._make_request(url).content
+
+    return {
+        'get_all_books': {
+            'end_to_end': lambda: scraper.get_all_books(11),
+            'fetch': fetch(scraper._books_url(11)),
+            'parse': lambda content: scraper._parse(content, 'books'),
+            'extract': lambda soup: scraper._extract_books(soup, 11),
+        },
+        'get_book_chapters': {
+            'end_to_end': lambda: scraper.get_book_chapters(BOOK_PATH),
+            'fetch': fetch(scraper.base_url + BOOK_PATH),
+            'parse': lambda content: scraper._parse(content, 'chapters'),
+            'extract': scraper._extract_chapters,
+        },
+        'get_questions': {
+            'end_to_end': lambda: scraper.get_questions(QUESTION_PATH),
+            'fetch': fetch(scraper.base_url + QUESTION_PATH),
+            'parse': lambda content: scraper._parse(content, 'questions'),
+            'extract': scraper._extract_questions,
+        },
+        'get_answer': {
+            'end_to_end': lambda: scraper.get_answer(QNA_ID),
+            'fetch': fetch(answer_url),
+            'parse': lambda content: scraper._parse(content, 'answer'),
+            'extract': lambda soup: scraper._extract_answer(soup, QNA_ID, answer_url),
+        },
+        'get_answer_with_video': {
+            'end_to_end': lambda: scraper.get_answer_with_video(QNA_ID, video_scraper),
+            'fetch': fetch(answer_url),
+            'parse': lambda content: scraper._parse(content, 'answer_video'),
+            'extract': lambda soup: (scraper._extract_answer(soup, QNA_ID, answer_url),
+                                     video_scraper.extract_video_from_soup(soup)),
+        },
+        'extract_video_url': {
+            'end_to_end': lambda: video_scraper.extract_video_url(answer_url),
+            'fetch': lambda: video_scraper.session.get(answer_url, timeout=10).content,
+            'parse': lambda content: parsing.make_soup(content, 'video'),
+            'extract': video_scraper.extract_video_from_soup,
+        },
+    }
+
+
+def summarize(samples):
+    """Timing statistics in milliseconds"""
+    samples = sorted(samples)
+    return {
+        'mean_ms': round(statistics.mean(samples) * 1000, 3),
+        'median_ms': round(statistics.median(samples) * 1000, 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+        'min_ms': round(samples[0] * 1000, 3),
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run_case(case, repeat, warmup):
+    samples = {'end_to_end': [], 'fetch': [], 'parse': [], 'extract': []}
+
+    for iteration in range(warmup + repeat):
+        _, end_to_end = timed(case['end_to_end'])
+        content, fetch_time = timed(case['fetch'])
+        soup, parse_time = timed(case['parse'], content)
+        _, extract_time = timed(case['extract'], soup)
+
+        if iteration >= warmup:
+            samples['end_to_end'].append(end_to_end)
+            samples['fetch'].append(fetch_time)
+            samples['parse'].append(parse_time)
+            samples['extract'].append(extract_time)
+
+    return {
+        'end_to_end': summarize(samples['end_to_end']),
+        'phases': {phase: summarize(samples[phase]) for phase in ('fetch', 'parse', 'extract')},
+    }
+
+
+def run(engines, repeat, warmup, cases=None):
+    server, base_url = start_stub_server()
+    try:
+        scraper, video_scraper = build_scrapers(base_url)
+        all_cases = build_cases(scraper, video_scraper)
+        selected = cases or list(all_cases)
+
+        results = {}
+        for engine in engines:
+            parsing._engine = engine
+            results[engine] = {name: run_case(all_cases[name], repeat, warmup) for name in selected}
+    finally:
+        server.shutdown()
+        parsing._engine = None
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'warmup': warmup,
+        },
+        'engines': results,
+    }
+
+
+def find_regressions(report, baseline, threshold):
+    """Cases whose median end-to-end time grew by more than threshold (a fraction)"""
+    regressions = []
+    for engine, cases in report['engines'].items():
+        for name, result in cases.items():
+            previous = baseline.get('engines', {}).get(engine, {}).get(name)
+            if not previous:
+                continue
+            old = previous['end_to_end']['median_ms']
+            new = result['end_to_end']['median_ms']
+            if old and (new - old) / old > threshold:
+                regressions.append({'engine': engine, 'case': name, 'baseline_ms': old, 'current_ms': new})
+    return regressions
+
+
+# Command line interface
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the Doubtnut scrapers against synthetic pages')
+    parser.add_argument('--engines', default=','.join(parsing.PARSER_ENGINES),
+                        help='Comma separated parser engines (default: all)')
+    parser.add_argument('--cases', help='Comma separated cases to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed iterations per case (default: 20)')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed iterations per case (default: 3)')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='Earlier JSON report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed median slowdown against the baseline (default: 0.2 = 20%%)')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    report = run(
+        args.engines.split(','),
+        args.repeat,
+        args.warmup,
+        args.cases.split(',') if args.cases else None
+    )
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = find_regressions(report, json.load(f), args.threshold)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if report.get('regressions'):
+        for regression in report['regressions']:
+            print(f"REGRESSION {regression['engine']} {regression['case']}: "
+                  f"{regression['baseline_ms']} ms -> {regression['current_ms']} ms", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,72 @@
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Upstream URL shapes mapped to the synthetic page that stands in for them
+ROUTES = [
+    (re.compile(r'^/books/class-\d+-all-books-download-questions-answers-solutions$'), 'books.html'),
+    (re.compile(r'^/books/[^/]+/[^/]+$'), 'questions.html'),
+    (re.compile(r'^/books/[^/]+$'), 'book.html'),
+    (re.compile(r'^/qna/\d+$'), 'qna.html'),
+]
+
+
+class StubUpstreamHandler(BaseHTTPRequestHandler):
+    """Serves the synthetic fixture pages in place of www.doubtnut.com"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    pages = {}
+
+    def _fixture(self):
+        path = self.path.split('?', 1)[0]
+        for pattern, name in ROUTES:
+            if pattern.match(path):
+                if name not in self.pages:
+                    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+                        self.pages[name] = f.read()
+                return self.pages[name]
+        return None
+
+    def do_GET(self):
+        body = self._fixture()
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_response(200 if self._fixture() is not None else 404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(host='127.0.0.1', port=0):
+    """Start the stub upstream on a background thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), StubUpstreamHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# Command line interface: serve fixtures until interrupted
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    server, base_url = start_stub_server(port=port)
+    print(f"Serving fixtures from {FIXTURES_DIR} at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
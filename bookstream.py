@@ -0,0 +1,71 @@
+import logging
+
+
+def clean_questions_data(questions_data):
+    """Clean the questions data - only keep qna_id and cleaned question"""
+    clean_questions = []
+    for question in questions_data:
+        clean_question = question.get('question', '').replace('View Solution', '').strip()
+        clean_questions.append({
+            'qna_id': question.get('qna_id', ''),
+            'question': clean_question
+        })
+    return clean_questions
+
+
+class BookQuestions:
+    """Records of a /api/book/questions stream, shared by the WSGI and ASGI apps
+
+    The apps only differ in how sub-section pages are fetched (pool threads
+    or event loop tasks): each fetches `sections` with at most `window` in
+    flight, hands every finished fetch to records() and cancels the rest
+    when the client goes away.
+    """
+
+    def __init__(self, book_path, chapters, per_question=False, window=8):
+        self.book_path = book_path
+        self.chapters = chapters
+        self.per_question = per_question
+        self.window = window
+        self.sections = [
+            (chapter['chapter_name'], section)
+            for chapter in chapters
+            for section in chapter.get('sub_sections', [])
+        ]
+        self.count = 0
+        self.failed = 0
+
+    def header(self):
+        return {
+            'type': 'book',
+            'book_path': self.book_path,
+            'chapters': len(self.chapters),
+            'sub_sections': len(self.sections)
+        }
+
+    def records(self, section_item, future):
+        """Records for one sub-section from its finished fetch (a Future or asyncio Task)"""
+        chapter_name, section = section_item
+        record = {
+            'type': 'sub_section',
+            'chapter_name': chapter_name,
+            'name': section['name'],
+            'endpoint': section['endpoint']
+        }
+        try:
+            questions = clean_questions_data(future.result())
+        except Exception as e:
+            logging.error(f"Error fetching questions for path {section['endpoint']}: {str(e)}")
+            self.failed += 1
+            return [dict(record, success=False, error=str(e))]
+
+        self.count += len(questions)
+        if self.per_question:
+            return [
+                dict(question, type='question', chapter_name=chapter_name, sub_section=section['name'])
+                for question in questions
+            ]
+        return [dict(record, success=True, data=questions, count=len(questions))]
+
+    def trailer(self):
+        return {'type': 'end', 'count': self.count, 'failed': self.failed}
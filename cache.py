@@ -0,0 +1,522 @@
+import os
+import json
+import time
+import pickle
+import sqlite3
+import logging
+import tempfile
+import threading
+import functools
+import inspect
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import timing
+from metrics import CACHE_LOOKUPS
+from singleflight import get_single_flight
+
+# Sentinel returned by cache lookups that found nothing usable
+MISS = object()
+
+# Default time-to-live per scraper entry point, in seconds
+DEFAULT_TTLS = {
+    'books': 7 * 24 * 3600,
+    'chapters': 7 * 24 * 3600,
+    'questions': 24 * 3600,
+    'answer': 6 * 3600,
+    'video': 6 * 3600,
+}
+
+# How long expired entries are kept around for conditional revalidation
+DEFAULT_STALE_RETENTION = 30 * 24 * 3600
+
+# How long after expiry an entry is still served while it is refreshed in the background
+DEFAULT_GRACE = 3600
+
+
+class NotModified(Exception):
+    """Raised by a fetch layer when upstream answered 304 to a conditional request"""
+
+
+class Revalidation:
+    """Validators of a stale cache entry being refreshed, and those of the new response"""
+
+    def __init__(self, validators):
+        self.validators = validators or {}
+        self.response_validators = None
+
+
+_revalidation = contextvars.ContextVar('doubtnut_revalidation', default=None)
+
+
+def conditional_headers():
+    """If-None-Match / If-Modified-Since headers for the fetch being revalidated, if any"""
+    revalidation = _revalidation.get()
+    if revalidation is None:
+        return {}
+
+    headers = {}
+    if revalidation.validators.get('etag'):
+        headers['If-None-Match'] = revalidation.validators['etag']
+    if revalidation.validators.get('last_modified'):
+        headers['If-Modified-Since'] = revalidation.validators['last_modified']
+    return headers
+
+
+def record_validators(response_headers):
+    """Remember ETag / Last-Modified of a fresh response so the cache can store them"""
+    revalidation = _revalidation.get()
+    if revalidation is None:
+        return
+
+    validators = {}
+    if response_headers.get('ETag'):
+        validators['etag'] = response_headers['ETag']
+    if response_headers.get('Last-Modified'):
+        validators['last_modified'] = response_headers['Last-Modified']
+    revalidation.response_validators = validators or None
+
+
+_refresh_executor = None
+_refresh_lock = threading.Lock()
+
+
+def _get_refresh_executor():
+    """Small shared pool for background refreshes of stale entries"""
+    global _refresh_executor
+    if _refresh_executor is None:
+        with _refresh_lock:
+            if _refresh_executor is None:
+                _refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-refresh')
+    return _refresh_executor
+
+
+class LRUCache:
+    """Bounded in-memory cache tier with least-recently-used eviction"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        """Return (value, expires_at) for key, or None if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def peek(self, key):
+        """Return (value, expires_at) for key even if expired, or None if absent"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCache:
+    """Persistent cache tier stored in a SQLite file, survives restarts"""
+
+    PURGE_EVERY = 500
+
+    def __init__(self, path, stale_retention=DEFAULT_STALE_RETENTION):
+        self.path = path
+        self.stale_retention = stale_retention
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)'
+        )
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(entries)')]
+        if 'validators' not in columns:
+            self._conn.execute('ALTER TABLE entries ADD COLUMN validators TEXT')
+        self._conn.commit()
+        self._writes = 0
+
+    def get(self, key, allow_expired=False):
+        """Return (value, expires_at, validators) for key, or None if absent (or expired)"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at, validators FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None or (not allow_expired and row[1] <= time.time()):
+            return None
+        try:
+            return pickle.loads(row[0]), row[1], json.loads(row[2]) if row[2] else None
+        except Exception as e:
+            logging.warning(f"Dropping unreadable cache entry {key}: {str(e)}")
+            self.delete(key)
+            return None
+
+    def set(self, key, value, expires_at, validators=None):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, expires_at, validators) VALUES (?, ?, ?, ?)',
+                (key, data, expires_at, json.dumps(validators) if validators else None)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                # Expired entries stay a while so they can be revalidated
+                self._conn.execute(
+                    'DELETE FROM entries WHERE expires_at <= ?', (time.time() - self.stale_retention,)
+                )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM entries')
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + SQLite) cache for scraper results
+
+    Entries are namespaced by endpoint ('books', 'chapters', 'questions',
+    'answer', 'video'), each with its own TTL. Entries up to `grace` seconds
+    past their TTL are served as-is while a background refresh runs, and
+    older expired entries are served when the upstream fetch fails.
+    """
+
+    def __init__(self, memory_entries=1024, disk_path=None, ttls=None, grace=DEFAULT_GRACE):
+        self.memory = LRUCache(memory_entries)
+        self.disk = None
+        if disk_path:
+            try:
+                self.disk = DiskCache(disk_path)
+            except Exception as e:
+                logging.error(f"Failed to open disk cache at {disk_path}: {str(e)}")
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.grace = grace
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'revalidated': 0,
+            'stale_served': 0,
+            'stale_on_error': 0,
+            'background_refreshes': 0,
+        }
+
+    @classmethod
+    def from_env(cls):
+        """Build a cache from DOUBTNUT_CACHE_* environment variables, or None if disabled"""
+        if os.environ.get('DOUBTNUT_CACHE', '1') == '0':
+            return None
+
+        ttls = {}
+        for endpoint in DEFAULT_TTLS:
+            value = os.environ.get(f'DOUBTNUT_CACHE_TTL_{endpoint.upper()}')
+            if value:
+                ttls[endpoint] = int(value)
+
+        disk_path = os.environ.get(
+            'DOUBTNUT_CACHE_PATH',
+            os.path.join(tempfile.gettempdir(), 'doubtnut_cache.sqlite3')
+        )
+
+        return cls(
+            memory_entries=int(os.environ.get('DOUBTNUT_CACHE_SIZE', 1024)),
+            disk_path=disk_path or None,
+            ttls=ttls,
+            grace=int(os.environ.get('DOUBTNUT_CACHE_GRACE', DEFAULT_GRACE))
+        )
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def get(self, endpoint, key):
+        """Look up a cached value, returning MISS if there is none"""
+        with timing.phase('cache'):
+            return self._lookup(endpoint, key)
+
+    def peek(self, endpoint, key, within_grace=False):
+        """Like get(), but uncounted and without promoting disk entries; for housekeeping lookups
+
+        With within_grace, entries expired less than `grace` seconds ago are
+        returned too.
+        """
+        full_key = f"{endpoint}:{key}"
+        limit = time.time() - (self.grace if within_grace else 0)
+
+        entry = self.memory.peek(full_key)
+        if entry is not None and entry[1] > limit:
+            return entry[0][0]
+
+        if self.disk is not None:
+            entry = self.disk.get(full_key, allow_expired=True)
+            if entry is not None and entry[1] > limit:
+                return entry[0]
+
+        return MISS
+
+    def _lookup(self, endpoint, key):
+        full_key = f"{endpoint}:{key}"
+
+        # Memory entries hold (value, validators)
+        entry = self.memory.get(full_key)
+        if entry is not None:
+            self._count('memory_hits')
+            CACHE_LOOKUPS.inc(endpoint=endpoint, result='memory_hit')
+            return entry[0][0]
+
+        if self.disk is not None:
+            entry = self.disk.get(full_key)
+            if entry is not None:
+                self._count('disk_hits')
+                CACHE_LOOKUPS.inc(endpoint=endpoint, result='disk_hit')
+                # Promote to the memory tier for the rest of its lifetime
+                self.memory.set(full_key, (entry[0], entry[2]), entry[1])
+                return entry[0]
+
+        self._count('misses')
+        CACHE_LOOKUPS.inc(endpoint=endpoint, result='miss')
+        return MISS
+
+    def get_stale(self, endpoint, key):
+        """(value, validators, expires_at) of an entry regardless of expiry, or None if absent"""
+        full_key = f"{endpoint}:{key}"
+
+        entry = self.memory.peek(full_key)
+        if entry is not None:
+            return entry[0][0], entry[0][1], entry[1]
+
+        if self.disk is not None:
+            entry = self.disk.get(full_key, allow_expired=True)
+            if entry is not None:
+                return entry[0], entry[2], entry[1]
+
+        return None
+
+    def expires_at(self, endpoint, key):
+        """Expiry time of the memory-tier entry for key, or None if it isn't there"""
+        entry = self.memory.peek(f"{endpoint}:{key}")
+        return entry[1] if entry is not None else None
+
+    def in_grace(self, stale):
+        """Whether a stale entry may be served while it is refreshed"""
+        return time.time() - stale[2] <= self.grace
+
+    def get_stale_value(self, endpoint, key, within_grace=False):
+        """Value of an expired entry (optionally only one within the grace window), or MISS"""
+        stale = self.get_stale(endpoint, key)
+        if stale is None or (within_grace and not self.in_grace(stale)):
+            return MISS
+        return stale[0]
+
+    def serve_stale(self, endpoint, value, reason):
+        """Count a stale value handed out instead of a fresh one; reason is 'stale_served' or 'stale_on_error'"""
+        self._count(reason)
+        CACHE_LOOKUPS.inc(endpoint=endpoint, result=reason)
+        return value
+
+    def begin_refresh(self, refresh_key):
+        """Claim a background refresh; False if one is already running for this key"""
+        with self._lock:
+            if refresh_key in self._refreshing:
+                return False
+            self._refreshing.add(refresh_key)
+            self.counters['background_refreshes'] += 1
+            return True
+
+    def end_refresh(self, refresh_key):
+        with self._lock:
+            self._refreshing.discard(refresh_key)
+
+    def refresh_in_background(self, refresh_key, refresh):
+        """Run refresh() on the refresh pool unless it is already running for this key"""
+        if not self.begin_refresh(refresh_key):
+            return
+
+        def run():
+            try:
+                refresh()
+            except Exception as e:
+                logging.warning(f"Background refresh of {refresh_key} failed: {str(e)}")
+            finally:
+                self.end_refresh(refresh_key)
+
+        _get_refresh_executor().submit(run)
+
+    def set(self, endpoint, key, value, ttl=None, validators=None):
+        full_key = f"{endpoint}:{key}"
+        if ttl is None:
+            ttl = self.ttls.get(endpoint, 3600)
+        expires_at = time.time() + ttl
+
+        self.memory.set(full_key, (value, validators), expires_at)
+        if self.disk is not None:
+            try:
+                self.disk.set(full_key, value, expires_at, validators)
+            except Exception as e:
+                logging.warning(f"Failed to write disk cache entry {full_key}: {str(e)}")
+        self._count('sets')
+
+    def start_revalidation(self, endpoint, key):
+        """Expose a stale entry's validators to the fetch about to recompute it
+
+        Returns (stale entry or None, Revalidation, context token); pass
+        all three to finish_revalidation() once the fetch is done.
+        """
+        stale = self.get_stale(endpoint, key)
+        revalidation = Revalidation(stale[1] if stale is not None else None)
+        return stale, revalidation, _revalidation.set(revalidation)
+
+    def finish_revalidation(self, token):
+        _revalidation.reset(token)
+
+    def refresh_stale(self, endpoint, key, stale):
+        """Upstream confirmed a stale entry is unchanged: keep it for another TTL"""
+        self._count('revalidated')
+        self.set(endpoint, key, stale[0], validators=stale[1])
+        return stale[0]
+
+    def delete(self, endpoint, key):
+        full_key = f"{endpoint}:{key}"
+        self.memory.delete(full_key)
+        if self.disk is not None:
+            self.disk.delete(full_key)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def get_or_compute(self, endpoint, key, compute, should_cache=None):
+        """Return the cached value for key, computing and storing it on a miss
+
+        Concurrent misses for the same key share one computation. An entry
+        within the grace window is returned at once and refreshed in the
+        background; an older one is returned if the computation fails.
+        """
+        value = self.get(endpoint, key)
+        if value is not MISS:
+            return value
+
+        full_key = f"{endpoint}:{key}"
+
+        def compute_and_store():
+            return get_single_flight().do(
+                full_key,
+                lambda: self._compute_and_store(endpoint, key, compute, should_cache)
+            )
+
+        stale = self.get_stale(endpoint, key)
+        if stale is not None and self.in_grace(stale):
+            self.refresh_in_background(full_key, compute_and_store)
+            return self.serve_stale(endpoint, stale[0], 'stale_served')
+
+        try:
+            return compute_and_store()
+        except NotModified:
+            raise
+        except Exception as e:
+            if stale is None:
+                raise
+            logging.warning(f"Serving stale {full_key} after upstream failure: {str(e)}")
+            return self.serve_stale(endpoint, stale[0], 'stale_on_error')
+
+    def _compute_and_store(self, endpoint, key, compute, should_cache):
+        stale, revalidation, token = self.start_revalidation(endpoint, key)
+        try:
+            value = compute()
+        except NotModified:
+            if stale is None:
+                raise
+            return self.refresh_stale(endpoint, key, stale)
+        finally:
+            self.finish_revalidation(token)
+
+        return self.store_computed(endpoint, key, value, stale, revalidation, should_cache)
+
+    def store_computed(self, endpoint, key, value, stale, revalidation, should_cache):
+        """Cache a freshly computed value; an uncacheable one (e.g. a transient error) yields to a stale entry"""
+        if should_cache is None or should_cache(value):
+            self.set(endpoint, key, value, validators=revalidation.response_validators)
+            return value
+        if stale is not None:
+            return self.serve_stale(endpoint, stale[0], 'stale_on_error')
+        return value
+
+    def stats(self):
+        """Hit/miss/eviction counters and tier sizes"""
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 4) if lookups else 0.0
+        stats['evictions'] = self.memory.evictions
+        stats['memory_entries'] = len(self.memory)
+        stats['memory_max_entries'] = self.memory.max_entries
+        stats['disk_entries'] = len(self.disk) if self.disk is not None else None
+        stats['ttls'] = dict(self.ttls)
+        return stats
+
+
+def cached(endpoint, should_cache=None):
+    """Cache a scraper method's result in self.cache under the given endpoint
+
+    The cache key is built from the method's bound arguments, so
+    get_all_books() and get_all_books(11) share one entry. Methods run
+    uncached when the instance has no cache. Expired entries are
+    revalidated: the method's fetch may raise NotModified to keep them.
+    Concurrent calls with the same arguments run the method once.
+    Recently expired entries are served while they are refreshed.
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            key = ':'.join(str(value) for name, value in bound.arguments.items() if name != 'self')
+
+            cache = getattr(self, 'cache', None)
+            if cache is None:
+                return get_single_flight().do(f"{endpoint}:{key}", lambda: method(self, *args, **kwargs))
+
+            return cache.get_or_compute(
+                endpoint, key,
+                lambda: method(self, *args, **kwargs),
+                should_cache=should_cache
+            )
+
+        return wrapper
+    return decorator
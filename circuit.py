@@ -0,0 +1,128 @@
+import os
+import time
+import logging
+import threading
+
+from metrics import CIRCUIT_OPEN, CIRCUIT_REJECTED
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of contacting an upstream that keeps failing"""
+
+
+class CircuitBreaker:
+    """Fail fast while the upstream is down instead of piling up blocked workers
+
+    After `failure_threshold` consecutive failed requests the circuit opens
+    and requests are rejected with CircuitOpenError. Once `reset_timeout`
+    seconds have passed a single trial request is let through: success
+    closes the circuit, failure opens it for another `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def before_request(self):
+        """Raise CircuitOpenError unless a request may go upstream now"""
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+        CIRCUIT_REJECTED.inc()
+        raise CircuitOpenError(f"Upstream circuit is open; retry in {retry_in:.0f}s")
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logging.info("Upstream recovered, closing circuit")
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+        CIRCUIT_OPEN.set(0)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            trial_failed = self._state == HALF_OPEN
+            if not trial_failed and (self._state == OPEN or self._failures < self.failure_threshold):
+                return
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+            self.opened += 1
+            failures = self._failures
+
+        logging.warning(f"Opening upstream circuit after {failures} consecutive failures")
+        CIRCUIT_OPEN.set(1)
+
+    def record_abandoned(self):
+        """A request ended without an outcome: cancelled, or an error other than a transport failure
+
+        That says nothing about the upstream, so a closed circuit ignores it.
+        A half-open circuit counts it as a failed trial and reopens, so the
+        trial slot is never left taken with nobody to release it.
+        """
+        with self._lock:
+            trial_in_flight = self._state == HALF_OPEN and self._trial_in_flight
+        if trial_in_flight:
+            self.record_failure()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'opened': self.opened,
+                'rejected': self.rejected,
+            }
+
+
+def is_upstream_failure(status_code):
+    """Responses that say the upstream is unhealthy, as opposed to a bad request"""
+    return status_code == 429 or status_code >= 500
+
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+
+def get_breaker():
+    """Return the process-wide breaker for doubtnut.com, configured from DOUBTNUT_CIRCUIT_*"""
+    global _breaker
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(
+                    failure_threshold=int(os.environ.get('DOUBTNUT_CIRCUIT_FAILURES', DEFAULT_FAILURE_THRESHOLD)),
+                    reset_timeout=float(os.environ.get('DOUBTNUT_CIRCUIT_RESET', DEFAULT_RESET_TIMEOUT))
+                )
+    return _breaker
@@ -0,0 +1,360 @@
+import sys
+import json
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from scraper import DoubnutScraper
+from video import DoubtnutScraper as VideoScraper
+from store import DIRTY_HASH, CatalogStore, StoreBackedScraper, content_hash
+
+SUPPORTED_CLASSES = range(6, 13)
+
+
+def _empty_diff():
+    """What a recrawl found: classes whose book list changed, plus added/removed/changed books, sub-sections and qna ids"""
+    return {
+        'classes': [],
+        'books': {'added': [], 'removed': [], 'changed': []},
+        'sub_sections': {'added': [], 'removed': [], 'changed': []},
+        'qna_ids': {'added': [], 'removed': [], 'changed': []},
+    }
+
+
+def _net_diff(diff):
+    """Drop duplicates, and ids that were only moved (removed in one place, added in another)"""
+    for kind in ('books', 'sub_sections', 'qna_ids'):
+        changes = diff[kind]
+        added = list(dict.fromkeys(changes['added']))
+        removed = list(dict.fromkeys(changes['removed']))
+        moved = set(added) & set(removed)
+        changes['added'] = [key for key in added if key not in moved]
+        changes['removed'] = [key for key in removed if key not in moved]
+        changes['changed'] = list(dict.fromkeys(changes['changed']))
+    return diff
+
+
+class CatalogCrawler:
+    """Walks class pages -> books -> chapters -> questions -> answers into a CatalogStore
+
+    Pages already in the store are not fetched again, so rerunning an
+    interrupted crawl resumes where it stopped. Upstream requests are paced
+    by the shared rate limiter; answers are fetched on a small thread pool.
+    """
+
+    def __init__(self, store, scraper=None, video_scraper=None, workers=4, with_answers=True):
+        self.store = store
+        self.scraper = StoreBackedScraper(scraper or DoubnutScraper(), store)
+        self.video_scraper = video_scraper or VideoScraper()
+        self.workers = workers
+        self.with_answers = with_answers
+        self.counters = {
+            'classes': 0,
+            'books': 0,
+            'sub_sections': 0,
+            'answers': 0,
+            'errors': 0,
+            'unchanged_books': 0,
+            'unchanged_sub_sections': 0,
+        }
+        self.diff = _empty_diff()
+
+    def crawl(self, classes=SUPPORTED_CLASSES):
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='crawl-answer') as executor:
+            for class_number in classes:
+                self.crawl_class(class_number, executor)
+        return self.counters
+
+    def crawl_class(self, class_number, executor):
+        try:
+            books = self.scraper.get_all_books(class_number)
+        except Exception as e:
+            logging.error(f"Failed to crawl class {class_number}: {str(e)}")
+            self.counters['errors'] += 1
+            return
+
+        self.counters['classes'] += 1
+        seen_endpoints = set()
+        for book in books:
+            if book['endpoint'] in seen_endpoints:
+                continue
+            seen_endpoints.add(book['endpoint'])
+            self.crawl_book(book['endpoint'], executor)
+
+    def crawl_book(self, book_path, executor):
+        try:
+            chapters = self.scraper.get_book_chapters(book_path)
+        except Exception as e:
+            logging.error(f"Failed to crawl book {book_path}: {str(e)}")
+            self.counters['errors'] += 1
+            return
+
+        self.counters['books'] += 1
+        for chapter in chapters:
+            for section in chapter['sub_sections']:
+                self.crawl_sub_section(section['endpoint'], executor)
+
+    def crawl_sub_section(self, question_path, executor):
+        try:
+            questions = self.scraper.get_questions(question_path)
+        except Exception as e:
+            logging.error(f"Failed to crawl questions {question_path}: {str(e)}")
+            self.counters['errors'] += 1
+            return
+
+        self.counters['sub_sections'] += 1
+        if not self.with_answers:
+            return
+
+        qna_ids = [question['qna_id'] for question in questions if question.get('qna_id')]
+        for ok in executor.map(self.crawl_answer, qna_ids):
+            self.counters['answers' if ok else 'errors'] += 1
+
+    def crawl_answer(self, qna_id):
+        try:
+            self.scraper.get_answer_with_video(qna_id, self.video_scraper)
+            return True
+        except Exception as e:
+            logging.error(f"Failed to crawl answer {qna_id}: {str(e)}")
+            return False
+
+
+    # Recrawl: fetch live pages again, but only descend into what changed
+
+    def recrawl(self, classes=SUPPORTED_CLASSES):
+        """Refresh the store from live pages and return the diff against its previous contents
+
+        Every class page and book page is fetched again. Sub-sections are
+        only fetched for books whose chapter tree hash changed, and answers
+        only for qna ids that are new or whose question text changed. Book
+        and sub-section pages are saved with DIRTY_HASH and only get their
+        real hash once everything below them has been recrawled, so pages
+        missed by a failed or interrupted recrawl are picked up by the next
+        one.
+        """
+        self.diff = _empty_diff()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='crawl-answer') as executor:
+            for class_number in classes:
+                self.recrawl_class(class_number, executor)
+        return _net_diff(self.diff)
+
+    def recrawl_class(self, class_number, executor):
+        old_hash = self.store.get_hash('books', class_number)
+        old_books = self.store.get_books(class_number) or []
+        try:
+            books = self.scraper.refresh_books(class_number)
+        except Exception as e:
+            logging.error(f"Failed to recrawl class {class_number}: {str(e)}")
+            self.counters['errors'] += 1
+            return
+
+        self.counters['classes'] += 1
+        endpoints = list(dict.fromkeys(book['endpoint'] for book in books))
+        if self.store.get_hash('books', class_number) != old_hash:
+            self.diff['classes'].append(class_number)
+            self._diff_keys('books', [book['endpoint'] for book in old_books], endpoints)
+
+        for book_path in endpoints:
+            self.recrawl_book(book_path, executor)
+
+    def recrawl_book(self, book_path, executor):
+        old_hash = self.store.get_hash('chapters', book_path)
+        old_chapters = self.store.get_chapters(book_path)
+        try:
+            chapters = self.scraper.refresh_chapters(book_path, dirty=True)
+        except Exception as e:
+            logging.error(f"Failed to recrawl book {book_path}: {str(e)}")
+            self.counters['errors'] += 1
+            return
+
+        self.counters['books'] += 1
+        new_hash = content_hash(chapters)
+        if self._unchanged(old_hash, old_chapters, new_hash):
+            self.store.set_hash('chapters', book_path, new_hash)
+            self.counters['unchanged_books'] += 1
+            return
+
+        # A book left dirty by an unfinished recrawl may not have changed since
+        if old_chapters is not None and self.store.get_chapters(book_path) != old_chapters:
+            self.diff['books']['changed'].append(book_path)
+        old_sections = [section['endpoint'] for chapter in old_chapters or [] for section in chapter['sub_sections']]
+        sections = [section['endpoint'] for chapter in chapters for section in chapter['sub_sections']]
+        self._diff_keys('sub_sections', old_sections, sections)
+
+        # Questions of dropped sub-sections are gone from this book
+        for question_path in set(old_sections) - set(sections):
+            for question in self.store.get_questions(question_path) or []:
+                if question.get('qna_id'):
+                    self.diff['qna_ids']['removed'].append(question['qna_id'])
+
+        results = [self.recrawl_sub_section(question_path, executor) for question_path in sections]
+        if all(results):
+            self.store.set_hash('chapters', book_path, new_hash)
+
+    def recrawl_sub_section(self, question_path, executor):
+        """Recrawl one sub-section; returns False if it or any of its answers failed"""
+        old_hash = self.store.get_hash('questions', question_path)
+        old_questions = self.store.get_questions(question_path)
+        try:
+            questions = self.scraper.refresh_questions(question_path, dirty=True)
+        except Exception as e:
+            logging.error(f"Failed to recrawl questions {question_path}: {str(e)}")
+            self.counters['errors'] += 1
+            return False
+
+        self.counters['sub_sections'] += 1
+        new_hash = content_hash(questions)
+        if self._unchanged(old_hash, old_questions, new_hash):
+            self.store.set_hash('questions', question_path, new_hash)
+            self.counters['unchanged_sub_sections'] += 1
+            return True
+
+        if (old_questions is not None and question_path not in self.diff['sub_sections']['added']
+                and self.store.get_questions(question_path) != old_questions):
+            self.diff['sub_sections']['changed'].append(question_path)
+
+        old_text = {question['qna_id']: question['question'] for question in old_questions or [] if question.get('qna_id')}
+        new_text = {question['qna_id']: question['question'] for question in questions if question.get('qna_id')}
+        added = [qna_id for qna_id in new_text if qna_id not in old_text]
+        changed = [qna_id for qna_id in new_text if qna_id in old_text and new_text[qna_id] != old_text[qna_id]]
+        self.diff['qna_ids']['added'].extend(added)
+        self.diff['qna_ids']['changed'].extend(changed)
+        self.diff['qna_ids']['removed'].extend(qna_id for qna_id in old_text if qna_id not in new_text)
+
+        if self.with_answers:
+            if old_hash == DIRTY_HASH:
+                # The last recrawl stopped before all answers were fetched; which ones is unknown
+                refetch = list(new_text)
+            else:
+                # Ids new to this sub-section may just have moved here from another one
+                refetch = changed + [qna_id for qna_id in added if self.store.get_answer(qna_id) is None]
+            results = list(executor.map(self.recrawl_answer, refetch))
+            for ok in results:
+                self.counters['answers' if ok else 'errors'] += 1
+            if not all(results):
+                return False
+
+        self.store.set_hash('questions', question_path, new_hash)
+        return True
+
+    def recrawl_answer(self, qna_id):
+        try:
+            self.scraper.refresh_answer_with_video(qna_id, self.video_scraper)
+            return True
+        except Exception as e:
+            logging.error(f"Failed to recrawl answer {qna_id}: {str(e)}")
+            return False
+
+    def _unchanged(self, old_hash, old_value, new_hash):
+        """Whether a just-fetched page hashes the same as before the recrawl, with nothing below it left to do"""
+        if old_hash == DIRTY_HASH:
+            return False
+        if old_hash is None:
+            if old_value is None:
+                return False
+            # Stored before hashes were recorded: hash the stored copy instead
+            old_hash = content_hash(old_value)
+        return new_hash == old_hash
+
+    def _diff_keys(self, kind, old_keys, new_keys):
+        old_set = set(old_keys)
+        new_set = set(new_keys)
+        self.diff[kind]['added'].extend(key for key in dict.fromkeys(new_keys) if key not in old_set)
+        self.diff[kind]['removed'].extend(key for key in dict.fromkeys(old_keys) if key not in new_set)
+
+
+def invalidate_cache(cache, diff, scraper):
+    """Drop the response cache entries a recrawl diff shows to be out of date; returns how many"""
+    keys = [('books', class_number) for class_number in diff['classes']]
+    keys += [('chapters', book_path) for book_path in diff['books']['changed'] + diff['books']['removed']]
+    keys += [
+        ('questions', question_path)
+        for question_path in diff['sub_sections']['changed'] + diff['sub_sections']['removed']
+    ]
+    for qna_id in diff['qna_ids']['changed'] + diff['qna_ids']['removed']:
+        keys.append(('answer', qna_id))
+        keys.append(('video', scraper._answer_url(qna_id)))
+
+    for endpoint, key in keys:
+        cache.delete(endpoint, key)
+    return len(keys)
+
+
+def parse_classes(value):
+    """Parse '11', '6-12' or '9,10,12' into a list of class numbers"""
+    classes = []
+    for part in value.split(','):
+        if '-' in part:
+            start, end = part.split('-', 1)
+            classes.extend(range(int(start), int(end) + 1))
+        else:
+            classes.append(int(part))
+    for class_number in classes:
+        if class_number not in SUPPORTED_CLASSES:
+            raise argparse.ArgumentTypeError(f"Class number must be between 6 and 12: {class_number}")
+    return classes
+
+
+# Command line interface
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Snapshot the Doubtnut catalog into a SQLite store')
+    parser.add_argument('--db', default='catalog.sqlite3', help='SQLite store path (default: catalog.sqlite3)')
+    parser.add_argument('--classes', type=parse_classes, default=list(SUPPORTED_CLASSES),
+                        help="Classes to crawl, e.g. 11, 6-12 or 9,10 (default: 6-12)")
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent answer fetches (default: 4)')
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help='Parse pages on this many processes instead of the fetch threads (default: off)')
+    parser.add_argument('--parse-queue', type=int,
+                        help='With --parse-workers: pages queued for parsing before fetches wait (default: 2 per worker)')
+    parser.add_argument('--no-answers', action='store_true', help='Stop at question lists')
+    parser.add_argument('--recrawl', action='store_true',
+                        help='Refetch pages already in the store, descending only into changed ones')
+    parser.add_argument('--diff-out', metavar='FILE', help='With --recrawl: write the diff as JSON to FILE')
+    parser.add_argument('--invalidate-cache', action='store_true',
+                        help="With --recrawl: drop changed entries from the API's response cache (DOUBTNUT_CACHE_*)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    parse_pool = None
+    page_scraper = None
+    if args.parse_workers > 0:
+        from parsepool import ParsePool, ProcessPoolScraper
+        parse_pool = ParsePool(args.parse_workers, args.parse_queue)
+        page_scraper = ProcessPoolScraper(parse_pool)
+
+    crawler = CatalogCrawler(
+        CatalogStore(args.db), scraper=page_scraper, workers=args.workers, with_answers=not args.no_answers
+    )
+    try:
+        if args.recrawl:
+            diff = crawler.recrawl(args.classes)
+        else:
+            crawler.crawl(args.classes)
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume")
+        sys.exit(1)
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+
+    counters = crawler.counters
+    print(f"Crawled {counters['classes']} classes, {counters['books']} books, "
+          f"{counters['sub_sections']} sub-sections, {counters['answers']} answers "
+          f"({counters['errors']} errors)")
+
+    if args.recrawl:
+        print(f"Unchanged: {counters['unchanged_books']} books, {counters['unchanged_sub_sections']} sub-sections")
+        for kind in ('books', 'sub_sections', 'qna_ids'):
+            print(f"{kind}: " + ', '.join(f"{len(diff[kind][change])} {change}" for change in diff[kind]))
+        if args.diff_out:
+            with open(args.diff_out, 'w') as f:
+                json.dump(diff, f, indent=2)
+            print(f"Diff written to {args.diff_out}")
+        if args.invalidate_cache:
+            from cache import ResponseCache
+            cache = ResponseCache.from_env()
+            if cache is not None:
+                print(f"Invalidated {invalidate_cache(cache, diff, crawler.scraper)} cache entries")
+
+    print(f"Store contents: {crawler.store.stats()}")
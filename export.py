@@ -0,0 +1,349 @@
+import sys
+import json
+import logging
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from payloads import StreamCompressor
+
+# Archive codecs offered for exports, by file extension
+EXPORT_CODECS = {'gzip': '.gz', 'zstd': '.zst'}
+
+# Answers fetched ahead of the record being written
+DEFAULT_WINDOW = 8
+
+# Records between sync points; a cut-off archive decompresses up to the last one
+FLUSH_EVERY = 50
+
+
+def clean_question(text):
+    return (text or '').replace('View Solution', '').strip()
+
+
+def unique_book_paths(books):
+    """Book endpoints in page order, without duplicates"""
+    return list(dict.fromkeys(book.get('endpoint') for book in books if book.get('endpoint')))
+
+
+def answer_fields(answer, video_result=None):
+    """The answer text and video URL an export record carries"""
+    video_url = None
+    if video_result is not None and video_result.get('success'):
+        video_url = video_result.get('video_url')
+    return {
+        'answer': answer.get('answer', ''),
+        'video_url': video_url
+    }
+
+
+def export_answer(scraper, qna_id, video_scraper=None):
+    """Answer text and video URL for a QNA ID, from one page download"""
+    if video_scraper is None:
+        return answer_fields(scraper.get_answer(qna_id))
+    return answer_fields(*scraper.get_answer_with_video(qna_id, video_scraper))
+
+
+def parse_cursor(value):
+    """(book, sub-section, question) ordinals of a resume cursor such as '0.12.7', or None if empty"""
+    if not value:
+        return None
+    position = tuple(int(part) for part in value.split('.'))
+    if len(position) != 3 or min(position) < 0:
+        raise ValueError(f"Invalid export cursor: {value}")
+    return position
+
+
+def format_cursor(position):
+    return '.'.join(str(part) for part in position)
+
+
+class ExportRecords:
+    """Records of an export, fed by whichever transport fetches the pages
+
+    The CLI, the Flask app and the ASGI app only differ in how they fetch
+    chapter trees, question lists and answers; they hand each page (or its
+    error) to this class, which builds the records, the resume cursors and
+    the final 'end' record.
+
+    Every question record carries a `cursor`: the ordinals of its book,
+    sub-section and question (e.g. '0.12.7'). They don't shift when another
+    page fails to load, so an export cut off after cursor C resumes with
+    after=C, and pages before C are not fetched again. Books, sub-sections
+    and answers that fail are written where they belong, as 'error' records
+    or answers with an `error`, and listed again under `errors` in the
+    'end' record.
+    """
+
+    def __init__(self, book_paths, after=None):
+        self.book_paths = book_paths
+        self.after = parse_cursor(after)
+        self.next_cursor = after or None
+        self.count = 0
+        self.errors = []
+
+    def _resuming(self, *position):
+        """Whether the resume cursor lies inside this book (or book and sub-section)"""
+        return self.after is not None and self.after[:len(position)] == position
+
+    def _error(self, record, error):
+        record = dict(record, error=str(error))
+        self.errors.append(record)
+        return dict(record, type='error')
+
+    def books(self):
+        """(book ordinal, book path) of the books still to export"""
+        start = self.after[0] if self.after is not None else 0
+        return list(enumerate(self.book_paths))[start:]
+
+    def book(self, book_index, book_path, chapters, error=None):
+        """Records for a book's chapter tree (or its load error), and its sub-sections still to export
+
+        Sub-sections are (book_path, (book ordinal, sub-section ordinal), chapter, section) tuples.
+        """
+        if error is not None:
+            logging.error(f"Error fetching chapters for book {book_path}: {str(error)}")
+            return [self._error({'book_path': book_path}, error)], []
+
+        sections = [
+            (chapter, section)
+            for chapter in chapters
+            for section in chapter.get('sub_sections', [])
+        ]
+        sub_sections = [
+            (book_path, (book_index, section_index), chapter, section)
+            for section_index, (chapter, section) in enumerate(sections)
+        ]
+        if self._resuming(book_index):
+            # The book record went out with the part before the cursor
+            return [], sub_sections[self.after[1]:]
+        return [{
+            'type': 'book',
+            'book_path': book_path,
+            'chapters': len(chapters),
+            'sub_sections': len(sections)
+        }], sub_sections
+
+    def questions(self, sub_section, questions, error=None):
+        """Question records, without answers yet, for a sub-section's question list (or its load error)"""
+        book_path, position, chapter, section = sub_section
+        if error is not None:
+            logging.error(f"Error fetching questions for path {section['endpoint']}: {str(error)}")
+            return [self._error({'book_path': book_path, 'endpoint': section['endpoint']}, error)]
+
+        skip = self.after[2] if self._resuming(*position) else -1
+        return [{
+            'type': 'question',
+            'book_path': book_path,
+            'chapter_name': chapter.get('chapter_name'),
+            'sub_section': section.get('name'),
+            'endpoint': section['endpoint'],
+            'qna_id': question['qna_id'],
+            'question': clean_question(question.get('question')),
+            'cursor': format_cursor((*position, question_index))
+        } for question_index, question in enumerate(questions) if question_index > skip and question.get('qna_id')]
+
+    def answered(self, record, answer=None, error=None):
+        """Complete a question record with its answer, or the error fetching it; call in output order"""
+        if error is not None:
+            logging.error(f"Error fetching answer for QNA ID {record['qna_id']}: {str(error)}")
+            record['error'] = str(error)
+            self.errors.append({'qna_id': record['qna_id'], 'cursor': record['cursor'], 'error': str(error)})
+        else:
+            record.update(answer)
+        self.count += 1
+        self.next_cursor = record['cursor']
+        return record
+
+    def end(self):
+        return {
+            'type': 'end',
+            'count': self.count,
+            'failed': len(self.errors),
+            'errors': self.errors,
+            'next_cursor': self.next_cursor
+        }
+
+
+def iter_export(scraper, book_paths, video_scraper=None, after=None, executor=None, window=DEFAULT_WINDOW,
+                chapters=None):
+    """Yield the export records of books, with answers, from after the resume cursor `after`
+
+    Up to `window` answers are fetched ahead on `executor` (a private pool
+    if None) and records come out in order, so memory stays flat however
+    large the export is. `chapters` maps book paths to chapter trees the
+    caller has already fetched. See ExportRecords for the records.
+    """
+    stream = ExportRecords(book_paths, after)
+    known_chapters = chapters or {}
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix='export-answer')
+
+    pending = deque()
+
+    def ready(limit):
+        while len(pending) > limit:
+            record, future = pending.popleft()
+            if future is not None:
+                try:
+                    stream.answered(record, future.result())
+                except Exception as e:
+                    stream.answered(record, error=e)
+            yield record
+
+    def queue(records):
+        for record in records:
+            future = None
+            if record['type'] == 'question':
+                future = executor.submit(export_answer, scraper, record['qna_id'], video_scraper)
+            pending.append((record, future))
+            yield from ready(window)
+
+    try:
+        for book_index, book_path in stream.books():
+            book_chapters, error = known_chapters.get(book_path), None
+            if book_chapters is None:
+                try:
+                    book_chapters = scraper.get_book_chapters(book_path)
+                except Exception as e:
+                    error = e
+            records, sub_sections = stream.book(book_index, book_path, book_chapters, error)
+            yield from queue(records)
+
+            for sub_section in sub_sections:
+                questions, error = None, None
+                try:
+                    questions = scraper.get_questions(sub_section[3]['endpoint'])
+                except Exception as e:
+                    error = e
+                yield from queue(stream.questions(sub_section, questions, error))
+        yield from ready(0)
+    finally:
+        # Reader went away: don't fetch answers nobody will read
+        for _, future in pending:
+            if future is not None:
+                future.cancel()
+        if own_executor:
+            executor.shutdown(wait=False)
+
+    yield stream.end()
+
+
+def encode_record(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def iter_archive(records, codec='gzip', level=None, flush_every=FLUSH_EVERY):
+    """Compressed JSONL chunks for a record stream; codec None writes plain JSONL"""
+    compressor = StreamCompressor(codec, level) if codec else None
+    for index, record in enumerate(records, 1):
+        line = encode_record(record)
+        if compressor is None:
+            yield line
+            continue
+        chunk = compressor.compress(line)
+        if index % flush_every == 0:
+            chunk += compressor.sync()
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.finish()
+
+
+def write_archive(records, output, codec='gzip', level=None, flush_every=FLUSH_EVERY):
+    """Write records to a binary file object as (compressed) JSONL
+
+    The archive is finished properly even if writing is interrupted, so it
+    stays readable up to the last record written.
+    """
+    compressor = StreamCompressor(codec, level) if codec else None
+    try:
+        for index, record in enumerate(records, 1):
+            line = encode_record(record)
+            output.write(compressor.compress(line) if compressor is not None else line)
+            if compressor is not None and index % flush_every == 0:
+                output.write(compressor.sync())
+    finally:
+        if compressor is not None:
+            output.write(compressor.finish())
+        output.flush()
+
+
+def codec_for_path(path):
+    """Archive codec implied by an output file name, or None for plain JSONL"""
+    for codec, extension in EXPORT_CODECS.items():
+        if path.endswith(extension):
+            return codec
+    return None
+
+
+# Command line interface
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export a book or class as a compressed JSONL archive')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--book', help='Book path, e.g. /books/class-11-ncert-physics-download')
+    target.add_argument('--class', dest='class_number', type=int, choices=range(6, 13), help='Every book of a class')
+    parser.add_argument('-o', '--output', default='-', help='Archive path (default: stdout)')
+    parser.add_argument('--codec', choices=[*EXPORT_CODECS, 'none'],
+                        help='Compression (default: from the output extension, else gzip)')
+    parser.add_argument('--level', type=int, help='Compression level')
+    parser.add_argument('--after', metavar='CURSOR', help='Resume an export after this question cursor')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent answer fetches (default: 4)')
+    parser.add_argument('--db', metavar='DB', help='Read from a catalog store built by crawler.py first')
+    parser.add_argument('--no-video', action='store_true', help='Skip video URL extraction')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    try:
+        parse_cursor(args.after)
+    except ValueError as e:
+        parser.error(str(e))
+
+    codec = args.codec or (codec_for_path(args.output) if args.output != '-' else None) or 'gzip'
+    codec = None if codec == 'none' else codec
+
+    from scraper import DoubnutScraper
+    scraper = DoubnutScraper()
+    if args.db:
+        from store import CatalogStore, StoreBackedScraper
+        scraper = StoreBackedScraper(scraper, CatalogStore(args.db))
+    video_scraper = None
+    if not args.no_video:
+        from video import DoubtnutScraper as VideoScraper
+        video_scraper = VideoScraper()
+
+    if args.book:
+        book_paths = [args.book]
+    else:
+        book_paths = unique_book_paths(scraper.get_all_books(args.class_number))
+
+    records = iter_export(scraper, book_paths, video_scraper, after=args.after, window=max(1, args.workers))
+    progress = {'next_cursor': args.after, 'count': 0, 'failed': 0}
+
+    def tracked(records):
+        for record in records:
+            yield record
+            # Only reached once the record has been written
+            if record['type'] == 'question':
+                progress['next_cursor'] = record['cursor']
+                progress['count'] += 1
+            elif record['type'] == 'end':
+                progress['failed'] = record['failed']
+
+    output = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        write_archive(tracked(records), output, codec, args.level)
+    except KeyboardInterrupt:
+        if progress['next_cursor']:
+            print(f"Interrupted; resume into a new file with --after {progress['next_cursor']}", file=sys.stderr)
+        else:
+            print("Interrupted before any question was written; rerun the same command", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+
+    print(f"Exported {progress['count']} questions from {len(book_paths)} books "
+          f"({progress['failed']} failures, listed in the archive's end record)", file=sys.stderr)
@@ -0,0 +1,290 @@
+import re
+import time
+import functools
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import timing
+
+# Prometheus text exposition format, version 0.0.4
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets in seconds; upstream fetches with retries can take tens of seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+# Per-thread list that histogram observations go to instead, see capture_observations()
+_capture = threading.local()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base for labelled metrics registered for /metrics"""
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        with self._lock:
+            return [(key, value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for key, value in self._samples():
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. requests in flight"""
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        observations = getattr(_capture, 'observations', None)
+        if observations is not None:
+            observations.append((self.name, value, labels))
+            return
+
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][index] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def _samples(self):
+        with self._lock:
+            return [(key, ([*entry[0]], entry[1], entry[2])) for key, entry in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for key, (counts, total, count) in self._samples():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            le = 'le="+Inf"'
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+def render():
+    """All registered metrics in Prometheus text format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+HTTP_REQUESTS = Counter(
+    'doubtnut_http_requests_total', 'API requests served', ('route', 'method', 'status')
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    'doubtnut_http_request_duration_seconds', 'API request latency', ('route', 'method')
+)
+HTTP_IN_FLIGHT = Gauge(
+    'doubtnut_http_requests_in_flight', 'API requests currently being served'
+)
+UPSTREAM_REQUESTS = Counter(
+    'doubtnut_upstream_requests_total', 'Requests to doubtnut.com by page type and status', ('url_type', 'status')
+)
+UPSTREAM_SECONDS = Histogram(
+    'doubtnut_upstream_request_duration_seconds', 'Upstream request latency, excluding rate-limit waits',
+    ('url_type',)
+)
+UPSTREAM_RETRIES = Counter(
+    'doubtnut_upstream_retries_total', 'Upstream requests retried after a failure', ('url_type',)
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    'doubtnut_upstream_requests_in_flight', 'Upstream requests currently open'
+)
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    'doubtnut_rate_limit_wait_seconds', 'Time callers were asked to wait for upstream budget'
+)
+PARSE_SECONDS = Histogram(
+    'doubtnut_parse_duration_seconds', 'HTML parsing time', ('scope', 'engine')
+)
+EXTRACT_SECONDS = Histogram(
+    'doubtnut_extract_duration_seconds', 'Extractor time per method', ('extractor',)
+)
+CIRCUIT_OPEN = Gauge(
+    'doubtnut_upstream_circuit_open', '1 while the upstream circuit breaker is open'
+)
+CIRCUIT_REJECTED = Counter(
+    'doubtnut_upstream_circuit_rejected_total', 'Upstream requests rejected by the open circuit breaker'
+)
+PREFETCHES = Counter(
+    'doubtnut_prefetch_total', 'Background answer prefetches by outcome', ('outcome',)
+)
+CACHE_LOOKUPS = Counter(
+    'doubtnut_cache_lookups_total', 'Response cache lookups by result', ('endpoint', 'result')
+)
+
+# Upstream URL shapes, most specific first
+UPSTREAM_URL_TYPES = [
+    (re.compile(r'^/qna/'), 'qna'),
+    (re.compile(r'^/books/class-\d+-all-books'), 'books'),
+    (re.compile(r'^/books/[^/]+/[^/]+'), 'questions'),
+    (re.compile(r'^/books/[^/]+'), 'book'),
+]
+
+
+def upstream_url_type(url):
+    """Low-cardinality label for an upstream URL: books, book, questions, qna or other"""
+    path = urlparse(url).path
+    for pattern, url_type in UPSTREAM_URL_TYPES:
+        if pattern.match(path):
+            return url_type
+    return 'other'
+
+
+class UpstreamCall:
+    """Times one upstream request; set .status to the response status code
+
+    Used as a context manager around the HTTP call. Calls that raise before
+    a status is set are counted as 'timeout' or 'error'.
+    """
+
+    def __init__(self, url, url_type=None):
+        self.url_type = url_type or upstream_url_type(url)
+        self.status = None
+
+    def __enter__(self):
+        UPSTREAM_IN_FLIGHT.inc()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self._start
+        UPSTREAM_IN_FLIGHT.dec()
+        UPSTREAM_SECONDS.observe(elapsed, url_type=self.url_type)
+        timing.record('verify' if self.url_type == 'video_head' else 'upstream', elapsed)
+        status = self.status
+        if status is None:
+            status = 'timeout' if exc_type is not None and 'Timeout' in exc_type.__name__ else 'error'
+        UPSTREAM_REQUESTS.inc(url_type=self.url_type, status=status)
+        return False
+
+
+def record_retry(url):
+    UPSTREAM_RETRIES.inc(url_type=upstream_url_type(url))
+
+
+@contextmanager
+def capture_observations():
+    """Collect this thread's histogram observations in a list instead of recording them
+
+    For work done in another process (e.g. a parser process), whose
+    registry /metrics never sees: send the list back and replay() it.
+    """
+    observations = []
+    _capture.observations = observations
+    try:
+        yield observations
+    finally:
+        _capture.observations = None
+
+
+def replay(observations):
+    """Record observations collected by capture_observations()"""
+    with _registry_lock:
+        metrics = {metric.name: metric for metric in _registry}
+    for name, value, labels in observations:
+        metrics[name].observe(value, **labels)
+
+
+def timed_extractor(method):
+    """Record a method's run time in EXTRACT_SECONDS under its own name"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with timing.phase('extract'):
+                return method(*args, **kwargs)
+        finally:
+            EXTRACT_SECONDS.observe(time.perf_counter() - start, extractor=method.__name__)
+    return wrapper
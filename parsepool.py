@@ -0,0 +1,178 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+import parsing
+import timing
+import video
+from scraper import DoubnutScraper
+
+# Pages waiting for or in a worker, per worker, unless DOUBTNUT_PARSE_QUEUE is set
+DEFAULT_QUEUE_PER_WORKER = 2
+
+# Scrapers of a pool process, built once by _init_worker
+_worker_scraper = None
+_worker_video_scraper = None
+
+
+def _init_worker(engine):
+    """Pool process initializer: same parser engine as the parent"""
+    global _worker_scraper, _worker_video_scraper
+    parsing._engine = engine
+    _worker_scraper = DoubnutScraper()
+    _worker_video_scraper = video.DoubtnutScraper()
+
+
+def _process(method, args, with_video):
+    """Run a DoubnutScraper._process_* method in a pool process
+
+    Returns (result, histogram observations, phase timings) as plain data,
+    for the parent to record in its own /metrics and request timings.
+    """
+    if with_video:
+        args = (*args, _worker_video_scraper)
+    timings = timing.start_request()
+    try:
+        with metrics.capture_observations() as observations:
+            result = getattr(_worker_scraper, method)(*args)
+    finally:
+        timing.end_request()
+    return result, observations, timings.phases()
+
+
+class ParsePool:
+    """Runs page processing (HTML parsing and extraction) on worker processes
+
+    Fetch threads or tasks hand over downloaded bytes and wait for the
+    extracted dicts, so parsing is no longer limited to the one core the
+    GIL allows. Workers only parse and extract; anything needing the
+    network or the parent's state stays with the caller. At most
+    `queue_depth` pages are queued or being parsed at once; further
+    submitters block until a slot frees up, which keeps memory bounded
+    when downloads outpace parsing.
+    """
+
+    def __init__(self, workers=None, queue_depth=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_depth = queue_depth or self.workers * DEFAULT_QUEUE_PER_WORKER
+        self._slots = threading.BoundedSemaphore(self.queue_depth)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.counters = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'cancelled': 0,
+            'queue_full': 0,
+        }
+
+    @classmethod
+    def from_env(cls):
+        """Build a pool from DOUBTNUT_PARSE_* environment variables, or None unless enabled"""
+        workers = int(os.environ.get('DOUBTNUT_PARSE_WORKERS', 0))
+        if workers <= 0:
+            return None
+        queue_depth = os.environ.get('DOUBTNUT_PARSE_QUEUE')
+        return cls(workers, int(queue_depth) if queue_depth else None)
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Spawned, not forked: the parent has fetch threads holding locks
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                        initargs=(parsing.get_engine(),)
+                    )
+                    logging.info(f"Started {self.workers} parser processes (queue depth {self.queue_depth})")
+        return self._executor
+
+    def submit(self, method, *args, with_video=False):
+        """Queue a _process_* call; blocks while the queue is full. Returns a Future"""
+        executor = self._get_executor()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.counters['queue_full'] += 1
+            self._slots.acquire()
+
+        try:
+            future = executor.submit(_process, method, args, with_video)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.counters['submitted'] += 1
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        self._slots.release()
+        if future.cancelled():
+            outcome = 'cancelled'
+        else:
+            outcome = 'failed' if future.exception() is not None else 'completed'
+        with self._lock:
+            self.counters[outcome] += 1
+
+    def run(self, method, *args, with_video=False):
+        """Run a _process_* call on the pool and wait for its result"""
+        result, observations, phases = self.submit(method, *args, with_video=with_video).result()
+        metrics.replay(observations)
+        for name, (seconds, _) in phases.items():
+            timing.record(name, seconds)
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['workers'] = self.workers
+        stats['queue_depth'] = self.queue_depth
+        return stats
+
+
+class ProcessPoolScraper(DoubnutScraper):
+    """DoubnutScraper whose page processing runs on a ParsePool
+
+    Fetching, retries, rate limiting and caching stay in the calling
+    thread; only the _process_* steps move to the pool, so results are the
+    same as DoubnutScraper's. Video URLs are found in the pool but
+    verified here with the caller's video scraper, which keeps the
+    network I/O out of the pool and shares this process's verification
+    memo and background checks.
+    """
+
+    def __init__(self, pool, cache=None):
+        super().__init__(cache=cache)
+        self.pool = pool
+
+    def _process_books(self, content, class_number):
+        return self.pool.run('_process_books', content, class_number)
+
+    def _process_chapters(self, content):
+        return self.pool.run('_process_chapters', content)
+
+    def _process_questions(self, content):
+        return self.pool.run('_process_questions', content)
+
+    def _process_answer(self, content, qna_id, url, video_scraper=None):
+        if video_scraper is None:
+            return self.pool.run('_process_answer', content, qna_id, url)
+
+        answer, video_result = self.pool.run('_process_answer_unverified', content, qna_id, url, with_video=True)
+        # Only a rejected URL needs the page again, to look for another video
+        video_result = video_scraper.verify_result(
+            video_result,
+            lambda rejected: video_scraper.extract_unverified(self._parse(content, 'answer_video'), rejected)
+        )
+        return answer, video_result
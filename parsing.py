@@ -0,0 +1,181 @@
+import os
+import re
+import sys
+import time
+import json
+import logging
+import importlib.util
+
+import timing
+from metrics import PARSE_SECONDS
+
+# Parser backends understood by BeautifulSoup, fastest first
+PARSER_ENGINES = ('lxml', 'html.parser')
+
+# lxml stays opt-in until compare_engines has been run over real pages
+DEFAULT_ENGINE = 'html.parser'
+
+_SOLUTION_CLASS = re.compile(r'solution|answer')
+_QNA_HREF = re.compile(r'/qna/\d+')
+
+
+def _class_string(attrs):
+    """Raw class attribute as a single string (builders may pass a list)"""
+    value = attrs.get('class') or ''
+    if isinstance(value, (list, tuple)):
+        value = ' '.join(value)
+    return value
+
+
+# Scope predicates receive the tag name and raw attributes of tags outside any
+# kept element; a matching tag is kept together with its whole subtree. Each
+# one keeps every element its extractor looks for, so extraction over the
+# restricted tree gives the same result as over the full page.
+
+def _books_tag(name, attrs):
+    return name == 'a'
+
+
+def _chapters_tag(name, attrs):
+    return name == 'ol' and 'list-none' in _class_string(attrs).split()
+
+
+def _questions_tag(name, attrs):
+    return name == 'a' and bool(_QNA_HREF.search(attrs.get('href') or ''))
+
+
+def _answer_tag(name, attrs):
+    if name in ('meta', 'title'):
+        return True
+    if name == 'h1':
+        return attrs.get('id') == 'ocr-text'
+    if name == 'div' and attrs.get('id') == 'solution-text':
+        return True
+    if name in ('div', 'section'):
+        return bool(_SOLUTION_CLASS.search(_class_string(attrs)))
+    return False
+
+
+def _video_tag(name, attrs):
+    return name in ('video', 'iframe', 'script', 'meta')
+
+
+def _answer_video_tag(name, attrs):
+    return _answer_tag(name, attrs) or _video_tag(name, attrs)
+
+
+SCOPE_PREDICATES = {
+    'books': _books_tag,
+    'chapters': _chapters_tag,
+    'questions': _questions_tag,
+    'answer': _answer_tag,
+    'video': _video_tag,
+    'answer_video': _answer_video_tag,
+}
+
+_strainers = {}
+_engine = None
+
+
+def get_engine():
+    """Parser engine from DOUBTNUT_PARSER, defaulting to html.parser"""
+    global _engine
+    if _engine is None:
+        engine = os.environ.get('DOUBTNUT_PARSER') or DEFAULT_ENGINE
+        if engine not in PARSER_ENGINES:
+            logging.warning(f"Unknown parser engine {engine}, falling back to {DEFAULT_ENGINE}")
+            engine = DEFAULT_ENGINE
+        # Only look for lxml here; bs4 imports it on the first parse
+        elif engine == 'lxml' and importlib.util.find_spec('lxml') is None:
+            logging.warning(f"DOUBTNUT_PARSER=lxml but lxml is not installed, falling back to {DEFAULT_ENGINE}")
+            engine = DEFAULT_ENGINE
+        _engine = engine
+    return _engine
+
+
+def get_strainer(scope):
+    """SoupStrainer for a named parsing scope, or None to parse the full page"""
+    if scope is None:
+        return None
+    strainer = _strainers.get(scope)
+    if strainer is None:
+        from bs4 import SoupStrainer
+        strainer = SoupStrainer(SCOPE_PREDICATES[scope])
+        _strainers[scope] = strainer
+    return strainer
+
+
+def make_soup(content, scope=None, engine=None):
+    """Parse HTML with the configured engine, keeping only the given scope"""
+    from bs4 import BeautifulSoup
+    engine = engine or get_engine()
+    start = time.perf_counter()
+    soup = BeautifulSoup(content, engine, parse_only=get_strainer(scope))
+    elapsed = time.perf_counter() - start
+    PARSE_SECONDS.observe(elapsed, scope=scope or 'full', engine=engine)
+    timing.record('parse', elapsed)
+    return soup
+
+
+def _extract(kind, soup, scrapers, class_number):
+    """Run the extractors for one page kind over a parsed page"""
+    scraper, video_scraper = scrapers
+    if kind == 'books':
+        return scraper._extract_books(soup, class_number)
+    if kind == 'chapters':
+        return scraper._extract_chapters(soup)
+    if kind == 'questions':
+        return scraper._extract_questions(soup)
+    if kind == 'answer':
+        return scraper._extract_answer(soup, 'page', 'page')
+    if kind == 'video':
+        return video_scraper.extract_video_from_soup(soup)
+    raise ValueError(f"Unknown page kind: {kind}")
+
+
+def compare_engines(content, kind, class_number=11, repeat=20):
+    """Time full vs scoped parsing for each engine and check results match the baseline
+
+    The baseline is today's html.parser over the full page. Returns a list of
+    dicts with the mean parse+extract time in milliseconds for each variant.
+    """
+    from scraper import DoubnutScraper
+    from video import DoubtnutScraper as VideoScraper
+
+    scrapers = (DoubnutScraper(), VideoScraper())
+    baseline = _extract(kind, make_soup(content, engine='html.parser'), scrapers, class_number)
+
+    results = []
+    for engine in PARSER_ENGINES:
+        for scope in (None, kind):
+            try:
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    output = _extract(kind, make_soup(content, scope, engine), scrapers, class_number)
+                elapsed = (time.perf_counter() - start) / repeat
+            except Exception as e:
+                results.append({'engine': engine, 'scope': scope or 'full', 'error': str(e)})
+                continue
+            results.append({
+                'engine': engine,
+                'scope': scope or 'full',
+                'ms': round(elapsed * 1000, 3),
+                'identical': output == baseline,
+            })
+    return results
+
+
+# Command line interface: python parsing.py <kind> <saved_page.html> [...]
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] not in ('books', 'chapters', 'questions', 'answer', 'video'):
+        print("Usage: python parsing.py <books|chapters|questions|answer|video> <page.html> [...]")
+        sys.exit(1)
+
+    logging.disable(logging.INFO)
+    kind = sys.argv[1]
+    for path in sys.argv[2:]:
+        with open(path, 'rb') as f:
+            content = f.read()
+        match = re.search(r'class-(\d+)', os.path.basename(path))
+        class_number = int(match.group(1)) if match else 11
+        print(json.dumps({'page': path, 'kind': kind, 'results': compare_engines(content, kind, class_number)}))
@@ -0,0 +1,208 @@
+import os
+import gzip
+import zlib
+import time
+import hashlib
+import logging
+import threading
+import importlib.util
+from collections import OrderedDict
+
+# Content-Encoding names the payload cache can store bodies in
+CODECS = ('zstd', 'gzip', 'deflate')
+
+# Memory budget for compressed bodies
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def default_codec():
+    """zstd when the zstandard package is installed, gzip otherwise"""
+    return 'zstd' if importlib.util.find_spec('zstandard') is not None else 'gzip'
+
+
+def content_etag(body):
+    """Stable ETag value (unquoted) for a response body"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def compress(body, codec, level=None):
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=level or 3).compress(body)
+    if codec == 'gzip':
+        # mtime=0 keeps the output stable for identical bodies
+        return gzip.compress(body, compresslevel=level or 6, mtime=0)
+    if codec == 'deflate':
+        return zlib.compress(body, level or 6)
+    raise ValueError(f"Unknown payload codec: {codec}")
+
+
+def decompress(data, codec):
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == 'gzip':
+        return gzip.decompress(data)
+    if codec == 'deflate':
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown payload codec: {codec}")
+
+
+class StreamCompressor:
+    """Incremental compressor for bodies too large to build in memory
+
+    sync() ends a block without ending the stream, so a reader of a cut-off
+    download can still decompress everything up to the last sync point.
+    """
+
+    def __init__(self, codec, level=None):
+        self.codec = codec
+        if codec == 'zstd':
+            import zstandard
+            self._compressor = zstandard.ZstdCompressor(level=level or 3).compressobj()
+            self._sync_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        elif codec in ('gzip', 'deflate'):
+            # wbits 31 writes a gzip header and trailer, 15 a zlib stream
+            self._compressor = zlib.compressobj(level or 6, zlib.DEFLATED, 31 if codec == 'gzip' else 15)
+            self._sync_mode = zlib.Z_SYNC_FLUSH
+        else:
+            raise ValueError(f"Unknown payload codec: {codec}")
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def sync(self):
+        return self._compressor.flush(self._sync_mode)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class Payload:
+    """A serialized API response body, stored compressed"""
+
+    __slots__ = ('data', 'codec', 'size', 'expires_at', 'etag')
+
+    def __init__(self, data, codec, size, expires_at, etag):
+        self.data = data
+        self.codec = codec
+        self.size = size
+        self.expires_at = expires_at
+        self.etag = etag
+
+    def body(self, encoded=True):
+        """(body bytes, Content-Encoding or None); encoded=False inflates it for clients without the codec"""
+        if encoded:
+            return self.data, self.codec
+        return decompress(self.data, self.codec), None
+
+
+class PayloadCache:
+    """LRU of final response bodies, compressed and bounded by total bytes
+
+    A hit hands the stored bytes to the client as they are (or inflated,
+    if the client does not accept the encoding) without touching the
+    scrapers or re-serializing the result. Entries expire together with
+    the scraper cache entries they were built from.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, codec=None, level=None):
+        self.max_bytes = max_bytes
+        self.codec = codec or default_codec()
+        self.level = level
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.counters = {
+            'hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'evictions': 0,
+            'raw_bytes': 0,
+            'compressed_bytes': 0,
+        }
+
+    @classmethod
+    def from_env(cls):
+        """Build a payload cache from DOUBTNUT_PAYLOAD_* environment variables, or None if disabled"""
+        if os.environ.get('DOUBTNUT_PAYLOAD_CACHE', '1') == '0':
+            return None
+
+        codec = os.environ.get('DOUBTNUT_PAYLOAD_CODEC') or default_codec()
+        if codec not in CODECS:
+            logging.warning(f"Unknown payload codec {codec}, using {default_codec()}")
+            codec = default_codec()
+        if codec == 'zstd' and importlib.util.find_spec('zstandard') is None:
+            logging.warning("zstd payload codec needs the 'zstandard' package; using gzip")
+            codec = 'gzip'
+
+        level = os.environ.get('DOUBTNUT_PAYLOAD_LEVEL')
+        return cls(
+            max_bytes=int(os.environ.get('DOUBTNUT_PAYLOAD_CACHE_BYTES', DEFAULT_MAX_BYTES)),
+            codec=codec,
+            level=int(level) if level else None
+        )
+
+    def get(self, key):
+        """Return the Payload for key, or None if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.time():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry
+
+    def set(self, key, body, expires_at):
+        """Compress and store a serialized body until expires_at; returns the Payload"""
+        entry = Payload(
+            compress(body, self.codec, self.level), self.codec, len(body), expires_at, content_etag(body)
+        )
+        if len(entry.data) > self.max_bytes:
+            return entry
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(entry.data)
+            self.counters['sets'] += 1
+            self.counters['raw_bytes'] += entry.size
+            self.counters['compressed_bytes'] += len(entry.data)
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.counters['evictions'] += 1
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry.data)
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Hit/miss counters, memory use and the compression ratio of stored bodies"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['compression_ratio'] = (
+            round(stats['raw_bytes'] / stats['compressed_bytes'], 2) if stats['compressed_bytes'] else None
+        )
+        stats['max_bytes'] = self.max_bytes
+        stats['codec'] = self.codec
+        return stats
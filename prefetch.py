@@ -0,0 +1,154 @@
+import os
+import time
+import queue
+import logging
+import threading
+
+from cache import MISS
+from circuit import get_breaker
+from metrics import PREFETCHES
+from ratelimit import get_limiter, prepaid
+
+DEFAULT_COUNT = 5
+DEFAULT_RESERVE = 2
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_MAX_AGE = 30.0
+
+# Outcomes counted in stats() and doubtnut_prefetch_total
+OUTCOMES = ('fetched', 'cached', 'failed', 'expired', 'dropped')
+
+
+class Prefetcher:
+    """Warms the answer and video caches for qna ids a client is likely to open next
+
+    Ids are queued by submit() and fetched by one low-priority worker
+    thread. A fetch only starts when the shared upstream limiter has
+    more than `reserve` tokens spare, so foreground requests always find
+    budget, and nothing goes out while the circuit is open. Ids that wait
+    longer than `max_age` seconds are given up, as are ids submitted while
+    the queue is full.
+    """
+
+    def __init__(self, scraper, video_scraper=None, count=DEFAULT_COUNT, reserve=DEFAULT_RESERVE,
+                 queue_size=DEFAULT_QUEUE_SIZE, max_age=DEFAULT_MAX_AGE):
+        self.scraper = scraper
+        self.video_scraper = video_scraper
+        self.count = count
+        self.reserve = reserve
+        self.max_age = max_age
+        self.limiter = get_limiter()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._worker = None
+        self.counters = {outcome: 0 for outcome in OUTCOMES}
+
+    @classmethod
+    def from_env(cls, scraper, video_scraper=None):
+        """Build a prefetcher from DOUBTNUT_PREFETCH_* environment variables, or None unless enabled"""
+        if os.environ.get('DOUBTNUT_PREFETCH', '0') != '1':
+            return None
+        return cls(
+            scraper, video_scraper,
+            count=int(os.environ.get('DOUBTNUT_PREFETCH_COUNT', DEFAULT_COUNT)),
+            reserve=float(os.environ.get('DOUBTNUT_PREFETCH_RESERVE', DEFAULT_RESERVE)),
+            queue_size=int(os.environ.get('DOUBTNUT_PREFETCH_QUEUE', DEFAULT_QUEUE_SIZE)),
+            max_age=float(os.environ.get('DOUBTNUT_PREFETCH_MAX_AGE', DEFAULT_MAX_AGE))
+        )
+
+    def _count(self, outcome):
+        with self._lock:
+            self.counters[outcome] += 1
+        PREFETCHES.inc(outcome=outcome)
+
+    def submit(self, qna_ids):
+        """Queue the first `count` of qna_ids; never blocks the caller"""
+        for qna_id in [qna_id for qna_id in qna_ids if qna_id][:self.count]:
+            self._enqueue(qna_id)
+
+    def submit_questions(self, question_path):
+        """Queue the first `count` qna ids of a cached question list, looked up off the request path"""
+        self._enqueue(('questions', question_path))
+
+    def _enqueue(self, item):
+        self._ensure_worker()
+        with self._lock:
+            if item in self._pending:
+                return
+            self._pending.add(item)
+        try:
+            self._queue.put_nowait((item, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self._pending.discard(item)
+            self._count('dropped')
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name='prefetch', daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            item, queued_at = self._queue.get()
+            try:
+                if isinstance(item, tuple):
+                    self._expand_questions(item[1])
+                else:
+                    self._prefetch(item, queued_at)
+            except Exception as e:
+                logging.warning(f"Prefetch of {item} failed: {str(e)}")
+                self._count('failed')
+            finally:
+                with self._lock:
+                    self._pending.discard(item)
+
+    def _expand_questions(self, question_path):
+        # Only from the cache: a question list nobody has loaded isn't worth budget
+        cache = getattr(self.scraper, 'cache', None)
+        questions = cache.peek('questions', question_path) if cache is not None else MISS
+        if questions is not MISS:
+            self.submit([question.get('qna_id') for question in questions])
+
+    def _is_cached(self, qna_id):
+        """Whether the answer and video halves are both cached, without counting as cache lookups
+
+        Halves expired within the grace window count as cached: fetching them
+        would only start a background refresh, which runs outside prepaid()
+        and would be charged to the limiter a second time. The next
+        foreground request refreshes them instead.
+        """
+        halves = [(getattr(self.scraper, 'cache', None), 'answer', qna_id)]
+        if self.video_scraper is not None:
+            halves.append((getattr(self.video_scraper, 'cache', None), 'video', self.scraper._answer_url(qna_id)))
+        return all(
+            cache is not None and cache.peek(endpoint, key, within_grace=True) is not MISS
+            for cache, endpoint, key in halves
+        )
+
+    def _prefetch(self, qna_id, queued_at):
+        if self._is_cached(qna_id):
+            self._count('cached')
+            return
+
+        # Wait for spare budget; foreground requests keep the last `reserve` tokens
+        while get_breaker().state != 'closed' or not self.limiter.try_acquire(keep=self.reserve):
+            if time.monotonic() - queued_at > self.max_age:
+                self._count('expired')
+                return
+            time.sleep(1 / self.limiter.rate if self.limiter.rate > 0 else 0.1)
+
+        # The page request is already paid for
+        with prepaid():
+            self.scraper.get_answer_with_video(qna_id, self.video_scraper)
+        self._count('fetched')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['pending'] = len(self._pending)
+        stats['count'] = self.count
+        stats['reserve'] = self.reserve
+        return stats
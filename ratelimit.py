@@ -0,0 +1,142 @@
+import os
+import time
+import random
+import threading
+import contextvars
+from contextlib import contextmanager
+
+import timing
+from metrics import RATE_LIMIT_WAIT_SECONDS
+
+# Upstream budget shared by every scraper in the process
+DEFAULT_RATE = 1.0
+DEFAULT_BURST = 5
+
+# Tokens already taken for the request about to be made in this context
+_prepaid = contextvars.ContextVar('doubtnut_prepaid_tokens', default=None)
+
+
+@contextmanager
+def prepaid(tokens=1):
+    """Let the next `tokens` worth of limiter calls in this block pass for free
+
+    For callers that took budget up front with try_acquire(), so the
+    request they then make through the scrapers isn't charged twice.
+    """
+    token = _prepaid.set([tokens])
+    try:
+        yield
+    finally:
+        _prepaid.reset(token)
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter
+
+    Tokens refill continuously at `rate` per second up to `burst`. Callers
+    take a token immediately when one is available; otherwise they reserve
+    the next one and sleep until it is due, so waiting callers are served
+    in arrival order without polling.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+
+    def reserve(self, tokens=1, timeout=None):
+        """Reserve `tokens` and return how many seconds to wait before using them
+
+        Returns None (reserving nothing) if the wait would exceed timeout.
+        Async callers sleep on the returned delay themselves.
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        credit = _prepaid.get()
+        if credit is not None and credit[0] >= tokens:
+            credit[0] -= tokens
+            return 0.0
+
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = max(0.0, (tokens - self._tokens) / self.rate)
+            if timeout is not None and wait > timeout:
+                return None
+            # Reserve the tokens now; a negative balance queues later callers behind us
+            self._tokens -= tokens
+            self.acquired += 1
+            if wait > 0:
+                self.waited += 1
+                self.wait_seconds += wait
+        RATE_LIMIT_WAIT_SECONDS.observe(wait)
+        timing.record('ratelimit', wait)
+        return wait
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until `tokens` are available; return False if that would exceed timeout"""
+        wait = self.reserve(tokens, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def try_acquire(self, tokens=1, keep=0):
+        """Take tokens only if they are available right now, leaving at least `keep` for others"""
+        if self.rate <= 0:
+            return True
+
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens - tokens < keep:
+                return False
+            self._tokens -= tokens
+            self.acquired += 1
+        RATE_LIMIT_WAIT_SECONDS.observe(0.0)
+        return True
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'available_tokens': round(self._tokens, 3),
+                'acquired': self.acquired,
+                'waited': self.waited,
+                'wait_seconds': round(self.wait_seconds, 3),
+            }
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Return the process-wide limiter, configured from DOUBTNUT_RATE_LIMIT / DOUBTNUT_RATE_BURST"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = TokenBucket(
+                    rate=float(os.environ.get('DOUBTNUT_RATE_LIMIT', DEFAULT_RATE)),
+                    burst=float(os.environ.get('DOUBTNUT_RATE_BURST', DEFAULT_BURST))
+                )
+    return _limiter
+
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    """Exponential backoff with jitter for the given (0-based) retry attempt"""
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
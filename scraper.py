@@ -1,32 +1,71 @@
 import requests
-from bs4 import BeautifulSoup
 import logging
 import time
 import re
 from urllib.parse import urljoin, urlparse
+from cache import MISS, NotModified, cached, conditional_headers, record_validators
+from ratelimit import get_limiter, backoff_delay
+from parsing import make_soup
+from singleflight import get_single_flight
+from metrics import UpstreamCall, record_retry, timed_extractor
+from transport import get_session
+from circuit import get_breaker, is_upstream_failure
 
 class DoubnutScraper:
-    def __init__(self):
+    def __init__(self, cache=None):
         self.base_url = "https://www.doubtnut.com"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        self.cache = cache
+        self.limiter = get_limiter()
+        self.session = get_session()
         
     def _make_request(self, url, max_retries=3, delay=1):
-        """Make HTTP request with retry logic and rate limiting"""
+        """Make HTTP request with retry logic and rate limiting
+        
+        Requests go out as soon as the shared rate limiter has budget; failed
+        attempts are retried with exponential backoff (base `delay` seconds)
+        plus jitter. When the cache is revalidating an expired entry the
+        request is conditional, and a 304 raises NotModified. While the
+        upstream circuit breaker is open this raises CircuitOpenError
+        without sending anything.
+        """
+        breaker = get_breaker()
         for attempt in range(max_retries):
+            breaker.before_request()
             try:
-                time.sleep(delay)  # Rate limiting
-                response = self.session.get(url, timeout=10)
+                if attempt:
+                    record_retry(url)
+                headers = conditional_headers()
+                try:
+                    self.limiter.acquire()  # Rate limiting
+                    with UpstreamCall(url) as call:
+                        response = self.session.get(url, timeout=10, headers=headers)
+                        call.status = response.status_code
+                except requests.RequestException:
+                    breaker.record_failure()
+                    raise
+                except BaseException:
+                    # Interrupted or failed without an answer; must not hold a half-open trial
+                    breaker.record_abandoned()
+                    raise
+                if is_upstream_failure(response.status_code):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if response.status_code == 304 and headers:
+                    raise NotModified(url)
                 response.raise_for_status()
+                record_validators(response.headers)
                 return response
             except requests.RequestException as e:
                 logging.warning(f"Request attempt {attempt + 1} failed for {url}: {str(e)}")
                 if attempt == max_retries - 1:
                     raise
-                time.sleep(delay * (attempt + 1))
+                time.sleep(backoff_delay(attempt, delay))
         
+    def _parse(self, content, scope=None):
+        """Parse page content, restricted to the named parsing scope if given"""
+        return make_soup(content, scope)
+    
     def _clean_text(self, text):
         """Clean extracted text by removing extra whitespace and formatting"""
         if not text:
@@ -46,358 +85,564 @@ class DoubnutScraper:
         
         return text.strip()
     
+    @cached('books')
     def get_all_books(self, class_number=11):
         """Scrape all books from class page (supports classes 6-12)"""
-        url = f"{self.base_url}/books/class-{class_number}-all-books-download-questions-answers-solutions"
+        url = self._books_url(class_number)
         
         try:
             response = self._make_request(url)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            books = []
-            
-            # Find all book links - they have specific class pattern
-            book_links = soup.find_all('a', class_=['flex', 'p-2', 'gap-2', 'h-full', 'link'])
-            
-            for link in book_links:
-                href = link.get('href')
-                # Filter out URLs with hash fragments and check for class books
-                if href and f'/books/class-{class_number}-' in href and '#' not in href:
-                    # Extract book name and image from img element
-                    img = link.find('img')
-                    book_name = ""
-                    image_url = ""
-                    
-                    if img:
-                        if img.get('alt'):
-                            book_name = img.get('alt')
-                        # Get image URL
-                        img_src = img.get('src') or img.get('data-src')
-                        if img_src:
-                            # Convert relative URLs to absolute
-                            if img_src.startswith('//'):
-                                image_url = 'https:' + img_src
-                            elif img_src.startswith('/'):
-                                image_url = self.base_url + img_src
-                            else:
-                                image_url = img_src
-                    
-                    # Fallback to text content if no img alt
-                    if not book_name:
-                        book_name = self._clean_text(link.get_text())
-                    
-                    if book_name and href:
-                        book_data = {
-                            'name': book_name,
-                            'endpoint': href
-                        }
-                        
-                        # Add image URL if found
-                        if image_url:
-                            book_data['image_url'] = image_url
-                            
-                        books.append(book_data)
+            books = self._process_books(response.content, class_number)
             
             logging.info(f"Found {len(books)} books")
             return books
             
+        except NotModified:
+            raise
         except Exception as e:
             logging.error(f"Error scraping books: {str(e)}")
             raise
     
+    @cached('chapters')
     def get_book_chapters(self, book_path):
         """Get all chapters with proper structure based on actual HTML: <ol><li><h3>Chapter X</h3><ol><li>sub-sections</li></ol></li></ol>"""
         url = urljoin(self.base_url, book_path)
         
         try:
             response = self._make_request(url)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            chapters = []
-            
-            # Look for the actual structure: <ol class="list-none pl-0"><li><h3>Chapter X:</h3><ol><li><a>sub-section</a></li></ol></li></ol>
-            main_ol = soup.find('ol', class_='list-none')
-            
-            if main_ol:
-                # Find all chapter items (li elements that contain h3 with chapter title)
-                chapter_items = main_ol.find_all('li', class_='pl-0', recursive=False)
-                
-                for item in chapter_items:
-                    # Look for chapter title in h3
-                    chapter_title_elem = item.find('h3')
-                    if chapter_title_elem:
-                        chapter_title = self._clean_text(chapter_title_elem.get_text())
-                        
-                        # Skip if not a real chapter
-                        if not chapter_title or 'chapter' not in chapter_title.lower():
-                            continue
-                        
-                        chapter_data = {
-                            'chapter_name': chapter_title,
-                            'sub_sections': [],
-                            'pdf_link': None
-                        }
-                        
-                        # Look for sub-sections in the nested ol
-                        sub_ol = item.find('ol')
-                        if sub_ol:
-                            sub_items = sub_ol.find_all('li', class_='pl-0')
-                            
-                            for sub_item in sub_items:
-                                # Look for sub-section links
-                                link = sub_item.find('a', class_='link')
-                                if link and link.get('href'):
-                                    href = link.get('href')
-                                    link_text = self._clean_text(link.get_text())
-                                    
-                                    # Filter out hash URLs and add sub-section
-                                    if href and '#' not in href and link_text:
-                                        chapter_data['sub_sections'].append({
-                                            'name': link_text,
-                                            'endpoint': href
-                                        })
-                                
-                                # Look for PDF links in this sub-item
-                                pdf_link = sub_item.find('a', href=re.compile(r'\.pdf$'))
-                                if pdf_link:
-                                    chapter_data['pdf_link'] = pdf_link.get('href')
-                        
-                        # Look for PDF link at chapter level too
-                        if not chapter_data['pdf_link']:
-                            chapter_pdf = item.find('a', href=re.compile(r'\.pdf$'))
-                            if chapter_pdf:
-                                chapter_data['pdf_link'] = chapter_pdf.get('href')
-                        
-                        # Add chapter if it has content
-                        if chapter_data['sub_sections']:
-                            chapters.append(chapter_data)
-            
-            # If no chapters found with the primary method, try fallback
-            if not chapters:
-                # Look for h3 elements with "Chapter" in them
-                chapter_headings = soup.find_all('h3', string=re.compile(r'Chapter\s*\d+:', re.I))
-                
-                for heading in chapter_headings:
-                    chapter_title = self._clean_text(heading.get_text())
-                    
-                    chapter_data = {
-                        'chapter_name': chapter_title,
-                        'sub_sections': [],
-                        'pdf_link': None
-                    }
-                    
-                    # Look for links in the parent container
-                    parent = heading.parent
-                    if parent:
-                        # Find all links in this chapter section
-                        chapter_links = parent.find_all('a', href=True)
-                        
-                        for link in chapter_links:
-                            href = link.get('href')
-                            link_text = self._clean_text(link.get_text())
-                            
-                            # Add sub-section links
-                            if (href and href.startswith('/books/') and 'chapter' in href and 
-                                '#' not in href and link_text):
-                                
-                                # Filter for common sub-section types
-                                if any(keyword in link_text.lower() for keyword in 
-                                      ['questions', 'working', 'talking', 'understanding', 
-                                       'reading', 'thinking', 'writing', 'exercise']):
-                                    
-                                    chapter_data['sub_sections'].append({
-                                        'name': link_text,
-                                        'endpoint': href
-                                    })
-                            
-                            # Check for PDF links
-                            elif href and href.endswith('.pdf'):
-                                chapter_data['pdf_link'] = href
-                    
-                    # Add chapter if it has sub-sections
-                    if chapter_data['sub_sections']:
-                        chapters.append(chapter_data)
+            chapters = self._process_chapters(response.content)
             
             logging.info(f"Found {len(chapters)} chapters for book: {book_path}")
             return chapters
             
+        except NotModified:
+            raise
         except Exception as e:
             logging.error(f"Error scraping book chapters: {str(e)}")
             raise
     
+    @cached('questions')
     def get_questions(self, question_path):
         """Get all questions from a chapter section"""
         url = urljoin(self.base_url, question_path)
         
         try:
             response = self._make_request(url)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            questions = []
-            
-            # Look for question blocks - they typically have qna links
-            question_blocks = soup.find_all('a', href=re.compile(r'/qna/\d+'))
-            
-            for block in question_blocks:
-                href = block.get('href')
-                question_text = self._clean_text(block.get_text())
-                
-                if question_text and href:
-                    # Extract QNA ID from href
-                    qna_match = re.search(r'/qna/(\d+)', href)
-                    qna_id = qna_match.group(1) if qna_match else None
-                    
-                    questions.append({
-                        'question': question_text,
-                        'qna_id': qna_id,
-                        'answer_endpoint': href
-                    })
-            
-            # Alternative approach: look for question-like text patterns
-            if not questions:
-                # Find elements that might contain questions
-                potential_questions = soup.find_all(['p', 'div', 'span'], 
-                                                  string=re.compile(r'\?|What|How|Why|When|Where'))
-                
-                for elem in potential_questions:
-                    text = self._clean_text(elem.get_text())
-                    if text and len(text) > 20 and '?' in text:
-                        # Look for nearby QNA links
-                        parent = elem.parent
-                        if parent:
-                            qna_link = parent.find('a', href=re.compile(r'/qna/\d+'))
-                            if qna_link:
-                                href = qna_link.get('href')
-                                qna_match = re.search(r'/qna/(\d+)', href)
-                                qna_id = qna_match.group(1) if qna_match else None
-                                
-                                questions.append({
-                                    'question': text,
-                                    'qna_id': qna_id,
-                                    'answer_endpoint': href
-                                })
+            questions = self._process_questions(response.content)
             
             logging.info(f"Found {len(questions)} questions for path: {question_path}")
             return questions
             
+        except NotModified:
+            raise
         except Exception as e:
             logging.error(f"Error scraping questions: {str(e)}")
             raise
     
+    @cached('answer')
     def get_answer(self, qna_id):
         """Get question and answer text for a specific QNA ID"""
-        url = f"{self.base_url}/qna/{qna_id}"
+        url = self._answer_url(qna_id)
         
         try:
             response = self._make_request(url)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract question text - Priority 1: h1 with id="ocr-text" (most complete)
-            question_text = ""
-            
-            # Look for h1 with id="ocr-text" first (contains complete question)
-            h1_ocr = soup.find('h1', id='ocr-text')
-            if h1_ocr:
-                # Look for span with class="math" inside h1
-                math_span = h1_ocr.find('span', class_='math')
-                if math_span:
-                    # Get the innermost span content
-                    inner_span = math_span.find('span')
-                    if inner_span:
-                        question_text = self._clean_text(inner_span.get_text())
-                    else:
-                        question_text = self._clean_text(math_span.get_text())
-                else:
-                    question_text = self._clean_text(h1_ocr.get_text())
-            
-            # Fallback: Look for og:title meta tag
-            if not question_text:
-                og_title = soup.find('meta', property='og:title')
-                if og_title and og_title.get('content'):
-                    question_text = self._clean_text(og_title.get('content'))
-            
-            # Fallback: Look for title tag
-            if not question_text:
-                title_tag = soup.find('title')
-                if title_tag:
-                    question_text = self._clean_text(title_tag.get_text())
-            
-            # Extract answer text - Priority 1: Meta description (most reliable)
-            answer_text = ""
-            
-            # Look for meta description first (contains answer)
-            meta_desc = soup.find('meta', attrs={'name': 'description'})
-            if meta_desc and meta_desc.get('content'):
-                answer_text = self._clean_text(meta_desc.get('content'))
+            result, _ = self._process_answer(response.content, qna_id, url)
             
-            # Fallback: Look for og:description
-            if not answer_text:
-                og_desc = soup.find('meta', property='og:description')
-                if og_desc and og_desc.get('content'):
-                    answer_text = self._clean_text(og_desc.get('content'))
+            logging.info(f"Successfully retrieved Q&A for QNA ID: {qna_id}")
+            return result
             
-            # Fallback: Look for solution text in the page content
-            if not answer_text:
-                # Look for div with id="solution-text"
-                solution_div = soup.find('div', id='solution-text')
-                if solution_div:
-                    # Find the math span inside it
-                    math_span = solution_div.find('span', class_='math')
-                    if math_span:
-                        inner_span = math_span.find('span')
-                        if inner_span:
-                            answer_text = self._clean_text(inner_span.get_text())
-                    
-                    # If no math span, get direct text
-                    if not answer_text:
-                        answer_text = self._clean_text(solution_div.get_text())
+        except NotModified:
+            raise
+        except Exception as e:
+            logging.error(f"Error scraping answer for QNA ID {qna_id}: {str(e)}")
+            raise
+    
+    def get_answer_with_video(self, qna_id, video_scraper=None):
+        """Get Q&A and video info for a QNA ID from a single page download
+        
+        The /qna/ page is fetched and parsed once; the answer extractors and the
+        video scraper's extractors then run over the same document.
+        
+        Returns:
+            tuple: (answer dict as from get_answer, video result dict as from
+                    extract_video_url or None when no video scraper is given)
+        """
+        url = self._answer_url(qna_id)
+        
+        # Serve from cache when both halves are already cached
+        result, video_result = self._lookup_answer_with_video(qna_id, video_scraper)
+        if result is not MISS and video_result is not MISS:
+            return result, video_result
+        
+        # Recently expired halves are served while the page is refetched
+        stale = self._stale_answer_with_video(qna_id, video_scraper, result, video_result, within_grace=True)
+        if stale is not None:
+            self.cache.refresh_in_background(
+                f"answer_page:{qna_id}",
+                lambda: self._refresh_answer_with_video(qna_id, video_scraper)
+            )
+            return stale
+        
+        try:
+            # Concurrent requests for the same page share one download
+            page_result, page_video_result = get_single_flight().do(
+                f"answer_page:{qna_id}:{video_result is MISS}",
+                lambda: self._process_answer(
+                    self._make_request(url).content, qna_id, url,
+                    video_scraper if video_result is MISS else None
+                )
+            )
+            logging.info(f"Successfully retrieved Q&A for QNA ID: {qna_id}")
             
-            # Final fallback: Look for any substantial text content
-            if not answer_text:
-                # Look for text solution containers
-                solution_containers = soup.find_all(['div', 'section'], class_=re.compile(r'solution|answer'))
+        except NotModified:
+            raise
+        except Exception as e:
+            stale = self._stale_answer_with_video(qna_id, video_scraper, result, video_result)
+            if stale is not None:
+                logging.warning(f"Serving stale Q&A for QNA ID {qna_id} after upstream failure: {str(e)}")
+                return stale
+            logging.error(f"Error scraping answer for QNA ID {qna_id}: {str(e)}")
+            raise
+        
+        return self._store_answer_with_video(
+            qna_id, video_scraper, result, video_result, page_result, page_video_result
+        )
+    
+    def _books_url(self, class_number):
+        return f"{self.base_url}/books/class-{class_number}-all-books-download-questions-answers-solutions"
+    
+    def _answer_url(self, qna_id):
+        return f"{self.base_url}/qna/{qna_id}"
+    
+    def _lookup_answer_with_video(self, qna_id, video_scraper):
+        """Cached (answer, video result) for a QNA ID; either may be MISS"""
+        result = self.cache.get('answer', qna_id) if self.cache is not None else MISS
+        
+        if video_scraper is None:
+            return result, None
+        
+        video_cache = getattr(video_scraper, 'cache', None)
+        video_result = video_cache.get('video', self._answer_url(qna_id)) if video_cache is not None else MISS
+        return result, video_result
+    
+    def _stale_answer_with_video(self, qna_id, video_scraper, result, video_result, within_grace=False):
+        """(answer, video result) with cache misses filled from expired entries, or None if any is missing"""
+        halves = []
+        served = []
+        for endpoint, key, value, cache in (
+            ('answer', qna_id, result, self.cache),
+            ('video', self._answer_url(qna_id), video_result, getattr(video_scraper, 'cache', None)),
+        ):
+            if value is MISS:
+                value = cache.get_stale_value(endpoint, key, within_grace) if cache is not None else MISS
+                if value is MISS:
+                    return None
+                served.append((cache, endpoint, value))
+            halves.append(value)
+        
+        for cache, endpoint, value in served:
+            cache.serve_stale(endpoint, value, 'stale_served' if within_grace else 'stale_on_error')
+        return tuple(halves)
+    
+    def _refresh_answer_with_video(self, qna_id, video_scraper):
+        """Refetch a /qna/ page and overwrite both cached halves"""
+        url = self._answer_url(qna_id)
+        page_result, page_video_result = get_single_flight().do(
+            f"answer_page:{qna_id}:{video_scraper is not None}",
+            lambda: self._process_answer(self._make_request(url).content, qna_id, url, video_scraper)
+        )
+        self._store_answer_with_video(
+            qna_id, video_scraper, MISS, MISS if video_scraper is not None else None,
+            page_result, page_video_result
+        )
+    
+    def _store_answer_with_video(self, qna_id, video_scraper, result, video_result, page_result, page_video_result):
+        """Fill cache misses from a freshly processed page and return (answer, video result)"""
+        if result is MISS:
+            result = page_result
+            if self.cache is not None:
+                self.cache.set('answer', qna_id, result)
+        
+        if video_result is MISS:
+            video_result = page_video_result
+            video_cache = getattr(video_scraper, 'cache', None)
+            if video_cache is not None and video_scraper.is_cacheable_result(video_result):
+                video_cache.set('video', self._answer_url(qna_id), video_result)
+        
+        return result, video_result
+    
+    # Page processing: parse downloaded bytes and run the extractors. These do
+    # no I/O, so the async scraper and other fetch engines reuse them as-is.
+    
+    def _process_books(self, content, class_number):
+        """Parse a class page and extract its books"""
+        soup = self._parse(content, 'books')
+        return self._extract_books(soup, class_number)
+    
+    def _process_chapters(self, content):
+        """Parse a book page and extract its chapters"""
+        soup = self._parse(content, 'chapters')
+        
+        chapters = self._extract_chapters(soup)
+        
+        # If no chapters found with the primary method, try fallback
+        if not chapters:
+            # The fallback looks at heading parents, so it needs the full page
+            soup = self._parse(content)
+            chapters = self._extract_chapters_fallback(soup)
+        
+        return chapters
+    
+    def _process_questions(self, content):
+        """Parse a chapter section page and extract its questions"""
+        soup = self._parse(content, 'questions')
+        
+        questions = self._extract_questions(soup)
+        
+        # Alternative approach: look for question-like text patterns
+        if not questions:
+            # The fallback looks at element parents, so it needs the full page
+            soup = self._parse(content)
+            questions = self._extract_questions_fallback(soup)
+        
+        return questions
+    
+    def _process_answer(self, content, qna_id, url, video_scraper=None):
+        """Parse a /qna/ page and extract the Q&A, plus video info when a video scraper is given"""
+        if video_scraper is None:
+            soup = self._parse(content, 'answer')
+            return self._extract_answer(soup, qna_id, url), None
+        
+        # Video extraction needs scripts, media and meta tags as well
+        soup = self._parse(content, 'answer_video')
+        return self._extract_answer(soup, qna_id, url), video_scraper.extract_video_from_soup(soup)
+    
+    def _process_answer_unverified(self, content, qna_id, url, video_scraper):
+        """_process_answer without the video URL check, for callers that run video_scraper.verify_result() themselves"""
+        soup = self._parse(content, 'answer_video')
+        return self._extract_answer(soup, qna_id, url), video_scraper.extract_unverified(soup)
+    
+    @timed_extractor
+    def _extract_books(self, soup, class_number):
+        """Extract book entries from a parsed class page"""
+        books = []
+        
+        # Find all book links - they have specific class pattern
+        book_links = soup.find_all('a', class_=['flex', 'p-2', 'gap-2', 'h-full', 'link'])
+        
+        for link in book_links:
+            href = link.get('href')
+            # Filter out URLs with hash fragments and check for class books
+            if href and f'/books/class-{class_number}-' in href and '#' not in href:
+                # Extract book name and image from img element
+                img = link.find('img')
+                book_name = ""
+                image_url = ""
                 
-                for container in solution_containers:
-                    text = self._clean_text(container.get_text())
+                if img:
+                    if img.get('alt'):
+                        book_name = img.get('alt')
+                    # Get image URL
+                    img_src = img.get('src') or img.get('data-src')
+                    if img_src:
+                        # Convert relative URLs to absolute
+                        if img_src.startswith('//'):
+                            image_url = 'https:' + img_src
+                        elif img_src.startswith('/'):
+                            image_url = self.base_url + img_src
+                        else:
+                            image_url = img_src
+                
+                # Fallback to text content if no img alt
+                if not book_name:
+                    book_name = self._clean_text(link.get_text())
+                
+                if book_name and href:
+                    book_data = {
+                        'name': book_name,
+                        'endpoint': href
+                    }
                     
-                    # Skip navigation and promotional content
-                    skip_keywords = ['Download', 'Login', 'App', 'Video Solution', 'Text Solution', 'Verified by Experts', 'Show More']
-                    if any(keyword in text for keyword in skip_keywords):
+                    # Add image URL if found
+                    if image_url:
+                        book_data['image_url'] = image_url
+                        
+                    books.append(book_data)
+        
+        return books
+    
+    @timed_extractor
+    def _extract_chapters(self, soup):
+        """Extract chapters from the <ol class="list-none"> tree of a parsed book page"""
+        chapters = []
+        
+        # Look for the actual structure: <ol class="list-none pl-0"><li><h3>Chapter X:</h3><ol><li><a>sub-section</a></li></ol></li></ol>
+        main_ol = soup.find('ol', class_='list-none')
+        
+        if main_ol:
+            # Find all chapter items (li elements that contain h3 with chapter title)
+            chapter_items = main_ol.find_all('li', class_='pl-0', recursive=False)
+            
+            for item in chapter_items:
+                # Look for chapter title in h3
+                chapter_title_elem = item.find('h3')
+                if chapter_title_elem:
+                    chapter_title = self._clean_text(chapter_title_elem.get_text())
+                    
+                    # Skip if not a real chapter
+                    if not chapter_title or 'chapter' not in chapter_title.lower():
                         continue
                     
-                    # Look for substantial answer content
-                    if text and 30 <= len(text) <= 1000:
-                        answer_text = text
-                        break
-            
-            # Clean up extracted text
-            if question_text:
-                # Remove common suffixes from question
-                question_text = re.sub(r'(View Solution|Click here|\d+).*$', '', question_text, flags=re.IGNORECASE).strip()
-                
-            if answer_text:
-                # Remove common prefixes and suffixes from answer
-                answer_text = re.sub(r'^(Text Solution|Solution|Answer|Verified by Experts)[:.\s]*', '', answer_text, flags=re.IGNORECASE).strip()
-                answer_text = re.sub(r'(Show More|ShareSave|Video Solution|More from this Exercise).*$', '', answer_text, flags=re.IGNORECASE).strip()
-            
-            # Set default messages if content not found
-            if not question_text:
-                question_text = "Question text could not be extracted from this page."
-            
-            if not answer_text:
-                answer_text = "Answer could not be extracted from this page."
+                    chapter_data = {
+                        'chapter_name': chapter_title,
+                        'sub_sections': [],
+                        'pdf_link': None
+                    }
+                    
+                    # Look for sub-sections in the nested ol
+                    sub_ol = item.find('ol')
+                    if sub_ol:
+                        sub_items = sub_ol.find_all('li', class_='pl-0')
+                        
+                        for sub_item in sub_items:
+                            # Look for sub-section links
+                            link = sub_item.find('a', class_='link')
+                            if link and link.get('href'):
+                                href = link.get('href')
+                                link_text = self._clean_text(link.get_text())
+                                
+                                # Filter out hash URLs and add sub-section
+                                if href and '#' not in href and link_text:
+                                    chapter_data['sub_sections'].append({
+                                        'name': link_text,
+                                        'endpoint': href
+                                    })
+                            
+                            # Look for PDF links in this sub-item
+                            pdf_link = sub_item.find('a', href=re.compile(r'\.pdf$'))
+                            if pdf_link:
+                                chapter_data['pdf_link'] = pdf_link.get('href')
+                    
+                    # Look for PDF link at chapter level too
+                    if not chapter_data['pdf_link']:
+                        chapter_pdf = item.find('a', href=re.compile(r'\.pdf$'))
+                        if chapter_pdf:
+                            chapter_data['pdf_link'] = chapter_pdf.get('href')
+                    
+                    # Add chapter if it has content
+                    if chapter_data['sub_sections']:
+                        chapters.append(chapter_data)
+        
+        return chapters
+    
+    @timed_extractor
+    def _extract_chapters_fallback(self, soup):
+        """Extract chapters from "Chapter N:" headings when the chapter list is missing"""
+        chapters = []
+        
+        # Look for h3 elements with "Chapter" in them
+        chapter_headings = soup.find_all('h3', string=re.compile(r'Chapter\s*\d+:', re.I))
+        
+        for heading in chapter_headings:
+            chapter_title = self._clean_text(heading.get_text())
             
-            result = {
-                'qna_id': qna_id,
-                'question': question_text,
-                'answer': answer_text,
-                'source_url': url,
-                'status': 'success' if answer_text != "Answer could not be extracted from this page." else 'partial'
+            chapter_data = {
+                'chapter_name': chapter_title,
+                'sub_sections': [],
+                'pdf_link': None
             }
             
-            logging.info(f"Successfully retrieved Q&A for QNA ID: {qna_id}")
-            return result
+            # Look for links in the parent container
+            parent = heading.parent
+            if parent:
+                # Find all links in this chapter section
+                chapter_links = parent.find_all('a', href=True)
+                
+                for link in chapter_links:
+                    href = link.get('href')
+                    link_text = self._clean_text(link.get_text())
+                    
+                    # Add sub-section links
+                    if (href and href.startswith('/books/') and 'chapter' in href and 
+                        '#' not in href and link_text):
+                        
+                        # Filter for common sub-section types
+                        if any(keyword in link_text.lower() for keyword in 
+                              ['questions', 'working', 'talking', 'understanding', 
+                               'reading', 'thinking', 'writing', 'exercise']):
+                            
+                            chapter_data['sub_sections'].append({
+                                'name': link_text,
+                                'endpoint': href
+                            })
+                    
+                    # Check for PDF links
+                    elif href and href.endswith('.pdf'):
+                        chapter_data['pdf_link'] = href
             
-        except Exception as e:
-            logging.error(f"Error scraping answer for QNA ID {qna_id}: {str(e)}")
-            raise
+            # Add chapter if it has sub-sections
+            if chapter_data['sub_sections']:
+                chapters.append(chapter_data)
+        
+        return chapters
+    
+    @timed_extractor
+    def _extract_questions(self, soup):
+        """Extract questions from the /qna/ links of a parsed chapter section page"""
+        questions = []
+        
+        # Look for question blocks - they typically have qna links
+        question_blocks = soup.find_all('a', href=re.compile(r'/qna/\d+'))
+        
+        for block in question_blocks:
+            href = block.get('href')
+            question_text = self._clean_text(block.get_text())
+            
+            if question_text and href:
+                # Extract QNA ID from href
+                qna_match = re.search(r'/qna/(\d+)', href)
+                qna_id = qna_match.group(1) if qna_match else None
+                
+                questions.append({
+                    'question': question_text,
+                    'qna_id': qna_id,
+                    'answer_endpoint': href
+                })
+        
+        return questions
+    
+    @timed_extractor
+    def _extract_questions_fallback(self, soup):
+        """Extract questions from question-like text next to /qna/ links"""
+        questions = []
+        
+        # Find elements that might contain questions
+        potential_questions = soup.find_all(['p', 'div', 'span'], 
+                                          string=re.compile(r'\?|What|How|Why|When|Where'))
+        
+        for elem in potential_questions:
+            text = self._clean_text(elem.get_text())
+            if text and len(text) > 20 and '?' in text:
+                # Look for nearby QNA links
+                parent = elem.parent
+                if parent:
+                    qna_link = parent.find('a', href=re.compile(r'/qna/\d+'))
+                    if qna_link:
+                        href = qna_link.get('href')
+                        qna_match = re.search(r'/qna/(\d+)', href)
+                        qna_id = qna_match.group(1) if qna_match else None
+                        
+                        questions.append({
+                            'question': text,
+                            'qna_id': qna_id,
+                            'answer_endpoint': href
+                        })
+        
+        return questions
+    
+    @timed_extractor
+    def _extract_answer(self, soup, qna_id, url):
+        """Extract question and answer text from a parsed /qna/ page"""
+        # Extract question text - Priority 1: h1 with id="ocr-text" (most complete)
+        question_text = ""
+        
+        # Look for h1 with id="ocr-text" first (contains complete question)
+        h1_ocr = soup.find('h1', id='ocr-text')
+        if h1_ocr:
+            # Look for span with class="math" inside h1
+            math_span = h1_ocr.find('span', class_='math')
+            if math_span:
+                # Get the innermost span content
+                inner_span = math_span.find('span')
+                if inner_span:
+                    question_text = self._clean_text(inner_span.get_text())
+                else:
+                    question_text = self._clean_text(math_span.get_text())
+            else:
+                question_text = self._clean_text(h1_ocr.get_text())
+        
+        # Fallback: Look for og:title meta tag
+        if not question_text:
+            og_title = soup.find('meta', property='og:title')
+            if og_title and og_title.get('content'):
+                question_text = self._clean_text(og_title.get('content'))
+        
+        # Fallback: Look for title tag
+        if not question_text:
+            title_tag = soup.find('title')
+            if title_tag:
+                question_text = self._clean_text(title_tag.get_text())
+        
+        # Extract answer text - Priority 1: Meta description (most reliable)
+        answer_text = ""
+        
+        # Look for meta description first (contains answer)
+        meta_desc = soup.find('meta', attrs={'name': 'description'})
+        if meta_desc and meta_desc.get('content'):
+            answer_text = self._clean_text(meta_desc.get('content'))
+        
+        # Fallback: Look for og:description
+        if not answer_text:
+            og_desc = soup.find('meta', property='og:description')
+            if og_desc and og_desc.get('content'):
+                answer_text = self._clean_text(og_desc.get('content'))
+        
+        # Fallback: Look for solution text in the page content
+        if not answer_text:
+            # Look for div with id="solution-text"
+            solution_div = soup.find('div', id='solution-text')
+            if solution_div:
+                # Find the math span inside it
+                math_span = solution_div.find('span', class_='math')
+                if math_span:
+                    inner_span = math_span.find('span')
+                    if inner_span:
+                        answer_text = self._clean_text(inner_span.get_text())
+                
+                # If no math span, get direct text
+                if not answer_text:
+                    answer_text = self._clean_text(solution_div.get_text())
+        
+        # Final fallback: Look for any substantial text content
+        if not answer_text:
+            # Look for text solution containers
+            solution_containers = soup.find_all(['div', 'section'], class_=re.compile(r'solution|answer'))
+            
+            for container in solution_containers:
+                text = self._clean_text(container.get_text())
+                
+                # Skip navigation and promotional content
+                skip_keywords = ['Download', 'Login', 'App', 'Video Solution', 'Text Solution', 'Verified by Experts', 'Show More']
+                if any(keyword in text for keyword in skip_keywords):
+                    continue
+                
+                # Look for substantial answer content
+                if text and 30 <= len(text) <= 1000:
+                    answer_text = text
+                    break
+        
+        # Clean up extracted text
+        if question_text:
+            # Remove common suffixes from question
+            question_text = re.sub(r'(View Solution|Click here|\d+).*$', '', question_text, flags=re.IGNORECASE).strip()
+            
+        if answer_text:
+            # Remove common prefixes and suffixes from answer
+            answer_text = re.sub(r'^(Text Solution|Solution|Answer|Verified by Experts)[:.\s]*', '', answer_text, flags=re.IGNORECASE).strip()
+            answer_text = re.sub(r'(Show More|ShareSave|Video Solution|More from this Exercise).*$', '', answer_text, flags=re.IGNORECASE).strip()
+        
+        # Set default messages if content not found
+        if not question_text:
+            question_text = "Question text could not be extracted from this page."
+        
+        if not answer_text:
+            answer_text = "Answer could not be extracted from this page."
+        
+        result = {
+            'qna_id': qna_id,
+            'question': question_text,
+            'answer': answer_text,
+            'source_url': url,
+            'status': 'success' if answer_text != "Answer could not be extracted from this page." else 'partial'
+        }
+        return result
@@ -0,0 +1,368 @@
+import os
+import re
+import json
+import hashlib
+import sqlite3
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sections (
+    endpoint TEXT PRIMARY KEY,
+    book_endpoint TEXT NOT NULL,
+    chapter_name TEXT,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS section_hashes (
+    endpoint TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    qna_id TEXT NOT NULL UNIQUE,
+    section_endpoint TEXT,
+    class_number INTEGER,
+    question TEXT NOT NULL DEFAULT '',
+    answer TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS documents_section ON documents (section_endpoint);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    question, answer, tokenize = 'porter unicode61'
+);
+'''
+
+_CLASS_PATH = re.compile(r'/books/class-(\d+)-')
+_WORD = re.compile(r'\w+')
+
+# Matched terms in snippets are wrapped in these
+SNIPPET_START = '<mark>'
+SNIPPET_END = '</mark>'
+
+MAX_LIMIT = 100
+
+
+def class_from_path(path):
+    """Class number encoded in a /books/class-N-... path, or None"""
+    match = _CLASS_PATH.search(path or '')
+    return int(match.group(1)) if match else None
+
+
+def clean_question(text):
+    return (text or '').replace('View Solution', '').strip()
+
+
+def match_expression(query):
+    """FTS5 MATCH expression for free text: all words must match, the last one as a prefix
+
+    Words are quoted, so user input can't produce FTS5 syntax errors.
+    Returns None when the query has no searchable words.
+    """
+    words = _WORD.findall(query or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class SearchIndex:
+    """SQLite FTS5 index of scraped questions and answers
+
+    Fed incrementally from chapter trees (which sections belong to which
+    book), question lists and answers; unchanged inputs are skipped, so
+    feeding it repeated cache hits is cheap. Writes can be queued on a
+    single background writer with submit().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    @classmethod
+    def from_env(cls):
+        """Build an index from DOUBTNUT_SEARCH_* environment variables, or None if disabled"""
+        if os.environ.get('DOUBTNUT_SEARCH', '1') == '0':
+            return None
+        path = os.environ.get(
+            'DOUBTNUT_SEARCH_PATH',
+            os.path.join(tempfile.gettempdir(), 'doubtnut_search.sqlite3')
+        )
+        return cls(path) if path else None
+
+    def _conn(self):
+        """One connection per thread; WAL lets searches run while the writer indexes"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def submit(self, method, *args):
+        """Run an index_* method on the background writer thread"""
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='search-index')
+
+        def run():
+            try:
+                method(*args)
+            except Exception as e:
+                logging.warning(f"Search indexing failed: {str(e)}")
+
+        self._writer.submit(run)
+
+    def _upsert_document(self, conn, qna_id, **fields):
+        """Insert or update a document row and its FTS entry"""
+        row = conn.execute('SELECT * FROM documents WHERE qna_id = ?', (qna_id,)).fetchone()
+        if row is None:
+            values = {'section_endpoint': None, 'class_number': None, 'question': '', 'answer': ''}
+            values.update(fields)
+            doc_id = conn.execute(
+                'INSERT INTO documents (qna_id, section_endpoint, class_number, question, answer) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (qna_id, values['section_endpoint'], values['class_number'], values['question'], values['answer'])
+            ).lastrowid
+        else:
+            values = dict(row)
+            if all(values[name] == value for name, value in fields.items()):
+                return
+            values.update(fields)
+            doc_id = row['id']
+            conn.execute(
+                'UPDATE documents SET section_endpoint = ?, class_number = ?, question = ?, answer = ? WHERE id = ?',
+                (values['section_endpoint'], values['class_number'], values['question'], values['answer'], doc_id)
+            )
+            conn.execute('DELETE FROM documents_fts WHERE rowid = ?', (doc_id,))
+
+        conn.execute(
+            'INSERT INTO documents_fts (rowid, question, answer) VALUES (?, ?, ?)',
+            (doc_id, values['question'], values['answer'])
+        )
+
+    def index_chapters(self, book_path, chapters):
+        """Record which book each sub-section belongs to, for the book filter"""
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                for chapter in chapters:
+                    for section in chapter.get('sub_sections', []):
+                        conn.execute(
+                            'INSERT OR REPLACE INTO sections (endpoint, book_endpoint, chapter_name, name) '
+                            'VALUES (?, ?, ?, ?)',
+                            (section['endpoint'], book_path, chapter.get('chapter_name'), section.get('name'))
+                        )
+
+    def index_questions(self, question_path, questions):
+        """Index a sub-section's question list; skipped if it is unchanged since last time"""
+        content_hash = hashlib.sha1(
+            json.dumps(questions, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        ).hexdigest()
+        class_number = class_from_path(question_path)
+
+        with self._write_lock:
+            conn = self._conn()
+            row = conn.execute(
+                'SELECT content_hash FROM section_hashes WHERE endpoint = ?', (question_path,)
+            ).fetchone()
+            if row is not None and row['content_hash'] == content_hash:
+                return
+
+            with conn:
+                for question in questions:
+                    if not question.get('qna_id'):
+                        continue
+                    self._upsert_document(
+                        conn, str(question['qna_id']),
+                        section_endpoint=question_path,
+                        class_number=class_number,
+                        question=clean_question(question.get('question'))
+                    )
+                conn.execute(
+                    'INSERT OR REPLACE INTO section_hashes (endpoint, content_hash) VALUES (?, ?)',
+                    (question_path, content_hash)
+                )
+
+    def index_answer(self, qna_id, answer):
+        """Index the question and answer text of a scraped /qna/ page"""
+        if not answer or not answer.get('answer'):
+            return
+        fields = {'answer': answer['answer']}
+        with self._write_lock:
+            conn = self._conn()
+            row = conn.execute('SELECT question FROM documents WHERE qna_id = ?', (str(qna_id),)).fetchone()
+            # The question list text wins; the answer page's copy fills in for unlisted questions
+            if row is None or not row['question']:
+                fields['question'] = clean_question(answer.get('question'))
+            with conn:
+                self._upsert_document(conn, str(qna_id), **fields)
+
+    def index_store(self, store):
+        """Bulk-load a crawled CatalogStore; returns the number of documents indexed"""
+        conn = store._conn()
+        books = [row['endpoint'] for row in conn.execute('SELECT DISTINCT endpoint FROM books')]
+        for book_path in books:
+            chapters = store.get_chapters(book_path)
+            if chapters:
+                self.index_chapters(book_path, chapters)
+
+        sections = [row['section_endpoint'] for row in conn.execute('SELECT DISTINCT section_endpoint FROM questions')]
+        for question_path in sections:
+            self.index_questions(question_path, store.get_questions(question_path) or [])
+
+        for row in conn.execute('SELECT qna_id, question, answer FROM answers'):
+            self.index_answer(row['qna_id'], dict(row))
+        return self.stats()['documents']
+
+    def search(self, query, class_number=None, book=None, limit=20, offset=0):
+        """Ranked matches for a free-text query, best first
+
+        Returns a list of dicts with qna_id, question, snippet, class,
+        book_path, chapter_name, section_name, section and score (bm25,
+        lower is better). Questions weigh twice as much as answer text.
+        """
+        expression = match_expression(query)
+        if expression is None:
+            return []
+
+        sql = [
+            'SELECT d.qna_id, d.question, d.class_number, d.section_endpoint, '
+            's.book_endpoint, s.chapter_name, s.name AS section_name, '
+            'snippet(documents_fts, -1, ?, ?, \'…\', 16) AS snippet, '
+            'bm25(documents_fts, 2.0, 1.0) AS score '
+            'FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid '
+            'LEFT JOIN sections s ON s.endpoint = d.section_endpoint '
+            'WHERE documents_fts MATCH ?'
+        ]
+        params = [SNIPPET_START, SNIPPET_END, expression]
+        if class_number is not None:
+            sql.append('AND d.class_number = ?')
+            params.append(class_number)
+        if book:
+            sql.append('AND s.book_endpoint = ?')
+            params.append(book)
+        sql.append('ORDER BY score LIMIT ? OFFSET ?')
+        params.extend([max(1, min(limit, MAX_LIMIT)), max(0, offset)])
+
+        rows = self._conn().execute(' '.join(sql), params).fetchall()
+        return [{
+            'qna_id': row['qna_id'],
+            'question': row['question'],
+            'snippet': row['snippet'],
+            'class': row['class_number'],
+            'book_path': row['book_endpoint'],
+            'chapter_name': row['chapter_name'],
+            'section_name': row['section_name'],
+            'section': row['section_endpoint'],
+            'score': round(row['score'], 4)
+        } for row in rows]
+
+    def stats(self):
+        """Row counts of the index"""
+        conn = self._conn()
+        return {
+            'documents': conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0],
+            'answers': conn.execute("SELECT COUNT(*) FROM documents WHERE answer != ''").fetchone()[0],
+            'sections': conn.execute('SELECT COUNT(*) FROM section_hashes').fetchone()[0],
+            'books': conn.execute('SELECT COUNT(DISTINCT book_endpoint) FROM sections').fetchone()[0],
+        }
+
+
+class IndexingScraper:
+    """DoubnutScraper front end that feeds every result into a SearchIndex
+
+    Indexing runs on the index's background writer, so requests don't wait
+    for it. Anything else is delegated to the wrapped scraper.
+    """
+
+    def __init__(self, scraper, index):
+        self.scraper = scraper
+        self.index = index
+
+    def __getattr__(self, name):
+        return getattr(self.scraper, name)
+
+    def get_book_chapters(self, book_path):
+        chapters = self.scraper.get_book_chapters(book_path)
+        self.index.submit(self.index.index_chapters, book_path, chapters)
+        return chapters
+
+    def get_questions(self, question_path):
+        questions = self.scraper.get_questions(question_path)
+        self.index.submit(self.index.index_questions, question_path, questions)
+        return questions
+
+    def get_answer(self, qna_id):
+        answer = self.scraper.get_answer(qna_id)
+        self.index.submit(self.index.index_answer, qna_id, answer)
+        return answer
+
+    def get_answer_with_video(self, qna_id, video_scraper=None):
+        answer, video_result = self.scraper.get_answer_with_video(qna_id, video_scraper)
+        self.index.submit(self.index.index_answer, qna_id, answer)
+        return answer, video_result
+
+
+class AsyncIndexingScraper:
+    """IndexingScraper counterpart for AsyncDoubtnutScraper"""
+
+    def __init__(self, scraper, index):
+        self.scraper = scraper
+        self.index = index
+
+    def __getattr__(self, name):
+        return getattr(self.scraper, name)
+
+    async def get_book_chapters(self, book_path):
+        chapters = await self.scraper.get_book_chapters(book_path)
+        self.index.submit(self.index.index_chapters, book_path, chapters)
+        return chapters
+
+    async def get_questions(self, question_path):
+        questions = await self.scraper.get_questions(question_path)
+        self.index.submit(self.index.index_questions, question_path, questions)
+        return questions
+
+    async def get_answer(self, qna_id):
+        answer = await self.scraper.get_answer(qna_id)
+        self.index.submit(self.index.index_answer, qna_id, answer)
+        return answer
+
+    async def get_answer_with_video(self, qna_id, with_video=True):
+        answer, video_result = await self.scraper.get_answer_with_video(qna_id, with_video)
+        self.index.submit(self.index.index_answer, qna_id, answer)
+        return answer, video_result
+
+
+# Command line interface
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build or query the question search index')
+    parser.add_argument('--index', default=None, help='Index path (default: DOUBTNUT_SEARCH_PATH or <tmpdir>)')
+    parser.add_argument('--from-store', metavar='DB', help='Bulk-load a catalog store built by crawler.py')
+    parser.add_argument('--class', dest='class_number', type=int, help='Only questions of this class')
+    parser.add_argument('--book', help='Only questions of this book path')
+    parser.add_argument('query', nargs='?', help='Text to search for')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    index = SearchIndex(args.index) if args.index else SearchIndex.from_env()
+    if args.from_store:
+        from store import CatalogStore
+        print(f"Indexed {index.index_store(CatalogStore(args.from_store))} documents")
+    if args.query:
+        for result in index.search(args.query, args.class_number, args.book):
+            print(f"{result['qna_id']:>12}  {result['score']:8.3f}  {result['snippet']}")
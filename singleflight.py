@@ -0,0 +1,110 @@
+import threading
+
+
+class _Call:
+    """One in-flight execution that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one execution
+
+    The first caller for a key runs the function; callers arriving while it
+    is still running wait for it and get the same result (or exception)
+    instead of fetching the same upstream page again. Nothing is
+    remembered once the call finishes - that is the cache's job.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+        self.counters = {
+            'executed': 0,
+            'coalesced': 0,
+        }
+
+    def do(self, key, fn):
+        """Run fn() for key, or wait for the call already running for it"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.counters['executed'] += 1
+            else:
+                self.counters['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key, coroutine_fn):
+        """Async counterpart of do(); coalesces callers on the running event loop
+
+        The shared call runs as its own task, so a caller that is cancelled
+        (e.g. its client disconnected) leaves it running for the others.
+        """
+        # Imported here so sync-only processes don't pay for asyncio at startup
+        import asyncio
+
+        task = self._async_calls.get(key)
+        if task is not None:
+            with self._lock:
+                self.counters['coalesced'] += 1
+        else:
+            task = asyncio.ensure_future(coroutine_fn())
+            self._async_calls[key] = task
+            with self._lock:
+                self.counters['executed'] += 1
+            task.add_done_callback(lambda done: self._finish_async(key, done))
+
+        # Shield so no single caller going away cancels the shared call
+        return await asyncio.shield(task)
+
+    def _finish_async(self, key, task):
+        if self._async_calls.get(key) is task:
+            del self._async_calls[key]
+        # Mark retrieved so a failure nobody is left to await is not logged by asyncio
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        """Executed/coalesced counters and calls currently in flight"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['in_flight'] = len(self._calls) + len(self._async_calls)
+        total = stats['executed'] + stats['coalesced']
+        stats['coalesced_ratio'] = round(stats['coalesced'] / total, 4) if total else 0.0
+        return stats
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """Return the process-wide SingleFlight shared by every scraper"""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
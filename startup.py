@@ -0,0 +1,84 @@
+"""Cold-start accounting for the API process
+
+The app records how long its own startup stages take (reported by
+/health); run this module to get an import-time breakdown of a fresh
+interpreter importing the app:
+
+    python startup.py            # imports app
+    python startup.py asgi --top 30
+"""
+import sys
+import time
+import threading
+import subprocess
+from contextlib import contextmanager
+
+_started = time.perf_counter()
+_stages = []
+_stages_lock = threading.Lock()
+
+
+@contextmanager
+def stage(name):
+    """Time one startup stage, e.g. importing a module or building the scrapers"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _stages_lock:
+            _stages.append({
+                'stage': name,
+                'started_ms': round((start - _started) * 1000, 3),
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+            })
+
+
+def report():
+    """Recorded stages, in the order they finished"""
+    with _stages_lock:
+        return {'stages': list(_stages)}
+
+
+def import_times(module='app'):
+    """Import time per top-level package for a fresh `import module`
+
+    Runs `python -X importtime` in a subprocess, so nothing is cached yet,
+    and adds up the self time of every module under each package.
+    Returns (total_ms, [(package, ms), ...] sorted slowest first).
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    packages = {}
+    total_ms = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+        name = name.strip()
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1000
+        if name == module:
+            total_ms = int(cumulative_us) / 1000
+
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return total_ms, ranked
+
+
+# Command line interface
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Import-time breakdown of the API modules')
+    parser.add_argument('module', nargs='?', default='app', help='Module to import (default: app)')
+    parser.add_argument('--top', type=int, default=15, help='Packages to show (default: 15)')
+    args = parser.parse_args()
+
+    total_ms, ranked = import_times(args.module)
+    print(f"import {args.module}: {total_ms:.1f} ms")
+    for package, cumulative_ms in ranked[:args.top]:
+        print(f"  {package:<30} {cumulative_ms:8.1f} ms")
@@ -0,0 +1,355 @@
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS books (
+    class_number INTEGER NOT NULL,
+    endpoint TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    image_url TEXT,
+    PRIMARY KEY (class_number, endpoint)
+);
+CREATE TABLE IF NOT EXISTS chapters (
+    book_endpoint TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    chapter_name TEXT NOT NULL,
+    pdf_link TEXT,
+    PRIMARY KEY (book_endpoint, position)
+);
+CREATE TABLE IF NOT EXISTS sub_sections (
+    book_endpoint TEXT NOT NULL,
+    chapter_position INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    PRIMARY KEY (book_endpoint, chapter_position, position)
+);
+CREATE INDEX IF NOT EXISTS sub_sections_endpoint ON sub_sections (endpoint);
+CREATE TABLE IF NOT EXISTS questions (
+    section_endpoint TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    qna_id TEXT,
+    question TEXT NOT NULL,
+    answer_endpoint TEXT,
+    PRIMARY KEY (section_endpoint, position)
+);
+CREATE INDEX IF NOT EXISTS questions_qna_id ON questions (qna_id);
+CREATE TABLE IF NOT EXISTS answers (
+    qna_id TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    source_url TEXT,
+    status TEXT,
+    video_url TEXT,
+    video_result TEXT
+);
+CREATE TABLE IF NOT EXISTS crawl_progress (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    content_hash TEXT,
+    PRIMARY KEY (kind, key)
+);
+'''
+
+
+# Recorded instead of a content hash while a recrawl of the pages below is unfinished
+DIRTY_HASH = 'dirty'
+
+
+def content_hash(value):
+    """Stable hash of a scraped result (books, chapter tree, question list, ...)"""
+    data = json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class CatalogStore:
+    """Normalized SQLite snapshot of the Doubtnut catalog
+
+    Every save records a crawl_progress row for the page it came from, so
+    lookups can tell "not crawled yet" (None) from "crawled and empty" ([]),
+    and an interrupted crawl resumes where it stopped. The row also keeps a
+    hash of the scraped result, so a recrawl can tell whether a page changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(crawl_progress)')]
+        if 'content_hash' not in columns:
+            conn.execute('ALTER TABLE crawl_progress ADD COLUMN content_hash TEXT')
+        conn.commit()
+
+    def _conn(self):
+        """One connection per thread; WAL lets readers run alongside the crawler"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _is_fetched(self, kind, key):
+        row = self._conn().execute(
+            'SELECT 1 FROM crawl_progress WHERE kind = ? AND key = ?', (kind, str(key))
+        ).fetchone()
+        return row is not None
+
+    def _mark_fetched(self, conn, kind, key, value=None, dirty=False):
+        if dirty:
+            value_hash = DIRTY_HASH
+        else:
+            value_hash = content_hash(value) if value is not None else None
+        conn.execute(
+            'INSERT OR REPLACE INTO crawl_progress (kind, key, fetched_at, content_hash) VALUES (?, ?, ?, ?)',
+            (kind, str(key), time.time(), value_hash)
+        )
+
+    def get_hash(self, kind, key):
+        """Content hash recorded when a page was last saved, or None if unknown"""
+        row = self._conn().execute(
+            'SELECT content_hash FROM crawl_progress WHERE kind = ? AND key = ?', (kind, str(key))
+        ).fetchone()
+        return row['content_hash'] if row is not None else None
+
+    def set_hash(self, kind, key, value_hash):
+        """Overwrite the content hash recorded for a saved page"""
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute(
+                    'UPDATE crawl_progress SET content_hash = ? WHERE kind = ? AND key = ?',
+                    (value_hash, kind, str(key))
+                )
+
+    def get_books(self, class_number):
+        """Books for a class, or None if the class page was never crawled"""
+        if not self._is_fetched('books', class_number):
+            return None
+        rows = self._conn().execute(
+            'SELECT name, endpoint, image_url FROM books WHERE class_number = ? ORDER BY position',
+            (class_number,)
+        ).fetchall()
+
+        books = []
+        for row in rows:
+            book = {'name': row['name'], 'endpoint': row['endpoint']}
+            if row['image_url']:
+                book['image_url'] = row['image_url']
+            books.append(book)
+        return books
+
+    def save_books(self, class_number, books):
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute('DELETE FROM books WHERE class_number = ?', (class_number,))
+                seen_endpoints = set()
+                for position, book in enumerate(books):
+                    # The class page links some books more than once
+                    if book['endpoint'] in seen_endpoints:
+                        continue
+                    seen_endpoints.add(book['endpoint'])
+                    conn.execute(
+                        'INSERT INTO books (class_number, endpoint, position, name, image_url) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        (class_number, book['endpoint'], position, book['name'], book.get('image_url'))
+                    )
+                self._mark_fetched(conn, 'books', class_number, books)
+
+    def get_chapters(self, book_path):
+        """Chapters for a book, or None if the book page was never crawled"""
+        if not self._is_fetched('chapters', book_path):
+            return None
+        conn = self._conn()
+        chapter_rows = conn.execute(
+            'SELECT position, chapter_name, pdf_link FROM chapters WHERE book_endpoint = ? ORDER BY position',
+            (book_path,)
+        ).fetchall()
+        section_rows = conn.execute(
+            'SELECT chapter_position, name, endpoint FROM sub_sections WHERE book_endpoint = ? '
+            'ORDER BY chapter_position, position',
+            (book_path,)
+        ).fetchall()
+
+        sections = {}
+        for row in section_rows:
+            sections.setdefault(row['chapter_position'], []).append({
+                'name': row['name'],
+                'endpoint': row['endpoint']
+            })
+
+        return [{
+            'chapter_name': row['chapter_name'],
+            'sub_sections': sections.get(row['position'], []),
+            'pdf_link': row['pdf_link']
+        } for row in chapter_rows]
+
+    def save_chapters(self, book_path, chapters, dirty=False):
+        """Replace a book's chapter tree; dirty=True records DIRTY_HASH instead of its hash"""
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute('DELETE FROM chapters WHERE book_endpoint = ?', (book_path,))
+                conn.execute('DELETE FROM sub_sections WHERE book_endpoint = ?', (book_path,))
+                for position, chapter in enumerate(chapters):
+                    conn.execute(
+                        'INSERT INTO chapters (book_endpoint, position, chapter_name, pdf_link) VALUES (?, ?, ?, ?)',
+                        (book_path, position, chapter['chapter_name'], chapter.get('pdf_link'))
+                    )
+                    for section_position, section in enumerate(chapter.get('sub_sections', [])):
+                        conn.execute(
+                            'INSERT INTO sub_sections (book_endpoint, chapter_position, position, name, endpoint) '
+                            'VALUES (?, ?, ?, ?, ?)',
+                            (book_path, position, section_position, section['name'], section['endpoint'])
+                        )
+                self._mark_fetched(conn, 'chapters', book_path, chapters, dirty)
+
+    def get_questions(self, question_path):
+        """Questions for a chapter section, or None if it was never crawled"""
+        if not self._is_fetched('questions', question_path):
+            return None
+        rows = self._conn().execute(
+            'SELECT question, qna_id, answer_endpoint FROM questions WHERE section_endpoint = ? ORDER BY position',
+            (question_path,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def save_questions(self, question_path, questions, dirty=False):
+        """Replace a sub-section's question list; dirty=True records DIRTY_HASH instead of its hash"""
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute('DELETE FROM questions WHERE section_endpoint = ?', (question_path,))
+                for position, question in enumerate(questions):
+                    conn.execute(
+                        'INSERT INTO questions (section_endpoint, position, qna_id, question, answer_endpoint) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        (question_path, position, question.get('qna_id'), question['question'],
+                         question.get('answer_endpoint'))
+                    )
+                self._mark_fetched(conn, 'questions', question_path, questions, dirty)
+
+    def get_answer(self, qna_id):
+        """(answer dict, video result or None) for a QNA ID, or None if never crawled"""
+        row = self._conn().execute('SELECT * FROM answers WHERE qna_id = ?', (str(qna_id),)).fetchone()
+        if row is None:
+            return None
+
+        answer = {
+            'qna_id': row['qna_id'],
+            'question': row['question'],
+            'answer': row['answer'],
+            'source_url': row['source_url'],
+            'status': row['status']
+        }
+        video_result = json.loads(row['video_result']) if row['video_result'] else None
+        return answer, video_result
+
+    def save_answer(self, qna_id, answer, video_result=None):
+        video_url = video_result.get('video_url') if video_result and video_result.get('success') else None
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO answers '
+                    '(qna_id, question, answer, source_url, status, video_url, video_result) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (str(qna_id), answer['question'], answer['answer'], answer.get('source_url'),
+                     answer.get('status'), video_url, json.dumps(video_result) if video_result else None)
+                )
+                self._mark_fetched(conn, 'answer', qna_id)
+
+    def stats(self):
+        """Row counts per table"""
+        conn = self._conn()
+        return {
+            table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            for table in ('books', 'chapters', 'sub_sections', 'questions', 'answers')
+        }
+
+
+class StoreBackedScraper:
+    """DoubnutScraper front end that answers from a CatalogStore first
+
+    Lookups that the store cannot answer fall back to live scraping and the
+    result is written back, so the store fills up as traffic or the crawler
+    touches new pages. Anything else is delegated to the wrapped scraper.
+    """
+
+    def __init__(self, scraper, store):
+        self.scraper = scraper
+        self.store = store
+
+    def __getattr__(self, name):
+        return getattr(self.scraper, name)
+
+    def get_all_books(self, class_number=11):
+        books = self.store.get_books(class_number)
+        if books is None:
+            books = self.refresh_books(class_number)
+        return books
+
+    def get_book_chapters(self, book_path):
+        chapters = self.store.get_chapters(book_path)
+        if chapters is None:
+            chapters = self.refresh_chapters(book_path)
+        return chapters
+
+    def get_questions(self, question_path):
+        questions = self.store.get_questions(question_path)
+        if questions is None:
+            questions = self.refresh_questions(question_path)
+        return questions
+
+    def get_answer(self, qna_id):
+        stored = self.store.get_answer(qna_id)
+        if stored is not None:
+            return stored[0]
+        answer = self.scraper.get_answer(qna_id)
+        self.store.save_answer(qna_id, answer)
+        return answer
+
+    def get_answer_with_video(self, qna_id, video_scraper=None):
+        stored = self.store.get_answer(qna_id)
+        # Answers saved without a video lookup still need the live path for the video
+        if stored is not None and (video_scraper is None or stored[1] is not None):
+            return stored[0], stored[1] if video_scraper is not None else None
+
+        return self.refresh_answer_with_video(qna_id, video_scraper)
+
+    # Live scrapes that overwrite the stored copy, used on misses and by recrawls
+
+    def refresh_books(self, class_number):
+        books = self.scraper.get_all_books(class_number)
+        self.store.save_books(class_number, books)
+        return books
+
+    def refresh_chapters(self, book_path, dirty=False):
+        chapters = self.scraper.get_book_chapters(book_path)
+        self.store.save_chapters(book_path, chapters, dirty)
+        return chapters
+
+    def refresh_questions(self, question_path, dirty=False):
+        questions = self.scraper.get_questions(question_path)
+        self.store.save_questions(question_path, questions, dirty)
+        return questions
+
+    def refresh_answer_with_video(self, qna_id, video_scraper=None):
+        answer, video_result = self.scraper.get_answer_with_video(qna_id, video_scraper)
+        if video_result is None or video_scraper.is_cacheable_result(video_result):
+            self.store.save_answer(qna_id, answer, video_result)
+        else:
+            logging.info(f"Not storing transient video lookup failure for QNA ID {qna_id}")
+            self.store.save_answer(qna_id, answer)
+        return answer, video_result
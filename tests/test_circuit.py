@@ -0,0 +1,86 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DOUBTNUT_RATE_LIMIT', '0')
+
+import async_scraper  # noqa: E402
+import scraper  # noqa: E402
+from circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError  # noqa: E402
+
+
+def half_open_breaker():
+    """A breaker that has opened once and lets its next request through as the trial"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    return breaker
+
+
+class HangingClient:
+    def __init__(self):
+        self.started = asyncio.Event()
+
+    async def get(self, url, headers=None):
+        self.started.set()
+        await asyncio.sleep(60)
+
+
+def test_cancelled_trial_releases_the_trial_slot(monkeypatch):
+    breaker = half_open_breaker()
+    monkeypatch.setattr(async_scraper, 'get_breaker', lambda: breaker)
+    client = HangingClient()
+    fetcher = async_scraper.AsyncDoubtnutScraper()
+    monkeypatch.setattr(fetcher, '_get_client', lambda: client)
+
+    async def cancel_trial():
+        trial = asyncio.ensure_future(fetcher._fetch('https://www.doubtnut.com/qna/1'))
+        await client.started.wait()
+        assert breaker.state == HALF_OPEN
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+    asyncio.run(cancel_trial())
+
+    assert breaker.state == OPEN
+    assert breaker.opened == 2
+    # The reset timeout has passed again, so a new trial is let through
+    breaker.before_request()
+    assert breaker.state == HALF_OPEN
+
+
+def test_unexpected_error_in_trial_releases_the_trial_slot(monkeypatch):
+    breaker = half_open_breaker()
+    monkeypatch.setattr(scraper, 'get_breaker', lambda: breaker)
+    sync_scraper = scraper.DoubnutScraper()
+
+    def broken_get(url, **kwargs):
+        raise ValueError('not a transport error')
+
+    monkeypatch.setattr(sync_scraper, 'session', type('Session', (), {'get': staticmethod(broken_get)})())
+
+    with pytest.raises(ValueError):
+        sync_scraper._make_request('https://www.doubtnut.com/qna/1')
+
+    assert breaker.state == OPEN
+    breaker.before_request()
+    assert breaker.state == HALF_OPEN
+
+
+def test_abandoned_request_does_not_count_against_a_closed_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_abandoned()
+    assert breaker.state == CLOSED
+    breaker.before_request()
+
+
+def test_half_open_circuit_allows_a_single_trial():
+    breaker = half_open_breaker()
+    breaker.before_request()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
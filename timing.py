@@ -0,0 +1,101 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Phases in the order they are reported
+PHASES = ('init', 'cache', 'ratelimit', 'upstream', 'parse', 'extract', 'verify')
+
+
+class RequestTimings:
+    """Time spent per phase while serving one API request
+
+    Phases that run in parallel (batch fetches, async gathers) are summed,
+    so their total can exceed the request's wall-clock time.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._phases = {}
+
+    def add(self, name, seconds):
+        with self._lock:
+            entry = self._phases.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def phases(self):
+        """{phase: (seconds, count)} in reporting order"""
+        with self._lock:
+            phases = {name: tuple(entry) for name, entry in self._phases.items()}
+        ordered = {name: phases.pop(name) for name in PHASES if name in phases}
+        ordered.update(phases)
+        return ordered
+
+    def server_timing(self):
+        """Value for the Server-Timing response header"""
+        entries = [f'{name};dur={seconds * 1000:.1f}' for name, (seconds, count) in self.phases().items()]
+        entries.append(f'total;dur={self.total() * 1000:.1f}')
+        return ', '.join(entries)
+
+    def as_dict(self):
+        """JSON-friendly timings for ?debug=timing"""
+        timings = {
+            name: {'ms': round(seconds * 1000, 3), 'count': count}
+            for name, (seconds, count) in self.phases().items()
+        }
+        timings['total_ms'] = round(self.total() * 1000, 3)
+        return timings
+
+
+_current = contextvars.ContextVar('doubtnut_request_timings', default=None)
+# Phases already being timed further up in this context
+_open_phases = contextvars.ContextVar('doubtnut_open_phases', default=frozenset())
+
+
+def start_request():
+    """Begin recording phases for the request running in this context"""
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+def end_request():
+    _current.set(None)
+
+
+def current():
+    return _current.get()
+
+
+def record(name, seconds):
+    """Add time to a phase of the current request, if one is being timed"""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def phase(name):
+    """Time a block as a phase; nested blocks of the same phase count once"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+
+    open_phases = _open_phases.get()
+    if name in open_phases:
+        yield
+        return
+
+    token = _open_phases.set(open_phases | {name})
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _open_phases.reset(token)
+        timings.add(name, time.perf_counter() - start)
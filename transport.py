@@ -0,0 +1,193 @@
+import os
+import logging
+import threading
+import importlib.util
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Browser-like headers sent with every upstream request
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Connection pool defaults; the per-host size should cover the busiest worker pool
+DEFAULT_POOL_HOSTS = 10
+DEFAULT_POOL_MAXSIZE = 32
+
+CLIENTS = ('requests', 'http2')
+
+
+class _HTTPXResponse:
+    """requests.Response look-alike over an httpx.Response"""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def content(self):
+        return self._response.content
+
+    @property
+    def text(self):
+        return self._response.text
+
+    @property
+    def http_version(self):
+        return self._response.http_version
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            reason = self._response.reason_phrase
+            kind = 'Client' if self.status_code < 500 else 'Server'
+            raise requests.HTTPError(f"{self.status_code} {kind} Error: {reason} for url: {self.url}", response=self)
+
+
+class HTTPXSession:
+    """requests.Session-compatible shim over an HTTP/2-capable httpx.Client
+
+    Supports the subset the scrapers use (headers, get, head) and maps httpx
+    errors onto the requests exception hierarchy, so retry and error
+    handling written for requests keeps working.
+    """
+
+    def __init__(self, pool_maxsize=DEFAULT_POOL_MAXSIZE):
+        import httpx
+        self._httpx = httpx
+        self.headers = dict(DEFAULT_HEADERS)
+        self._client = httpx.Client(
+            http2=True,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize)
+        )
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.http_versions = {}
+
+    def request(self, method, url, timeout=None, headers=None):
+        httpx = self._httpx
+        merged = dict(self.headers)
+        if headers:
+            merged.update(headers)
+        try:
+            response = self._client.request(method, url, headers=merged, timeout=timeout)
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(str(e)) from e
+        except httpx.HTTPError as e:
+            raise requests.RequestException(str(e)) from e
+
+        with self._lock:
+            self.requests += 1
+            self.http_versions[response.http_version] = self.http_versions.get(response.http_version, 0) + 1
+        return _HTTPXResponse(response)
+
+    def get(self, url, timeout=None, headers=None):
+        return self.request('GET', url, timeout=timeout, headers=headers)
+
+    def head(self, url, timeout=None, headers=None):
+        return self.request('HEAD', url, timeout=timeout, headers=headers)
+
+    def close(self):
+        self._client.close()
+
+    def stats(self):
+        pool = getattr(self._client._transport, '_pool', None)
+        open_connections = len(pool.connections) if pool is not None else None
+        with self._lock:
+            return {
+                'client': 'http2',
+                'requests': self.requests,
+                'open_connections': open_connections,
+                'http_versions': dict(self.http_versions),
+            }
+
+
+def _pool_stats(adapter):
+    """Requests vs new connections across an adapter's per-host urllib3 pools"""
+    hosts = {}
+    with adapter.poolmanager.pools.lock:
+        pools = list(adapter.poolmanager.pools._container.items())
+    for key, pool in pools:
+        hosts[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+            'requests': pool.num_requests,
+            'connections_opened': pool.num_connections,
+            # The pool queue is pre-filled with None placeholders
+            'idle_connections': sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0,
+        }
+    return hosts
+
+
+def _build_requests_session(pool_hosts, pool_maxsize):
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    # Retries are done by the scrapers (with rate limiting and backoff), not urllib3
+    adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_maxsize, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide upstream session shared by both scrapers
+
+    Configured from DOUBTNUT_HTTP_CLIENT (requests or http2),
+    DOUBTNUT_POOL_HOSTS and DOUBTNUT_POOL_MAXSIZE. The http2 client needs
+    httpx with the h2 extra; without it the requests client is used.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                client = os.environ.get('DOUBTNUT_HTTP_CLIENT', 'requests')
+                pool_hosts = int(os.environ.get('DOUBTNUT_POOL_HOSTS', DEFAULT_POOL_HOSTS))
+                pool_maxsize = int(os.environ.get('DOUBTNUT_POOL_MAXSIZE', DEFAULT_POOL_MAXSIZE))
+
+                if client not in CLIENTS:
+                    logging.warning(f"Unknown HTTP client {client}, using requests")
+                    client = 'requests'
+                if client == 'http2' and (importlib.util.find_spec('httpx') is None
+                                          or importlib.util.find_spec('h2') is None):
+                    logging.warning("HTTP/2 client needs 'httpx[http2]'; using requests")
+                    client = 'requests'
+
+                if client == 'http2':
+                    _session = HTTPXSession(pool_maxsize)
+                else:
+                    _session = _build_requests_session(pool_hosts, pool_maxsize)
+    return _session
+
+
+def stats():
+    """Connection reuse counters for the shared session, or None if it was never used"""
+    session = _session
+    if session is None:
+        return None
+    if isinstance(session, HTTPXSession):
+        return session.stats()
+
+    hosts = {}
+    for adapter in {id(adapter): adapter for adapter in session.adapters.values()}.values():
+        hosts.update(_pool_stats(adapter))
+    total_requests = sum(host['requests'] for host in hosts.values())
+    total_connections = sum(host['connections_opened'] for host in hosts.values())
+    return {
+        'client': 'requests',
+        'requests': total_requests,
+        'connections_opened': total_connections,
+        'reuse_ratio': round(1 - total_connections / total_requests, 4) if total_requests else 0.0,
+        'hosts': hosts,
+    }
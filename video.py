@@ -1,24 +1,79 @@
+import os
 import requests
 import re
 import json
+import time
 import logging
-from bs4 import BeautifulSoup
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin, urlparse
+from cache import LRUCache, NotModified, cached, conditional_headers, record_validators
+from ratelimit import get_limiter
+from parsing import make_soup
+from metrics import UpstreamCall, timed_extractor
+from transport import get_session
+from circuit import CircuitOpenError, get_breaker, is_upstream_failure
+
+
+# Generic video URL patterns tried against script contents, in priority order
+VIDEO_URL_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE) for pattern in (
+        r'"videoUrl":\s*"([^"]+)"',
+        r'"video_url":\s*"([^"]+)"',
+        r'"src":\s*"([^"]+\.(?:mp4|webm|ogg|m3u8))"',
+        r'"file":\s*"([^"]+\.(?:mp4|webm|ogg|m3u8))"',
+        r'videoSrc:\s*["\']([^"\']+)["\']',
+        r'video:\s*["\']([^"\']+)["\']',
+        r'https?://[^"\s]+\.(?:mp4|webm|ogg|m3u8)',
+    )
+]
+
+# Flat JSON objects mentioning a video/src/file key
+JSON_OBJECT_PATTERN = re.compile(r'\{[^{}]*(?:"video|src|file")[^{}]*\}')
+
+
+# Video URL verification: 'sync' (HEAD before returning), 'background'
+# (return at once, HEAD on a worker thread) or 'off'
+VERIFY_MODE = os.environ.get('DOUBTNUT_VIDEO_VERIFY', 'sync')
+VERIFY_TTL = int(os.environ.get('DOUBTNUT_VIDEO_VERIFY_TTL', 24 * 3600))
+VERIFY_NEGATIVE_TTL = int(os.environ.get('DOUBTNUT_VIDEO_VERIFY_NEGATIVE_TTL', 300))
+
+# Verification outcomes shared by all scraper instances, keyed by video URL
+_verified_urls = LRUCache(int(os.environ.get('DOUBTNUT_VIDEO_VERIFY_SIZE', 4096)))
+_verify_pending = set()
+_verify_lock = threading.Lock()
+_verify_executor = None
+
+
+def _get_verify_executor():
+    global _verify_executor
+    if _verify_executor is None:
+        with _verify_lock:
+            if _verify_executor is None:
+                _verify_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='video-verify')
+    return _verify_executor
+
+
+def _is_cacheable_result(result):
+    """Only cache outcomes that depend on the page, not on transient network errors"""
+    # A failed HEAD may be transient; don't let it hide the page's video for a whole TTL
+    if result.get('verify_failed'):
+        return False
+    if result.get('success'):
+        # Don't pin a URL whose background verification hasn't finished yet
+        return result.get('video_info', {}).get('verified', True) is not None
+    return result.get('error') == 'No video content found on the page'
+
 
 class DoubtnutScraper:
     """Scraper for extracting video links from Doubtnut educational content pages"""
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        })
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.limiter = get_limiter()
+        self.session = get_session()
     
+    @cached('video', should_cache=_is_cacheable_result)
     def extract_video_url(self, url):
         """
         Extract direct video URL from Doubtnut page
@@ -38,30 +93,40 @@ class DoubtnutScraper:
                 }
             
             # Fetch the page content
-            response = self.session.get(url, timeout=10)
+            breaker = get_breaker()
+            breaker.before_request()
+            headers = conditional_headers()
+            try:
+                self.limiter.acquire()
+                with UpstreamCall(url) as call:
+                    response = self.session.get(url, timeout=10, headers=headers)
+                    call.status = response.status_code
+            except requests.RequestException:
+                breaker.record_failure()
+                raise
+            except BaseException:
+                # Interrupted or failed without an answer; must not hold a half-open trial
+                breaker.record_abandoned()
+                raise
+            if is_upstream_failure(response.status_code):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code == 304 and headers:
+                raise NotModified(url)
             response.raise_for_status()
+            record_validators(response.headers)
             
-            # Parse HTML content
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Try multiple extraction methods
-            video_info = self._extract_from_video_tags(soup) or \
-                        self._extract_from_iframe(soup) or \
-                        self._extract_from_script_tags(soup) or \
-                        self._extract_from_meta_tags(soup)
-            
-            if video_info:
-                return {
-                    'success': True,
-                    'video_url': video_info['url'],
-                    'video_info': video_info
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': 'No video content found on the page'
-                }
+            return self._process_page(response.content)
                 
+        except NotModified:
+            # Let the cache keep the previous result
+            raise
+        except CircuitOpenError:
+            return {
+                'success': False,
+                'error': 'Doubtnut is currently unavailable. Please try again later.'
+            }
         except requests.exceptions.Timeout:
             return {
                 'success': False,
@@ -84,6 +149,104 @@ class DoubtnutScraper:
                 'error': f'Unexpected error: {str(e)}'
             }
     
+    def extract_video_from_soup(self, soup):
+        """
+        Extract direct video URL from an already parsed Doubtnut page
+        
+        Args:
+            soup (BeautifulSoup): Parsed page, e.g. shared with the Q&A scraper
+            
+        Returns:
+            dict: Result in the same format as extract_video_url
+        """
+        return self.verify_result(
+            self.extract_unverified(soup),
+            lambda rejected: self.extract_unverified(soup, rejected)
+        )
+    
+    def _unexpected_error(self, error):
+        logging.error(f"Unexpected error: {str(error)}")
+        return {
+            'success': False,
+            'error': f'Unexpected error: {str(error)}'
+        }
+    
+    def extract_unverified(self, soup, rejected=()):
+        """
+        Extract the video from a parsed page without any network I/O
+        
+        Doubtnut video URLs built from page data come back unchecked; pass
+        the result to verify_result() before using it.
+        
+        Args:
+            soup (BeautifulSoup): Parsed page
+            rejected (sequence): Video URLs to skip, e.g. after a failed check
+        """
+        try:
+            # Try multiple extraction methods
+            video_info = self._extract_from_video_tags(soup) or \
+                        self._extract_from_iframe(soup) or \
+                        self._extract_from_script_tags(soup, rejected) or \
+                        self._extract_from_meta_tags(soup)
+        except Exception as e:
+            return self._unexpected_error(e)
+        
+        if video_info:
+            return {
+                'success': True,
+                'video_url': video_info['url'],
+                'video_info': video_info
+            }
+        else:
+            return {
+                'success': False,
+                'error': 'No video content found on the page'
+            }
+    
+    def verify_result(self, result, reextract):
+        """
+        Verify the Doubtnut video URL of an extract_unverified() result
+        
+        An unreachable URL is rejected and the page searched again without
+        it, by calling reextract(rejected URLs). Results reached that way
+        carry verify_failed, so they are not cached like page outcomes.
+        """
+        rejected = []
+        try:
+            while self._needs_verification(result):
+                verified = self._verify_video_url(result['video_url'])
+                if verified is not False:
+                    result['video_info']['verified'] = verified
+                    break
+                rejected.append(result['video_url'])
+                result = reextract(rejected)
+        except Exception as e:
+            return self._unexpected_error(e)
+        
+        if rejected:
+            if not result.get('success'):
+                # The page has a video; it just couldn't be reached right now
+                result = {
+                    'success': False,
+                    'error': 'Video URL could not be verified'
+                }
+            result['verify_failed'] = True
+        return result
+    
+    def _needs_verification(self, result):
+        video_info = result.get('video_info') or {}
+        return video_info.get('type') == 'doubtnut_video' and 'verified' not in video_info
+    
+    def _process_page(self, content):
+        """Parse a downloaded page and extract its video (no I/O besides URL verification)"""
+        # Parse HTML content, keeping only tags the extractors look at
+        soup = make_soup(content, 'video')
+        return self.extract_video_from_soup(soup)
+    
+    def is_cacheable_result(self, result):
+        """Whether an extract_video_url result may be stored in the cache"""
+        return _is_cacheable_result(result)
+    
     def _is_valid_doubtnut_url(self, url):
         """Validate if URL is from Doubtnut"""
         try:
@@ -92,6 +255,7 @@ class DoubtnutScraper:
         except:
             return False
     
+    @timed_extractor
     def _extract_from_video_tags(self, soup):
         """Extract video URL from HTML5 video tags"""
         video_tags = soup.find_all('video')
@@ -115,6 +279,7 @@ class DoubtnutScraper:
                     }
         return None
     
+    @timed_extractor
     def _extract_from_iframe(self, soup):
         """Extract video URL from iframe embeds"""
         iframes = soup.find_all('iframe')
@@ -139,8 +304,20 @@ class DoubtnutScraper:
                 }
         return None
     
-    def _extract_from_script_tags(self, soup):
+    @timed_extractor
+    def _extract_from_script_tags(self, soup, rejected=()):
         """Extract video URLs from JavaScript/JSON in script tags"""
+        # FAST PATH: decode the Next.js data script once and read videoData directly
+        next_data_script = soup.find('script', id='__NEXT_DATA__')
+        if next_data_script is not None and next_data_script.string:
+            try:
+                video_info = self._extract_from_next_data(json.loads(next_data_script.string))
+                if video_info and video_info['url'] not in rejected:
+                    return video_info
+            except (ValueError, AttributeError):
+                # If JSON parsing fails, continue to fallback methods
+                pass
+        
         scripts = soup.find_all('script')
         
         for script in scripts:
@@ -149,56 +326,22 @@ class DoubtnutScraper:
             
             script_content = script.string
             
-            # DOUBTNUT SPECIFIC: Look for videoData in Next.js props
-            if 'videoData' in script_content and 'video_name' in script_content:
+            # DOUBTNUT SPECIFIC: Look for videoData in Next.js props outside __NEXT_DATA__
+            if script is not next_data_script and 'videoData' in script_content and 'video_name' in script_content:
                 try:
                     # Find the JSON structure starting with {"props"
                     start_idx = script_content.find('{"props"')
                     if start_idx != -1:
-                        json_str = script_content[start_idx:]
-                        data = json.loads(json_str)
-                        
-                        # Navigate to videoData
-                        video_data = data.get('props', {}).get('pageProps', {}).get('videoData', {})
-                        video_name = video_data.get('video_name')
-                        
-                        if video_name:
-                            # Construct Doubtnut video URL
-                            video_url = f"https://videos.doubtnut.com/{video_name}"
-                            
-                            # Verify the URL works before returning
-                            try:
-                                verify_response = self.session.head(video_url, timeout=5)
-                                if verify_response.status_code == 200:
-                                    return {
-                                        'url': video_url,
-                                        'type': 'doubtnut_video',
-                                        'format': self._get_video_format(video_name),
-                                        'duration': video_data.get('duration'),
-                                        'question_id': video_data.get('question_id'),
-                                        'answer_id': video_data.get('answer_id')
-                                    }
-                            except:
-                                # If verification fails, continue to fallback methods
-                                pass
-                except:
+                        video_info = self._extract_from_next_data(json.loads(script_content[start_idx:]))
+                        if video_info and video_info['url'] not in rejected:
+                            return video_info
+                except (ValueError, AttributeError):
                     # If JSON parsing fails, continue to fallback methods
                     pass
             
             # FALLBACK: Look for common video URL patterns
-            video_patterns = [
-                r'"videoUrl":\s*"([^"]+)"',
-                r'"video_url":\s*"([^"]+)"',
-                r'"src":\s*"([^"]+\.(?:mp4|webm|ogg|m3u8))"',
-                r'"file":\s*"([^"]+\.(?:mp4|webm|ogg|m3u8))"',
-                r'videoSrc:\s*["\']([^"\']+)["\']',
-                r'video:\s*["\']([^"\']+)["\']',
-                r'https?://[^"\s]+\.(?:mp4|webm|ogg|m3u8)',
-            ]
-            
-            for pattern in video_patterns:
-                matches = re.findall(pattern, script_content, re.IGNORECASE)
-                for match in matches:
+            for pattern in VIDEO_URL_PATTERNS:
+                for match in pattern.findall(script_content):
                     if self._is_valid_video_url(match):
                         return {
                             'url': match,
@@ -206,27 +349,92 @@ class DoubtnutScraper:
                             'format': self._get_video_format(match)
                         }
             
-            # Try to parse as JSON and look for video URLs
-            try:
-                # Look for JSON-like structures
-                json_matches = re.findall(r'\{[^{}]*(?:"video|src|file")[^{}]*\}', script_content)
-                for json_str in json_matches:
-                    try:
-                        data = json.loads(json_str)
-                        video_url = self._find_video_in_json(data)
-                        if video_url:
-                            return {
-                                'url': video_url,
-                                'type': 'json_extracted',
-                                'format': self._get_video_format(video_url)
-                            }
-                    except:
-                        continue
-            except:
-                pass
+            # Try to parse JSON-like structures and look for video URLs
+            for json_str in JSON_OBJECT_PATTERN.findall(script_content):
+                try:
+                    data = json.loads(json_str)
+                except ValueError:
+                    continue
+                video_url = self._find_video_in_json(data)
+                if video_url:
+                    return {
+                        'url': video_url,
+                        'type': 'json_extracted',
+                        'format': self._get_video_format(video_url)
+                    }
         
         return None
     
+    @timed_extractor
+    def _extract_from_next_data(self, data):
+        """Build video info from Next.js page data (props.pageProps.videoData)"""
+        if not isinstance(data, dict):
+            return None
+        
+        # Navigate to videoData
+        video_data = data.get('props', {}).get('pageProps', {}).get('videoData') or {}
+        video_name = video_data.get('video_name')
+        
+        if not video_name:
+            return None
+        
+        # Construct Doubtnut video URL; verify_result() checks it outside this timer
+        video_url = f"https://videos.doubtnut.com/{video_name}"
+        
+        return {
+            'url': video_url,
+            'type': 'doubtnut_video',
+            'format': self._get_video_format(video_name),
+            'duration': video_data.get('duration'),
+            'question_id': video_data.get('question_id'),
+            'answer_id': video_data.get('answer_id')
+        }
+    
+    def _verify_video_url(self, video_url):
+        """Check that a video URL is reachable, memoizing the outcome
+        
+        Successes are remembered for VERIFY_TTL seconds and failures for
+        VERIFY_NEGATIVE_TTL. In background mode an unknown URL is checked on a
+        worker thread and None is returned so the caller can answer at once.
+        
+        Returns:
+            bool or None: True/False when known, None when the check is pending
+        """
+        if VERIFY_MODE == 'off':
+            return True
+        
+        entry = _verified_urls.get(video_url)
+        if entry is not None:
+            return entry[0]
+        
+        if VERIFY_MODE == 'background':
+            with _verify_lock:
+                if video_url in _verify_pending:
+                    return None
+                _verify_pending.add(video_url)
+            _get_verify_executor().submit(self._check_video_url, video_url)
+            return None
+        
+        return self._check_video_url(video_url)
+    
+    def _check_video_url(self, video_url):
+        """HEAD the video URL and record the outcome in the verification cache"""
+        try:
+            with UpstreamCall(video_url, url_type='video_head') as call:
+                verify_response = self.session.head(video_url, timeout=5)
+                call.status = verify_response.status_code
+            ok = verify_response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        finally:
+            with _verify_lock:
+                _verify_pending.discard(video_url)
+        
+        ttl = VERIFY_TTL if ok else VERIFY_NEGATIVE_TTL
+        _verified_urls.set(video_url, ok, time.time() + ttl)
+        return ok
+    
+    @timed_extractor
     def _extract_from_meta_tags(self, soup):
         """Extract video URLs from meta tags (Open Graph, Twitter Card, etc.)"""
         meta_patterns = [